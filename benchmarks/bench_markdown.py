@@ -0,0 +1,80 @@
+"""
+Benchmark Markdown conversion throughput.
+
+Compares building a fresh Markdown object for every page (the previous
+behaviour of convert_markdown_to_html) with the reused per-thread instance.
+
+Usage: python benchmarks/bench_markdown.py [PAGES]
+"""
+
+import os
+import sys
+import time
+import markdown
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zerodown.markdown import (
+    MARKDOWN_EXTENSIONS, MARKDOWN_EXTENSION_CONFIGS, AssetExtension, convert_markdown_to_html
+)
+
+PAGE = """# Note {i}
+
+Some *emphasis*, **bold** text and a [link](other-note.md) in paragraph {i}.
+
+- first item
+- second item with `inline code`
+
+| Column | Value |
+|--------|-------|
+| a      | {i}   |
+
+![Diagram](../assets/diagram-{i}.png)
+
+```python
+def handler_{i}(request):
+    return request.json()
+```
+"""
+
+
+def convert_fresh(content, source_path, output_path):
+    """Convert with a new Markdown object per page, as before."""
+    extensions = list(MARKDOWN_EXTENSIONS) + [AssetExtension(source_path, output_path, '/')]
+    return markdown.markdown(
+        content,
+        extensions=extensions,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+        output_format='html5'
+    )
+
+
+def convert_pooled(content, source_path, output_path):
+    """Convert with the reused per-thread Markdown instance."""
+    return convert_markdown_to_html(content, source_path, output_path, '/')
+
+
+def run(label, convert, pages):
+    start = time.perf_counter()
+    for i, content in enumerate(pages):
+        convert(content, f"content/notes/note-{i}.md", f"_site/notes/note-{i}.html")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {len(pages) / elapsed:8.1f} pages/sec ({elapsed:.2f}s for {len(pages)} pages)")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    pages = [PAGE.format(i=i) for i in range(count)]
+
+    # Warm up imports and Pygments lexers so both runs start equal
+    convert_fresh(pages[0], "content/notes/note.md", "_site/notes/note.html")
+    convert_pooled(pages[0], "content/notes/note.md", "_site/notes/note.html")
+
+    fresh = run("fresh", convert_fresh, pages)
+    pooled = run("pooled", convert_pooled, pages)
+    print(f"speedup    {fresh / pooled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
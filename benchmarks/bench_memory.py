@@ -0,0 +1,115 @@
+"""
+Benchmark the memory held by parsed content items.
+
+Parses a generated section of Markdown pages twice and measures the memory
+retained by the resulting item lists: once as the plain dicts the builder
+used to keep (HTML included) and once as ContentItem objects with lazily
+loaded HTML. Each item is pickled and unpickled first, as it is when it is
+returned from a worker process.
+
+Usage: python benchmarks/bench_memory.py [PAGES]
+"""
+
+import gc
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zerodown.markdown import parse_markdown_file, set_markdown_cache
+
+PAGE = """---
+title: "Post {i}"
+date: 2024-01-{day:02d}
+description: "Summary of post {i}, used on list pages."
+tags: [python, static-sites]
+featured: {featured}
+---
+
+# Post {i}
+
+Some *emphasis*, **bold** text and a [link](other-post.md) in paragraph {i}.
+
+{body}
+
+- first item
+- second item with `inline code`
+"""
+
+
+def write_pages(directory, count):
+    body = "\n\n".join(f"Paragraph {n} with a few more words to make the page realistic." for n in range(20))
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"post-{i:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(PAGE.format(i=i, day=i % 28 + 1, featured=str(i % 10 == 0).lower(), body=body))
+        paths.append(path)
+    return paths
+
+
+def parse_as_dicts(paths, output_dir):
+    items = []
+    for path in paths:
+        item = parse_markdown_file(path, os.path.join(output_dir, os.path.basename(path)), "/")
+        item = {
+            "metadata": dict(item.metadata),
+            "content_html": item.content_html,
+            "filepath": item.filepath,
+            "slug": item.slug,
+            "url": f"/posts/{item.slug}.html",
+            "section_key": "posts",
+        }
+        items.append(pickle.loads(pickle.dumps(item)))
+    return items
+
+
+def parse_as_items(paths, output_dir):
+    items = []
+    for path in paths:
+        item = parse_markdown_file(path, os.path.join(output_dir, os.path.basename(path)), "/",
+                                   lazy_content=True)
+        item.url = f"/posts/{item.slug}.html"
+        item.section_key = "posts"
+        items.append(pickle.loads(pickle.dumps(item)))
+    return items
+
+
+def measure(label, parse, paths, output_dir):
+    gc.collect()
+    tracemalloc.start()
+    items = parse(paths, output_dir)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<12} {retained / 1024 / 1024:8.2f} MiB ({retained / len(items):8.0f} bytes/item)")
+    return retained
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workdir = tempfile.mkdtemp(prefix="zerodown-bench-")
+    try:
+        content_dir = os.path.join(workdir, "posts")
+        os.makedirs(content_dir)
+        paths = write_pages(content_dir, count)
+        set_markdown_cache(os.path.join(workdir, "cache"))
+
+        # Fill the Markdown cache so both runs measure retained items, not conversion
+        for path in paths:
+            parse_markdown_file(path, os.path.join(workdir, "_site", os.path.basename(path)), "/")
+
+        output_dir = os.path.join(workdir, "_site")
+        dicts = measure("dicts", parse_as_dicts, paths, output_dir)
+        items = measure("ContentItem", parse_as_items, paths, output_dir)
+        print(f"savings      {dicts / items:8.2f}x")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load-test the static file server on one machine.
+
+Serves a built site directory on a local port and runs several client
+threads against it for a few seconds, each fetching every file of the site
+in turn over a keep-alive connection. Three request mixes are measured:
+plain GETs, revalidations with If-None-Match (answered with 304), and GETs
+accepting gzip (served from .gz siblings when they exist). The standard
+library's SimpleHTTPRequestHandler on a single-threaded TCPServer, which
+``serve`` used before, is measured with plain GETs for comparison.
+
+Usage: python benchmarks/bench_server.py SITE_DIR [CLIENTS] [SECONDS]
+"""
+
+import os
+import sys
+import time
+import threading
+import functools
+import http.client
+import http.server
+import socketserver
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zerodown.server import StaticServer, StaticFileHandler
+
+
+class _QuietMixin:
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietStaticHandler(_QuietMixin, StaticFileHandler):
+    pass
+
+
+class QuietSimpleHandler(_QuietMixin, http.server.SimpleHTTPRequestHandler):
+    pass
+
+
+def list_urls(site_dir):
+    urls = []
+    for root, _, files in os.walk(site_dir):
+        for filename in sorted(files):
+            if filename.endswith(('.gz', '.br')):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, filename), site_dir).replace(os.sep, "/")
+            urls.append("/" + urllib.parse.quote(rel_path))
+    return sorted(urls)
+
+
+def client(port, urls, offset, deadline, mode, totals, lock):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    etags = {}
+    requests = received = 0
+    index = offset
+    while time.perf_counter() < deadline:
+        url = urls[index % len(urls)]
+        index += 1
+        headers = {}
+        if mode == "gzip":
+            headers["Accept-Encoding"] = "gzip"
+        elif mode == "revalidate" and url in etags:
+            headers["If-None-Match"] = etags[url]
+        conn.request("GET", url, headers=headers)
+        response = conn.getresponse()
+        received += len(response.read())
+        if response.getheader("ETag"):
+            etags[url] = response.getheader("ETag")
+        requests += 1
+    conn.close()
+    with lock:
+        totals[0] += requests
+        totals[1] += received
+
+
+def run(label, server_class, handler, site_dir, urls, clients, seconds, mode):
+    handler = functools.partial(handler, directory=site_dir)
+    with server_class(("127.0.0.1", 0), handler) as httpd:
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        port = httpd.server_address[1]
+        totals, lock = [0, 0], threading.Lock()
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=client, args=(port, urls, i * len(urls) // clients,
+                                                         deadline, mode, totals, lock))
+                   for i in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        httpd.shutdown()
+    print(f"{label:<28} {totals[0] / elapsed:9.0f} req/s {totals[1] / elapsed / 1024 / 1024:8.1f} MiB/s")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    site_dir = os.path.abspath(sys.argv[1])
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    urls = list_urls(site_dir)
+    print(f"{len(urls)} files, {clients} clients, {seconds:g}s per run")
+
+    run("SimpleHTTP (TCPServer)", socketserver.TCPServer, QuietSimpleHandler,
+        site_dir, urls, clients, seconds, "plain")
+    for mode in ("plain", "revalidate", "gzip"):
+        run(f"StaticServer ({mode})", StaticServer, QuietStaticHandler,
+            site_dir, urls, clients, seconds, mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Tests for the cached code highlighter (zerodown.highlight).
+"""
+
+import unittest
+from unittest import mock
+
+import markdown
+import markdown.extensions.codehilite as codehilite_ext
+import markdown.extensions.fenced_code as fenced_code_ext
+from markdown.extensions.codehilite import CodeHilite
+
+from zerodown import highlight
+
+CODEHILITE_CONFIG = {'css_class': 'codehilite', 'linenums': False, 'guess_lang': True}
+
+FENCED_BLOCK = "```python\ndef f():\n    return 1\n```\n"
+INDENTED_BLOCK = "    :::python\n    x = [1, 2, 3]\n"
+
+
+def convert(text):
+    md = markdown.Markdown(extensions=['fenced_code', 'zerodown.highlight'],
+                           extension_configs={'zerodown.highlight': CODEHILITE_CONFIG})
+    return md.convert(text)
+
+
+class CachedHighlightTest(unittest.TestCase):
+
+    def setUp(self):
+        highlight._memory_cache.clear()
+        self.addCleanup(highlight._memory_cache.clear)
+
+    def assert_second_conversion_cached(self, text):
+        first = convert(text)
+        self.assertIn('class="codehilite"', first)
+        self.assertEqual(len(highlight._memory_cache), 1)
+        # Pygments must not run again for the same block
+        with mock.patch.object(CodeHilite, 'hilite', side_effect=AssertionError("not cached")):
+            second = convert(text)
+        self.assertEqual(first, second)
+        self.assertEqual(len(highlight._memory_cache), 1)
+
+    def test_fenced_block_is_served_from_cache(self):
+        self.assert_second_conversion_cached(FENCED_BLOCK)
+
+    def test_indented_block_is_served_from_cache(self):
+        self.assert_second_conversion_cached(INDENTED_BLOCK)
+
+    def test_output_matches_codehilite(self):
+        for text in (FENCED_BLOCK, INDENTED_BLOCK):
+            expected = markdown.markdown(text, extensions=['fenced_code', 'codehilite'],
+                                         extension_configs={'codehilite': CODEHILITE_CONFIG})
+            self.assertEqual(convert(text), expected)
+
+    def test_python_markdown_is_not_patched(self):
+        convert(FENCED_BLOCK)
+        self.assertIs(codehilite_ext.CodeHilite, CodeHilite)
+        self.assertIs(fenced_code_ext.CodeHilite, CodeHilite)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+"""
+Incremental asset synchronisation for the Zerodown static site generator.
+
+Static files and content assets are mirrored into the output directory by
+comparing each source file's size and modification time (optionally its
+content hash) with an asset manifest stored in the cache directory. Only
+new or changed files are copied, on a thread pool, and files whose source
+disappeared are removed from the output.
+"""
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from zerodown.utils import get_cache_dir, get_asset_copy_mode, copy_asset_file
+from zerodown.staging import published_output_dir
+from zerodown.console import zconsole
+
+ASSET_MANIFEST_FILENAME = "assets.json"
+ASSET_MANIFEST_FORMAT = 1
+
+# How unchanged assets are recognised
+ASSET_COMPARE_MODES = ('mtime', 'hash')
+
+# Default number of copy threads (copying is I/O bound)
+DEFAULT_ASSET_THREADS = 8
+
+# Read size used when hashing assets, which can be very large
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_asset(path):
+    """
+    Return a digest of a file's contents, reading it in chunks.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        str: Hex digest, or None if the file cannot be read
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class AssetSync:
+    """
+    Mirrors asset trees into the output directory across builds.
+
+    Call sync_tree() or sync_file() for every source, in the order the files
+    should take precedence, then finish() to remove deleted assets and save
+    the asset manifest.
+    """
+
+    def __init__(self, config, reuse=True):
+        """
+        Args:
+            config: Configuration module with OUTPUT_DIR defined
+            reuse: Trust the previous asset manifest; False copies every asset
+        """
+        self.config = config
+        self.output_root = published_output_dir(config)
+        self.path = os.path.join(get_cache_dir(config), ASSET_MANIFEST_FILENAME)
+        self.compare = str(getattr(config, 'ASSET_COMPARE', 'mtime') or 'mtime').lower()
+        if self.compare not in ASSET_COMPARE_MODES:
+            zconsole.warning("Unknown asset_compare setting",
+                             f"'{self.compare}', expected one of {', '.join(ASSET_COMPARE_MODES)}; using 'mtime'")
+            self.compare = 'mtime'
+        self.copy_mode = get_asset_copy_mode(config)
+        self.threads = max(1, int(getattr(config, 'ASSET_THREADS', DEFAULT_ASSET_THREADS) or 1))
+        self.previous = self._load() if reuse else {}
+        self.files = {}
+        self.copied = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    @property
+    def output_dir(self):
+        """The directory the current build writes to."""
+        return self.config.OUTPUT_DIR
+
+    def _load(self):
+        """Load the asset manifest of the previous build."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (data.get("format") != ASSET_MANIFEST_FORMAT
+                or data.get("output_dir") != self.output_root):
+            return {}
+        return data.get("files", {})
+
+    def previous_outputs(self):
+        """
+        Return the output files written by the previous asset sync.
+
+        Returns:
+            set: Paths relative to OUTPUT_DIR
+        """
+        return set(self.previous)
+
+    def _is_unchanged(self, key, src_path, src_stat, entry):
+        """Check whether an asset can be kept, updating entry['hash'] if needed."""
+        previous = self.previous.get(key)
+        if not previous or previous.get("source") != src_path:
+            return False
+        if previous.get("mode", "copy") != self.copy_mode:
+            return False
+
+        # The output must still be the file copied last time
+        try:
+            dst_stat = os.stat(os.path.join(self.output_dir, key))  # Follows symlinks
+        except OSError:
+            return False
+        if dst_stat.st_size != src_stat.st_size:
+            return False
+
+        if (previous.get("size") == src_stat.st_size
+                and previous.get("mtime_ns") == src_stat.st_mtime_ns):
+            if self.compare == 'hash':
+                entry["hash"] = previous.get("hash") or hash_asset(src_path)
+            return True
+
+        # Timestamps differ (e.g. after a fresh checkout): compare contents
+        if self.compare == 'hash' and previous.get("hash"):
+            entry["hash"] = hash_asset(src_path)
+            return entry["hash"] == previous["hash"]
+        return False
+
+    def sync_tree(self, src_dir, dest_dir, skip_hidden=False):
+        """
+        Copy new and changed files from a source tree into the output directory.
+
+        Args:
+            src_dir: Source directory
+            dest_dir: Destination directory inside OUTPUT_DIR
+            skip_hidden: Ignore files whose name starts with a dot
+
+        Returns:
+            int: Number of copied files
+        """
+        copies = []
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                if skip_hidden and filename.startswith('.'):
+                    continue
+                src_path = os.path.join(root, filename)
+                dst_path = os.path.join(dest_dir, os.path.relpath(src_path, src_dir))
+                self._plan(src_path, dst_path, copies)
+        return self._run_copies(copies)
+
+    def sync_file(self, src_path, dst_path):
+        """
+        Copy a single file into the output directory if it is new or changed.
+
+        Args:
+            src_path: Source file
+            dst_path: Destination path inside OUTPUT_DIR
+
+        Returns:
+            int: 1 if the file was copied, otherwise 0
+        """
+        copies = []
+        self._plan(src_path, dst_path, copies)
+        return self._run_copies(copies)
+
+    def outputs(self):
+        """
+        Return the output files of the assets synced so far.
+
+        Returns:
+            set: Paths relative to OUTPUT_DIR
+        """
+        return set(self.files)
+
+    def _plan(self, src_path, dst_path, copies):
+        """Record an asset, adding it to copies unless its output is up to date."""
+        key = os.path.relpath(dst_path, self.output_dir).replace(os.sep, "/")
+        try:
+            src_stat = os.stat(src_path)
+        except OSError as e:
+            zconsole.error("Error reading asset", f"{src_path}: {e}")
+            return
+
+        entry = {"source": src_path, "size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns,
+                 "mode": self.copy_mode}
+        # A file already written by an earlier tree in this build is always replaced
+        if key not in self.files and self._is_unchanged(key, src_path, src_stat, entry):
+            self.unchanged += 1
+        else:
+            copies.append((src_path, dst_path, key))
+        self.files[key] = entry
+
+    def _run_copies(self, copies):
+        """Copy the planned assets on the thread pool."""
+        if not copies:
+            return 0
+
+        # Create directories up front so copy threads do not race on them
+        for directory in sorted({os.path.dirname(dst_path) for _, dst_path, _ in copies}):
+            os.makedirs(directory, exist_ok=True)
+
+        if len(copies) == 1:
+            results = [self._copy(copies[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.threads, len(copies))) as executor:
+                results = list(executor.map(self._copy, copies))
+
+        copied = 0
+        for (src_path, dst_path, key), (ok, digest) in zip(copies, results):
+            if ok:
+                copied += 1
+                if self.compare == 'hash':
+                    self.files[key]["hash"] = digest
+            else:
+                self.files.pop(key, None)
+        self.copied += copied
+        return copied
+
+    def _copy(self, task):
+        """
+        Copy, link or clone one asset (runs on the thread pool).
+
+        Returns:
+            tuple: (success, content hash in 'hash' mode)
+        """
+        src_path, dst_path, key = task
+        try:
+            copy_asset_file(src_path, dst_path, self.copy_mode)
+        except OSError as e:
+            zconsole.error("Error copying asset", f"{src_path}: {e}")
+            return False, None
+        return True, hash_asset(src_path) if self.compare == 'hash' else None
+
+    def finish(self, save=True):
+        """
+        Remove outputs of assets that no longer exist and save the asset manifest.
+
+        Args:
+            save: Save the asset manifest now; a staged build saves it with
+                save() once the build is published
+
+        Returns:
+            int: Number of removed files
+        """
+        output_dir = os.path.abspath(self.output_dir)
+        for key in sorted(set(self.previous) - set(self.files)):
+            path = os.path.join(self.output_dir, key)
+            # lexists: a symlinked asset dangles once its source is gone
+            if os.path.lexists(path) and not os.path.isdir(path):
+                try:
+                    os.remove(path)
+                    self.removed += 1
+                    zconsole.info("Removed deleted asset", key)
+                except OSError as e:
+                    zconsole.error("Error removing deleted asset", f"{path}: {e}")
+                    continue
+                # Remove directories left empty
+                directory = os.path.dirname(os.path.abspath(path))
+                while directory != output_dir and directory.startswith(output_dir):
+                    try:
+                        os.rmdir(directory)
+                    except OSError:
+                        break
+                    directory = os.path.dirname(directory)
+
+        if save:
+            self.save()
+        return self.removed
+
+    def save(self):
+        """Write the asset manifest for use by the next build."""
+        data = {
+            "format": ASSET_MANIFEST_FORMAT,
+            "output_dir": self.output_root,
+            "files": self.files,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            zconsole.error("Error writing asset manifest", f"{self.path}: {e}")
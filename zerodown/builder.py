@@ -8,24 +8,58 @@ import datetime
 import time
 from pathlib import Path
 
-from zerodown.utils import clean_output_dir, copy_static_assets, copy_styles
-from zerodown.templates import setup_jinja_env, process_includes
-from zerodown.content import process_section, build_homepage, process_top_level_pages
-from zerodown.markdown import copy_content_assets
+from zerodown.utils import (copy_static_assets, copy_styles, get_cache_dir, remove_unlisted_files,
+                            set_write_if_changed, write_stats, reset_output_dirs, make_output_dirs,
+                            set_output_writers, flush_output_files)
+from zerodown.templates import setup_jinja_env, process_includes, set_stream_all
+from zerodown.content import (parse_sections, expand_shortcodes, render_section,
+                              build_homepage, process_top_level_pages)
+from zerodown.markdown import copy_content_assets, set_markdown_cache
+from zerodown.shortcodes import configure_shortcode_templates
+from zerodown.highlight import configure_highlighting
+from zerodown.manifest import BuildManifest
+from zerodown.parallel import resolve_jobs
+from zerodown.siteindex import SiteIndex
+from zerodown.spill import SpillStore
+from zerodown.assets import AssetSync
+from zerodown.cache import prune_caches, DEFAULT_CACHE_MAX_AGE
+from zerodown.staging import StagedOutput
+from zerodown.compress import Precompressor
+from zerodown.profiling import start_profiling, stop_profiling, enter_phase, DEFAULT_PROFILE_TOP
 from zerodown.console import zconsole
 
 
-def build_site(config):
+def build_site(config, incremental=False, jobs=1, use_cache=True, low_memory=False,
+               profile=None, profile_top=DEFAULT_PROFILE_TOP, trace=None, precompress=None,
+               state=None):
     """
     Main function to build the entire static site.
     
     Args:
         config: Configuration module with site settings
+        incremental: Only rebuild pages whose inputs changed since the last build
+        jobs: Number of worker processes for parsing and rendering (0 = one per CPU)
+        use_cache: Reuse parsed Markdown, highlighted code and compiled templates
+            from the persistent cache
+        low_memory: Keep only item summaries in memory, spilling page HTML to
+            disk and streaming every page to its output file
+        profile: Path of a JSON report with phase and per-page timings, or None
+        profile_top: Number of slowest pages and templates listed in the report
+        trace: Path of a Chrome trace event file with the build timeline, or None
+        precompress: Write .gz (and .br) copies of compressible outputs; None
+            uses the PRECOMPRESS setting
+        state: Optional dictionary filled with the parsed site once the build
+            is published, so it can be updated in-process (see
+            zerodown.rebuild). Not supported with low_memory
         
     Returns:
         bool: True if build was successful
     """
     start_time = datetime.datetime.now()
+    jobs = resolve_jobs(jobs)
+    spill = None
+    staging = None
+    profiler = start_profiling(config, jobs) if profile or trace else None
     
     # Display site info
     site_name = getattr(config, 'SITE_NAME', 'Zerodown Site')
@@ -38,63 +72,128 @@ def build_site(config):
     
     try:
         # 1. Setup
+        enter_phase("setup")
         setup_task = None
         if main_task:
             setup_task = zconsole.add_subtask("Setting up environment")
             zconsole.update_progress(setup_task, status="Cleaning output directory")
             
-        # Clean output directory
-        clean_output_dir(config)  # Exits on error
+        # Enable the parsed Markdown and code highlighting caches
+        cache_dir = get_cache_dir(config)
+        set_markdown_cache(os.path.join(cache_dir, 'markdown') if use_cache else None)
+        configure_highlighting(config, os.path.join(cache_dir, 'highlight') if use_cache else None)
+        
+        # In low-memory mode, page HTML lives on disk and pages are streamed out
+        if low_memory:
+            spill = SpillStore(cache_dir)
+        set_stream_all(low_memory)
+        
+        # Load the previous build manifest (falls back to a full build if unusable)
+        manifest = BuildManifest.load(config, incremental=incremental)
+        
+        # Static and content assets are copied only when they changed
+        asset_sync = AssetSync(config, reuse=use_cache)
+        
+        # Compressed copies of the outputs are only rewritten when their original changed
+        precompressor = Precompressor(config, enabled=precompress, reuse=use_cache)
+        
+        # Pages whose output is byte-identical to the previous build are not rewritten
+        set_write_if_changed(getattr(config, 'WRITE_IF_CHANGED', True))
+        write_stats.reset()
+        reset_output_dirs()
+        
+        # Rendered pages are written by background threads
+        set_output_writers(getattr(config, 'WRITER_THREADS', 4))
+        
+        # Build into a staging directory that replaces the output directory at
+        # the end, seeded with the previous output. Otherwise build in place.
+        # Either way the previous files are kept until the build has finished,
+        # so identical outputs and assets are left untouched
+        staging = StagedOutput(config)
+        if not staging.begin():
+            os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+        if manifest.incremental:
+            zconsole.info("Incremental build", f"reusing unchanged files from {staging.target}")
         
         # Copy static assets
-        copy_static_assets(config)  # Continues on error
+        enter_phase("static")
+        copy_static_assets(config, asset_sync)  # Continues on error
         
         # Copy styles
-        copy_styles(config)  # Continues on error
+        enter_phase("styles")
+        copy_styles(config, asset_sync)  # Continues on error
         
         # Setup Jinja environment
-        jinja_env = setup_jinja_env(config)  # Exits on error
+        enter_phase("templates")
+        # Templates cannot change during a build, so skip the per-render up-to-date checks
+        jinja_env = setup_jinja_env(config, use_cache=use_cache, auto_reload=False)  # Exits on error
+        manifest.graph.bind(jinja_env)
+        configure_shortcode_templates(jinja_env)
         
         if setup_task:
             zconsole.update_progress(setup_task, status="Complete", advance=100)
         
         # 2. Process includes for global template context
+        enter_phase("includes")
         includes_task = None
         if main_task:
             includes_task = zconsole.add_subtask("Processing includes")
             
-        process_includes(config, jinja_env)
+        includes = process_includes(config, jinja_env)
         
         if includes_task:
             zconsole.update_progress(includes_task, status="Complete", advance=100)
         
         # 3. Copy assets from content directory
+        enter_phase("content-assets")
         assets_task = None
         if main_task:
             assets_task = zconsole.add_subtask("Copying content assets")
             
-        copy_content_assets(config)
+        copy_content_assets(config, asset_sync)
+        asset_sync.finish(save=False)  # Removes deleted assets
         
         if assets_task:
             zconsole.update_progress(assets_task, status="Complete", advance=100)
     
-        # 4. Process all sections
-        all_items = []  # To collect items from all sections for homepage
-        
+        # 4. Parse all content before rendering, so every page sees the complete site
         if not hasattr(config, 'SECTIONS') or not isinstance(config.SECTIONS, dict):
             zconsole.error("'SECTIONS' dictionary not found or invalid in config")
             sys.exit(1)
+        
+        enter_phase("parse")
+        parse_task = None
+        if main_task:
+            parse_task = zconsole.add_subtask("Parsing content")
+        
+        sections = parse_sections(config, jobs, spill)
+        all_items = [item for section_items in sections.values() for item in section_items]
+        site = SiteIndex(all_items, config).freeze()  # Indexed queries over all items
+        jinja_env.globals['site'] = site
+        expand_shortcodes(config, all_items, site, jobs, spill)
+        
+        # Create every output directory once, instead of checking it for each page
+        make_output_dirs([config.OUTPUT_DIR] +
+                         [os.path.join(config.OUTPUT_DIR, section_key) for section_key in sections])
+        
+        if parse_task:
+            zconsole.update_progress(parse_task, status=f"Parsed {len(all_items)} items", advance=100)
     
+        # 5. Render all sections
         section_count = len(config.SECTIONS)
         for i, (section_key, section_config) in enumerate(config.SECTIONS.items()):
             section_title = section_config.get('title', section_key.capitalize())
+            section_items = sections.get(section_key, [])
             section_task = None
             
             if main_task:
                 section_task = zconsole.add_subtask(f"Processing section: {section_title}")
             
-            # Process the section
-            section_items = process_section(config, jinja_env, section_key, section_config, all_items)
+            # Render the section
+            enter_phase(f"section:{section_key}")
+            if section_key in sections:
+                render_section(config, jinja_env, section_key, section_config, section_items,
+                               manifest, jobs)
             
             # Update progress if tracking
             if section_task:
@@ -107,24 +206,72 @@ def build_site(config):
                 main_progress = (i + 1) / (section_count + 2) * 100  # +2 for homepage and top-level pages
                 zconsole.update_progress(main_task, status=f"Processing sections ({i+1}/{section_count})", advance=main_progress)
     
-        # 5. Build top-level pages
+        # 6. Build top-level pages
         pages_task = None
         if main_task:
             pages_task = zconsole.add_subtask("Building top-level pages")
             zconsole.update_progress(pages_task, status="Building homepage", advance=50)
             
-        build_homepage(config, jinja_env, all_items)
+        enter_phase("homepage")
+        build_homepage(config, jinja_env, all_items, site, manifest)
         
         if pages_task:
             zconsole.update_progress(pages_task, status="Building other pages", advance=50)
             
-        process_top_level_pages(config, jinja_env)
+        enter_phase("top-level-pages")
+        process_top_level_pages(config, jinja_env, all_items, site, manifest)
+        
+        # Wait for the background writes
+        enter_phase("write")
+        flush_output_files(close=True)
+        
+        # Remove outputs whose sources disappeared. A full build removes
+        # every file it did not produce
+        enter_phase("finish")
+        outputs = set(manifest.outputs) | asset_sync.outputs()
+        if manifest.incremental:
+            deleted_count = manifest.remove_stale_outputs()
+        else:
+            deleted_count = remove_unlisted_files(config.OUTPUT_DIR,
+                                                  outputs | precompressor.keep(outputs))
+        deleted_count += asset_sync.removed
+        
+        # Compress new and changed outputs
+        enter_phase("compress")
+        precompressor.run(outputs, jobs)
+        deleted_count += precompressor.removed
+        
+        # Put the finished build in place
+        enter_phase("publish")
+        if not staging.commit():
+            raise RuntimeError(f"could not replace {config.OUTPUT_DIR} with the new build")
+        
+        # Remember this build only once it is published: the next incremental
+        # build must not trust outputs that never replaced the previous ones
+        manifest.save()
+        asset_sync.save()
+        precompressor.save()
+        
+        if state is not None:
+            state.update(jinja_env=jinja_env, includes=includes, sections=sections,
+                         all_items=all_items, site=site, manifest=manifest, asset_sync=asset_sync)
+        
+        # Drop cache entries that no build has used for a while
+        pruned = None
+        if use_cache:
+            pruned = prune_caches(cache_dir, getattr(config, 'CACHE_MAX_AGE', DEFAULT_CACHE_MAX_AGE),
+                                  getattr(config, 'CACHE_MAX_SIZE', None))
+        
+        if profile and profiler.save(profile, profile_top):
+            zconsole.info("Profile report written", profile)
+        if trace and profiler.save_trace(trace):
+            zconsole.info("Build trace written", trace)
         
         # Update main progress
         if main_task:
             zconsole.update_progress(main_task, status="Finalizing")
     
-        # 6. Finish and report
+        # 7. Finish and report
         end_time = datetime.datetime.now()
         duration = end_time - start_time
         
@@ -135,11 +282,35 @@ def build_site(config):
         # Show build summary
         stats = {
             "Build Duration": f"{duration.total_seconds():.2f} seconds",
-            "Total Pages": len(all_items) + 2,  # +2 for homepage and about page (estimate)
+            "Total Pages": len(manifest.outputs),
             "Sections": len(config.SECTIONS),
             "Output Directory": config.OUTPUT_DIR
         }
         
+        if jobs > 1:
+            stats["Parallel Jobs"] = jobs
+        
+        if spill is not None:
+            stats["Spilled Pages"] = f"{spill.count} ({spill.bytes / 1024 / 1024:.1f} MB)"
+        
+        stats["Outputs Written"] = write_stats.written
+        stats["Outputs Unchanged"] = write_stats.unchanged
+        stats["Files Deleted"] = deleted_count
+        stats["Assets Copied"] = asset_sync.copied
+        stats["Assets Unchanged"] = asset_sync.unchanged
+        
+        if pruned and pruned[0]:
+            stats["Cache Entries Pruned"] = f"{pruned[0]} ({pruned[1] / 1024 / 1024:.1f} MB)"
+        
+        if precompressor.enabled:
+            stats["Outputs Compressed"] = precompressor.compressed - precompressor.skipped
+            stats["Compression Unchanged"] = precompressor.unchanged
+            stats["Compression Skipped"] = precompressor.skipped
+        
+        if manifest.incremental:
+            stats["Pages Rebuilt"] = manifest.rendered
+            stats["Pages Unchanged"] = manifest.skipped
+        
         zconsole.success("Site build complete!")
         zconsole.display_summary(stats)
         
@@ -162,3 +333,11 @@ def build_site(config):
             import traceback
             zconsole.error(traceback.format_exc())
         return False
+    finally:
+        flush_output_files(close=True)
+        if staging is not None:
+            staging.abort()  # No-op once the build was swapped in
+        if spill is not None:
+            spill.cleanup()
+        if profiler is not None:
+            stop_profiling()
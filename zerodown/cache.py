@@ -0,0 +1,201 @@
+"""
+Persistent caches for the Zerodown static site generator.
+
+Caches are content-addressed: entries are stored under a digest of all the
+inputs that produced them, so they never need explicit invalidation and
+can safely be shared between builds and worker processes.
+
+Entries for content that was edited are never looked up again, so caches
+are pruned from time to time: reading an entry refreshes its modification
+time, and entries that no build used for a while are removed.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+from zerodown.console import zconsole
+
+# Cache directories (under CACHE_DIR) pruned by prune_caches
+PRUNED_CACHES = ('markdown', 'highlight')
+
+# Entries unused for this many days are removed
+DEFAULT_CACHE_MAX_AGE = 30
+
+# Seconds between two refreshes of an entry's modification time
+CACHE_TOUCH_INTERVAL = 24 * 3600
+
+# Seconds between two prunes of the caches
+CACHE_PRUNE_INTERVAL = 24 * 3600
+CACHE_PRUNE_STAMP = "prune.stamp"
+
+
+def cache_key(*parts):
+    """
+    Build a cache key from several parts.
+
+    Args:
+        *parts: Strings or bytes identifying the cached value
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    A content-addressed cache of pickled values stored as one file per key.
+
+    Files are sharded into subdirectories by key prefix and written
+    atomically, so concurrent builds and worker processes never see partial
+    entries. A file's modification time is its last use (to within a day).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        Args:
+            key: Cache key (see cache_key)
+
+        Returns:
+            The cached value, or None if it is missing or unreadable
+        """
+        try:
+            path = self._path(key)
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+                # Mark the entry as used, so prune() keeps it
+                if time.time() - os.fstat(f.fileno()).st_mtime > CACHE_TOUCH_INTERVAL:
+                    os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """
+        Store a value in the cache. Failures are reported but not fatal.
+
+        Args:
+            key: Cache key (see cache_key)
+            value: Picklable value
+        """
+        path = self._path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            zconsole.warning("Could not write cache entry", f"{path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prune(self, max_age=None, max_bytes=None):
+        """
+        Remove entries that were not used recently.
+
+        Args:
+            max_age: Remove entries unused for this many seconds, or None
+            max_bytes: Then remove the least recently used entries until the
+                cache is no larger than this, or None
+
+        Returns:
+            tuple: (number of removed entries, bytes freed)
+        """
+        now = time.time()
+        entries = []
+        try:
+            shards = os.listdir(self.directory)
+        except OSError:
+            return 0, 0
+        for shard in shards:
+            shard_dir = os.path.join(self.directory, shard)
+            try:
+                names = os.listdir(shard_dir)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(shard_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith(".tmp"):
+                    # Left behind by a killed process
+                    if now - st.st_mtime > 3600:
+                        entries.append((0, st.st_size, path))
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for mtime, size, path in entries:
+            expired = mtime == 0 or (max_age is not None and now - mtime > max_age)
+            if not expired and (max_bytes is None or total - freed <= max_bytes):
+                break  # Sorted by last use: every remaining entry is newer
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+def prune_caches(cache_dir, max_age_days=DEFAULT_CACHE_MAX_AGE, max_size_mb=None, force=False):
+    """
+    Prune the Markdown and highlighting caches, at most once a day.
+
+    Args:
+        cache_dir: Cache directory (CACHE_DIR)
+        max_age_days: Remove entries unused for this many days (0 or None keeps them)
+        max_size_mb: Size cap of each cache in megabytes, or None
+        force: Prune even if the caches were pruned recently
+
+    Returns:
+        tuple: (number of removed entries, bytes freed), or None if the
+        caches were pruned recently
+    """
+    stamp = os.path.join(cache_dir, CACHE_PRUNE_STAMP)
+    if not force:
+        try:
+            if time.time() - os.stat(stamp).st_mtime < CACHE_PRUNE_INTERVAL:
+                return None
+        except OSError:
+            pass
+    max_age = max_age_days * 24 * 3600 if max_age_days else None
+    max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+    removed = freed = 0
+    for name in PRUNED_CACHES:
+        count, size = DiskCache(os.path.join(cache_dir, name)).prune(max_age, max_bytes)
+        removed += count
+        freed += size
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(stamp, "w", encoding="utf-8"):
+            pass
+    except OSError as e:
+        zconsole.warning("Could not record the cache prune time", f"{stamp}: {e}")
+    return removed, freed
@@ -11,6 +11,7 @@ from pathlib import Path
 from zerodown import __version__
 from zerodown.config import load_config, create_default_config
 from zerodown.builder import build_site
+from zerodown.profiling import DEFAULT_PROFILE_TOP
 from zerodown.console import zconsole, ZerodownConsole
 
 
@@ -61,6 +62,38 @@ def main():
         '--config', default='config.py',
         help='Path to the configuration file (default: config.py)'
     )
+    build_parser.add_argument(
+        '--incremental', action='store_true',
+        help='Only rebuild pages whose sources, templates or config changed'
+    )
+    build_parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='Number of worker processes for parsing and rendering (0 = one per CPU, default: 1)'
+    )
+    build_parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Do not reuse parsed Markdown or highlighted code from the build cache'
+    )
+    build_parser.add_argument(
+        '--low-memory', action='store_true',
+        help='Keep only item summaries in memory, spilling page HTML to disk'
+    )
+    build_parser.add_argument(
+        '--profile', metavar='REPORT',
+        help='Write a JSON report with phase and per-page timings to REPORT'
+    )
+    build_parser.add_argument(
+        '--profile-top', type=int, default=DEFAULT_PROFILE_TOP, metavar='N',
+        help=f'Number of slowest pages and templates listed in the profile report (default: {DEFAULT_PROFILE_TOP})'
+    )
+    build_parser.add_argument(
+        '--trace', metavar='TRACE',
+        help='Write the build timeline to TRACE in the Chrome trace event format'
+    )
+    build_parser.add_argument(
+        '--precompress', action='store_true',
+        help='Write .gz (and .br, with the brotli module) copies of compressible outputs'
+    )
     
     # Add verbosity control to build command
     build_parser.add_argument(
@@ -86,6 +119,26 @@ def main():
         '--config', default='config.py',
         help='Path to the configuration file (default: config.py)'
     )
+    serve_parser.add_argument(
+        '--watch', action='store_true',
+        help='Rebuild changed pages and assets when the site sources change'
+    )
+    serve_parser.add_argument(
+        '--poll', action='store_true',
+        help='With --watch, poll for changes instead of using inotify'
+    )
+    serve_parser.add_argument(
+        '--no-livereload', action='store_true',
+        help='With --watch, do not reload open pages after a rebuild'
+    )
+    serve_parser.add_argument(
+        '--lazy', action='store_true',
+        help='Render pages when they are requested instead of building the site first (implies --watch)'
+    )
+    serve_parser.add_argument(
+        '--no-build', action='store_true',
+        help='Serve the existing output directory without building the site first'
+    )
     
     # Add verbosity control to serve command
     serve_parser.add_argument(
@@ -97,6 +150,50 @@ def main():
         help='Suppress all output except errors'
     )
     
+    # 'deps' command
+    deps_parser = subparsers.add_parser('deps', help='Show the pages that depend on a file')
+    deps_parser.add_argument('file', help='Template, include, content or config file')
+    deps_parser.add_argument(
+        'path', nargs='?', default='.',
+        help='Path to the site directory (default: current directory)'
+    )
+    deps_parser.add_argument(
+        '--config', default='config.py',
+        help='Path to the configuration file (default: config.py)'
+    )
+    
+    # Add verbosity control to deps command
+    deps_parser.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help='Increase output verbosity (can be used multiple times)'
+    )
+    deps_parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='Suppress all output except errors'
+    )
+    
+    # 'compile-templates' command
+    compile_parser = subparsers.add_parser('compile-templates',
+                                           help='Precompile templates into the template cache')
+    compile_parser.add_argument(
+        'path', nargs='?', default='.',
+        help='Path to the site directory (default: current directory)'
+    )
+    compile_parser.add_argument(
+        '--config', default='config.py',
+        help='Path to the configuration file (default: config.py)'
+    )
+    
+    # Add verbosity control to compile-templates command
+    compile_parser.add_argument(
+        '-v', '--verbose', action='count', default=0,
+        help='Increase output verbosity (can be used multiple times)'
+    )
+    compile_parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='Suppress all output except errors'
+    )
+    
     # Parse arguments
     args = parser.parse_args()
     
@@ -129,6 +226,8 @@ def main():
         config_path = args.config
         if not os.path.isabs(config_path):
             config_path = os.path.join(site_path, config_path)
+        profile_path = os.path.abspath(args.profile) if args.profile else None
+        trace_path = os.path.abspath(args.trace) if args.trace else None
         
         # Change to the specified directory
         original_dir = os.getcwd()
@@ -136,12 +235,20 @@ def main():
         
         try:
             config = load_config(config_path)
-            build_site(config)
+            build_site(config, incremental=args.incremental, jobs=args.jobs,
+                       use_cache=not args.no_cache, low_memory=args.low_memory,
+                       profile=profile_path, profile_top=args.profile_top,
+                       trace=trace_path, precompress=args.precompress or None)
         finally:
             # Change back to the original directory
             os.chdir(original_dir)
     elif args.command == 'serve':
-        serve_site(args.port, args.config, args.path)
+        serve_site(args.port, args.config, args.path, watch=args.watch, poll=args.poll,
+                   livereload=not args.no_livereload, lazy=args.lazy, build=not args.no_build)
+    elif args.command == 'deps':
+        show_dependents(args.file, args.config, args.path)
+    elif args.command == 'compile-templates':
+        precompile_templates(args.config, args.path)
     else:
         parser.print_help()
         sys.exit(0)
@@ -198,7 +305,84 @@ def init_site(path, template, config_format='yaml'):
         sys.exit(1)
 
 
-def serve_site(port, config_path, site_path='.'):
+def show_dependents(file_path, config_path, site_path='.'):
+    """
+    Print the output pages that depend on a file, according to the
+    dependency graph recorded by the last build.
+    
+    Args:
+        file_path: Template, include, content or config file
+        config_path: Path to the configuration file
+        site_path: Path to the site directory
+    """
+    from zerodown.deps import DependencyGraph
+    
+    # Get absolute paths before changing directory
+    file_path_abs = os.path.abspath(file_path)
+    site_path_abs = os.path.abspath(site_path)
+    config_path_abs = config_path
+    if not os.path.isabs(config_path_abs):
+        config_path_abs = os.path.join(site_path_abs, config_path)
+    
+    # Change to the specified directory
+    original_dir = os.getcwd()
+    os.chdir(site_path_abs)
+    
+    try:
+        config = load_config(config_path_abs)
+        graph = DependencyGraph.load(config)
+        if not graph.pages:
+            zconsole.warning("No dependency information found", "build the site first")
+            return
+        
+        dependents = graph.dependents(file_path_abs)
+        if dependents is None:
+            zconsole.info("Every page depends on", file_path)
+            dependents = sorted(graph.pages)
+        
+        zconsole.subheader(f"{len(dependents)} pages depend on {file_path}")
+        for output in dependents:
+            zconsole.print(output)
+    finally:
+        # Change back to the original directory
+        os.chdir(original_dir)
+
+
+def precompile_templates(config_path, site_path='.'):
+    """
+    Compile every template of a site into the persistent template cache.
+    
+    Args:
+        config_path: Path to the configuration file
+        site_path: Path to the site directory
+    """
+    from zerodown.templates import compile_templates
+    
+    # Get absolute paths before changing directory
+    site_path_abs = os.path.abspath(site_path)
+    config_path_abs = config_path
+    if not os.path.isabs(config_path_abs):
+        config_path_abs = os.path.join(site_path_abs, config_path)
+    
+    # Change to the specified directory
+    original_dir = os.getcwd()
+    os.chdir(site_path_abs)
+    
+    try:
+        config = load_config(config_path_abs)
+        compiled, failed = compile_templates(config)
+    finally:
+        # Change back to the original directory
+        os.chdir(original_dir)
+    
+    if failed:
+        zconsole.error(f"Compiled {compiled} templates, {failed} failed")
+        sys.exit(1)
+    zconsole.success(f"Compiled {compiled} templates")
+
+
+def serve_site(port, config_path, site_path='.', watch=False, poll=False, livereload=True, lazy=False,
+               build=True):
     """
     Serve the site locally.
     
@@ -206,6 +390,13 @@ def serve_site(port, config_path, site_path='.'):
         port: Port to serve on
         config_path: Path to the configuration file
         site_path: Path to the site directory
+        watch: Rebuild the site when its sources change
+        poll: Poll for changes instead of using inotify
+        livereload: With watch, reload open pages when their output changes
+        lazy: Render pages when they are requested instead of building the
+            site first (implies watch)
+        build: Build the site before serving it; when False the existing
+            output directory is served
     """
     # Get absolute paths before changing directory
     site_path_abs = os.path.abspath(site_path)
@@ -218,22 +409,83 @@ def serve_site(port, config_path, site_path='.'):
     os.chdir(site_path_abs)
     
     try:
-        # First build the site
+        # First build the site, or only index it when pages are rendered on request
         config = load_config(config_path_abs)
-        build_site(config)
+        lazy_site = None
+        live_site = None
+        if lazy:
+            from zerodown.lazy import LazySite
+            watch = True  # Cached pages are invalidated when files change
+            lazy_site = LazySite(config)
+        elif watch:
+            from zerodown.rebuild import LiveSite
+            # The parsed site stays in memory, so changes only update what they affect
+            live_site = LiveSite(config)
+            if build:
+                live_site.build()
+        elif build:
+            build_site(config)
+        if not (lazy or build) and not os.path.isdir(config.OUTPUT_DIR):
+            zconsole.error("Output directory not found", f"'{config.OUTPUT_DIR}' (build the site first)")
+            sys.exit(1)
         
         # Then serve it
-        import http.server
-        import socketserver
+        from zerodown.server import StaticServer, StaticFileHandler
+        from zerodown.livereload import LiveReloadHub, LiveReloadHandler
         
-        class Handler(http.server.SimpleHTTPRequestHandler):
+        hub = LiveReloadHub() if watch and livereload else None
+        if lazy:
+            from zerodown.lazy import LazyHandler
+            base_handler = LazyHandler
+        else:
+            base_handler = LiveReloadHandler if hub else StaticFileHandler
+        
+        class Handler(base_handler):
+            # The published directory: while a build runs, config.OUTPUT_DIR
+            # points at its staging directory
+            output_dir = os.path.abspath(config.OUTPUT_DIR)
+            
             def __init__(self, *args, **kwargs):
-                super().__init__(*args, directory=config.OUTPUT_DIR, **kwargs)
+                super().__init__(*args, directory=self.output_dir, **kwargs)
+        Handler.hub = hub
+        Handler.site = lazy_site
         
-        with socketserver.TCPServer(("", port), Handler) as httpd:
+        # A thread per connection: event streams and keep-alive connections stay open
+        with StaticServer(("", port), Handler) as httpd:
             zconsole.success(f"Serving at http://localhost:{port}")
             zconsole.info("Press Ctrl+C to stop")
-            httpd.serve_forever()
+            if not watch:
+                httpd.serve_forever()
+            else:
+                import threading
+                from zerodown.watch import SiteWatcher
+                
+                # Serve from a background thread while this one rebuilds
+                server_thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+                server_thread.start()
+                watcher = SiteWatcher(config, config_path_abs, poll=poll)
+                zconsole.info(f"Watching for changes ({watcher.mode})"
+                              + (", live reload enabled" if hub else ""))
+                try:
+                    while True:
+                        changes = watcher.wait()
+                        if lazy:
+                            config, reloaded = _update_lazy_site(Handler, config_path_abs, watcher,
+                                                                 changes, hub)
+                        else:
+                            live_site, reloaded = _rebuild_site(live_site, config_path_abs, watcher,
+                                                                changes, hub)
+                            config = live_site.config
+                        if reloaded:
+                            # Directories may have moved
+                            Handler.output_dir = os.path.abspath(config.OUTPUT_DIR)
+                            watcher.close()
+                            watcher = SiteWatcher(config, config_path_abs, poll=poll)
+                finally:
+                    watcher.close()
+                    if hub:
+                        hub.close()
+                    httpd.shutdown()
     except KeyboardInterrupt:
         zconsole.info("\nServer stopped")
     except Exception as e:
@@ -244,5 +496,99 @@ def serve_site(port, config_path, site_path='.'):
         os.chdir(original_dir)
 
 
+def _report_changes(changes):
+    """Print the first few changed paths."""
+    shown = ", ".join(os.path.relpath(path) for path in changes[:3])
+    if len(changes) > 3:
+        shown += f" and {len(changes) - 3} more"
+    zconsole.info("Changed", shown)
+
+
+def _update_lazy_site(handler, config_path, watcher, changes, hub=None):
+    """
+    Invalidate the pages of a lazily rendered site after its sources changed.
+    
+    Args:
+        handler: Request handler class whose ``site`` is the LazySite served
+        config_path: Path to the configuration file
+        watcher: SiteWatcher that reported the changes
+        changes: List of changed paths
+        hub: Optional LiveReloadHub notified of the changed pages and assets
+        
+    Returns:
+        tuple: (configuration to use from now on, whether it was reloaded)
+    """
+    from zerodown.lazy import LazySite
+    
+    _report_changes(changes)
+    site = handler.site
+    if watcher.config_changed(changes):
+        try:
+            config = load_config(config_path)
+        except SystemExit:
+            zconsole.error("Configuration could not be loaded, keeping the previous one")
+            return site.config, False
+        handler.site = LazySite(config, site.cache_size)
+        if hub:
+            # Every page may have changed
+            hub.publish(list(site.cache))
+        return config, True
+    
+    changed, removed = site.update(changes)
+    if hub and (changed or removed):
+        zconsole.info("Live reload", f"{len(changed) + len(removed)} changed files, "
+                                     f"{hub.client_count} open pages")
+        hub.publish(changed, removed)
+    return site.config, False
+
+
+def _rebuild_site(live_site, config_path, watcher, changes, hub=None):
+    """
+    Update a site in-process after its sources changed.
+    
+    Only the pages and assets affected by the changes are updated (see
+    LiveSite). A changed configuration, or changes the dependency graph
+    does not cover, rebuild the site incrementally instead.
+    
+    Args:
+        live_site: LiveSite being served
+        config_path: Path to the configuration file
+        watcher: SiteWatcher that reported the changes
+        changes: List of changed paths
+        hub: Optional LiveReloadHub notified of the changed output files
+        
+    Returns:
+        tuple: (LiveSite to use from now on, whether the configuration was reloaded)
+    """
+    import time
+    from zerodown.rebuild import LiveSite
+    from zerodown.livereload import snapshot_outputs, diff_outputs
+    
+    _report_changes(changes)
+    reloaded = watcher.config_changed(changes)
+    if reloaded:
+        try:
+            live_site = LiveSite(load_config(config_path))
+        except SystemExit:
+            zconsole.error("Configuration could not be loaded, keeping the previous one")
+            reloaded = False
+    config = live_site.config
+    
+    start = time.perf_counter()
+    result = None if reloaded else live_site.update(changes)
+    if result is not None:
+        zconsole.success(f"Updated in {(time.perf_counter() - start) * 1000:.0f} ms")
+        changed, removed = result
+    else:
+        before = snapshot_outputs(config.OUTPUT_DIR) if hub else None
+        if live_site.build():
+            zconsole.success(f"Rebuilt in {(time.perf_counter() - start) * 1000:.0f} ms")
+        changed, removed = diff_outputs(before, snapshot_outputs(config.OUTPUT_DIR)) if hub else ([], [])
+    if hub and (changed or removed):
+        zconsole.info("Live reload", f"{len(changed) + len(removed)} changed files, "
+                                     f"{hub.client_count} open pages")
+        hub.publish(changed, removed)
+    return live_site, reloaded
+
 if __name__ == "__main__":
     main()
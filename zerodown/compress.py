@@ -0,0 +1,318 @@
+"""
+Build-time precompression for the Zerodown static site generator.
+
+After a build, every compressible output (HTML, CSS, JavaScript, XML and
+so on) gets a ``.gz`` sibling, and a ``.br`` sibling when the ``brotli``
+module is installed, so web servers and CDNs can send them as they are
+instead of compressing each response. Files are compressed on the build's
+worker processes at the highest levels, since it happens once per change.
+
+Compression is incremental: a record in the cache directory lists the
+size and modification time of each original, and siblings get the
+modification time of their original, so unchanged files are skipped.
+Small files, and files whose compressed copy would not be meaningfully
+smaller, get no sibling.
+"""
+
+import os
+import json
+import zlib
+
+from zerodown.parallel import run_tasks
+from zerodown.utils import get_cache_dir
+from zerodown.staging import published_output_dir
+from zerodown.console import zconsole
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MANIFEST_FILENAME = "compress.json"
+COMPRESS_MANIFEST_FORMAT = 1
+
+# Content codings and the suffix of their siblings
+COMPRESS_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+
+# Output types worth compressing (images, fonts and archives already are)
+DEFAULT_PRECOMPRESS_EXTENSIONS = ('.html', '.htm', '.css', '.js', '.mjs', '.json', '.xml', '.rss',
+                                  '.atom', '.svg', '.txt', '.map', '.webmanifest')
+
+# Files smaller than this (bytes) fit in a packet or two either way
+DEFAULT_PRECOMPRESS_MIN_SIZE = 256
+
+# A sibling is kept only if it is at least this fraction smaller than its original
+DEFAULT_PRECOMPRESS_MIN_SAVINGS = 0.1
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def available_encodings():
+    """
+    List the content codings that can be produced.
+
+    Returns:
+        list: 'gzip', plus 'br' if the brotli module is installed
+    """
+    return ['gzip', 'br'] if brotli is not None else ['gzip']
+
+
+def compress_data(data, encoding):
+    """
+    Compress data with a content coding.
+
+    gzip output carries no timestamp or file name, so it only depends on
+    the data.
+
+    Args:
+        data: Bytes to compress
+        encoding: 'gzip' or 'br'
+
+    Returns:
+        bytes: Compressed data
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_file(state, task):
+    """
+    Write the compressed siblings of one output file (runs in a worker).
+
+    Args:
+        state: (output directory, encodings, minimum savings)
+        task: (path relative to the output directory, size, modification time)
+
+    Returns:
+        tuple: (relative path, encodings written), or None on error
+    """
+    output_dir, encodings, min_savings = state
+    key, size, mtime_ns = task
+    path = os.path.join(output_dir, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        zconsole.error("Error reading output for compression", f"{path}: {e}")
+        return None
+
+    written = []
+    for encoding in encodings:
+        sibling = path + COMPRESS_SUFFIXES[encoding]
+        compressed = compress_data(data, encoding)
+        if len(compressed) > len(data) * (1 - min_savings):
+            # Not worth it: leave no sibling, not even one from an earlier build
+            try:
+                if os.path.lexists(sibling):
+                    os.remove(sibling)
+            except OSError as e:
+                zconsole.error("Error removing compressed output", f"{sibling}: {e}")
+                return None
+            continue
+        # Replace rather than overwrite: the sibling may be hard-linked into the previous build
+        tmp_path = f"{sibling}.tmp-{os.getpid()}"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            # Siblings carry the original's timestamp, which marks them up to date
+            os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+            os.replace(tmp_path, sibling)
+        except OSError as e:
+            zconsole.error("Error writing compressed output", f"{sibling}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        written.append(encoding)
+    return key, written
+
+
+class Precompressor:
+    """
+    Writes and maintains compressed siblings of a build's output files.
+
+    Call keep() while cleaning the output directory, so existing siblings
+    survive, then run() once the build's outputs are complete, and save()
+    once they are published. When precompression is disabled, run() removes
+    the siblings of earlier builds.
+    """
+
+    def __init__(self, config, enabled=None, reuse=True):
+        """
+        Args:
+            config: Configuration module with OUTPUT_DIR defined
+            enabled: Compress outputs; None uses the PRECOMPRESS setting
+            reuse: Trust the previous compression record; False recompresses
+                every file
+        """
+        self.config = config
+        self.enabled = bool(getattr(config, 'PRECOMPRESS', False) if enabled is None else enabled)
+        self.output_root = published_output_dir(config)
+        self.path = os.path.join(get_cache_dir(config), COMPRESS_MANIFEST_FILENAME)
+        self.encodings = available_encodings()
+        extensions = getattr(config, 'PRECOMPRESS_EXTENSIONS', None) or DEFAULT_PRECOMPRESS_EXTENSIONS
+        self.extensions = tuple(sorted(ext.lower() if ext.startswith('.') else f".{ext.lower()}"
+                                       for ext in extensions))
+        self.min_size = int(getattr(config, 'PRECOMPRESS_MIN_SIZE', DEFAULT_PRECOMPRESS_MIN_SIZE) or 0)
+        self.min_savings = float(getattr(config, 'PRECOMPRESS_MIN_SAVINGS', DEFAULT_PRECOMPRESS_MIN_SAVINGS) or 0)
+        self.reuse = reuse
+        self.previous = self._load()
+        self.files = {}
+        self.compressed = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.removed = 0
+
+    def _settings(self):
+        """Settings that affect the siblings; changing any recompresses every file."""
+        return {
+            "encodings": self.encodings,
+            "extensions": list(self.extensions),
+            "min_size": self.min_size,
+            "min_savings": self.min_savings,
+            "gzip_level": GZIP_LEVEL,
+            "brotli_quality": BROTLI_QUALITY,
+        }
+
+    def _load(self):
+        """Load the compression record of the previous build."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (data.get("format") != COMPRESS_MANIFEST_FORMAT
+                or data.get("output_dir") != self.output_root):
+            return {}
+        files = data.get("files", {})
+        if not self.reuse or data.get("settings") != self._settings():
+            # Every file is compressed again, but siblings that are no longer
+            # wanted must still be removed
+            return {key: {"encodings": entry.get("encodings", [])} for key, entry in files.items()}
+        return files
+
+    @property
+    def output_dir(self):
+        """The directory the current build writes to."""
+        return self.config.OUTPUT_DIR
+
+    def is_compressible(self, key):
+        """Check whether an output path has a compressible type."""
+        return key.lower().endswith(self.extensions)
+
+    def keep(self, outputs):
+        """
+        Return the sibling paths to keep alongside a set of outputs.
+
+        Args:
+            outputs: Output paths relative to OUTPUT_DIR
+
+        Returns:
+            set: Sibling paths relative to OUTPUT_DIR (empty when disabled)
+        """
+        if not self.enabled:
+            return set()
+        return {key + COMPRESS_SUFFIXES[encoding]
+                for key in outputs if self.is_compressible(key)
+                for encoding in self.encodings}
+
+    def _is_unchanged(self, key, st):
+        """Check whether the siblings of an output are up to date."""
+        previous = self.previous.get(key)
+        if (not previous or previous.get("size") != st.st_size
+                or previous.get("mtime_ns") != st.st_mtime_ns):
+            return False
+        for encoding in previous.get("encodings", []):
+            try:
+                sibling_st = os.stat(os.path.join(self.output_dir, key + COMPRESS_SUFFIXES[encoding]))
+            except OSError:
+                return False
+            if sibling_st.st_mtime_ns != st.st_mtime_ns:
+                return False
+        return True
+
+    def run(self, outputs, jobs=1):
+        """
+        Compress new and changed outputs and remove siblings that are no
+        longer wanted. Call save() once the build is published.
+
+        Args:
+            outputs: Output paths relative to OUTPUT_DIR ('/' separators)
+            jobs: Number of worker processes
+
+        Returns:
+            int: Number of files compressed
+        """
+        tasks = []
+        if self.enabled:
+            for key in sorted(outputs):
+                if not self.is_compressible(key):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.output_dir, key))  # Follows symlinked assets
+                except OSError:
+                    continue
+                if st.st_size < self.min_size:
+                    continue
+                entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                if self._is_unchanged(key, st):
+                    entry["encodings"] = self.previous[key].get("encodings", [])
+                    self.unchanged += 1
+                else:
+                    tasks.append((key, st.st_size, st.st_mtime_ns))
+                self.files[key] = entry
+
+        state = (self.output_dir, self.encodings, self.min_savings)
+        for task, result in zip(tasks, run_tasks(_compress_file, tasks, jobs, state)):
+            key = task[0]
+            if result is None:
+                self.files.pop(key, None)
+                continue
+            self.files[key]["encodings"] = result[1]
+            self.compressed += 1
+            if not result[1]:
+                self.skipped += 1
+
+        self._remove_unwanted()
+        return self.compressed
+
+    def _remove_unwanted(self):
+        """Remove siblings of outputs that are gone, too small or no longer compressed."""
+        for key, entry in sorted(self.previous.items()):
+            wanted = self.files.get(key, {}).get("encodings", [])
+            for encoding in entry.get("encodings", []):
+                if encoding in wanted or encoding not in COMPRESS_SUFFIXES:
+                    continue
+                path = os.path.join(self.output_dir, key + COMPRESS_SUFFIXES[encoding])
+                if os.path.lexists(path):
+                    try:
+                        os.remove(path)
+                        self.removed += 1
+                    except OSError as e:
+                        zconsole.error("Error removing compressed output", f"{path}: {e}")
+
+    def save(self):
+        """Write the compression record, or remove it when precompression is off."""
+        if not self.enabled:
+            if os.path.exists(self.path):
+                try:
+                    os.remove(self.path)
+                except OSError as e:
+                    zconsole.error("Error removing compression record", f"{self.path}: {e}")
+            return
+        data = {
+            "format": COMPRESS_MANIFEST_FORMAT,
+            "output_dir": self.output_root,
+            "settings": self._settings(),
+            "files": self.files,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            zconsole.error("Error writing compression record", f"{self.path}: {e}")
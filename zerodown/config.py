@@ -106,6 +106,9 @@ def _validate_config(config):
         
     if not hasattr(config, 'THEME_CSS_FILE'):
         config.THEME_CSS_FILE = 'main.css'
+        
+    if not hasattr(config, 'CACHE_DIR'):
+        config.CACHE_DIR = '.zerodown-cache'
 
 
 def _load_yaml_config(config_path):
@@ -140,10 +143,35 @@ def _load_yaml_config(config_path):
     config.STYLES_DIR = os.path.join(base_dir, config_data.get('styles_dir', 'styles'))
     config.STATIC_DIR = os.path.join(base_dir, config_data.get('static_dir', 'static'))
     config.OUTPUT_DIR = os.path.join(base_dir, config_data.get('output_dir', '_site'))
+    config.CACHE_DIR = os.path.join(base_dir, config_data.get('cache_dir', '.zerodown-cache'))
+    config.CACHE_MAX_AGE = config_data.get('cache_max_age', 30)
+    config.CACHE_MAX_SIZE = config_data.get('cache_max_size', None)
     
     # Set theme settings
     config.THEME_CSS_FILE = config_data.get('theme_css_file', 'main.css')
     
+    # Set code highlighting settings
+    config.HIGHLIGHT_GUESS_LANG = config_data.get('highlight_guess_lang', 'pygments')
+    
+    # Set templates rendered straight to their output files
+    config.STREAM_TEMPLATES = config_data.get('stream_templates', [])
+    
+    # Set how static and content assets are synced to the output directory
+    config.ASSET_COMPARE = config_data.get('asset_compare', 'mtime')
+    config.ASSET_THREADS = config_data.get('asset_threads', 8)
+    config.ASSET_COPY_MODE = config_data.get('asset_copy_mode', 'copy')
+    
+    # Set how a finished build replaces the output directory
+    config.OUTPUT_SWAP = config_data.get('output_swap', 'rename')
+    config.WRITE_IF_CHANGED = config_data.get('write_if_changed', True)
+    config.WRITER_THREADS = config_data.get('writer_threads', 4)
+    
+    # Set build-time compression of the outputs
+    config.PRECOMPRESS = config_data.get('precompress', False)
+    config.PRECOMPRESS_EXTENSIONS = config_data.get('precompress_extensions', None)
+    config.PRECOMPRESS_MIN_SIZE = config_data.get('precompress_min_size', 256)
+    config.PRECOMPRESS_MIN_SAVINGS = config_data.get('precompress_min_savings', 0.1)
+    
     # Set sections
     config.SECTIONS = config_data.get('sections', {})
 
@@ -164,7 +192,22 @@ def _load_yaml_config(config_path):
     config.STYLES_DIR = config.STYLES_DIR
     config.STATIC_DIR = config.STATIC_DIR
     config.OUTPUT_DIR = config.OUTPUT_DIR
+    config.CACHE_DIR = config.CACHE_DIR
+    config.CACHE_MAX_AGE = config.CACHE_MAX_AGE
+    config.CACHE_MAX_SIZE = config.CACHE_MAX_SIZE
     config.THEME_CSS_FILE = config.THEME_CSS_FILE
+    config.HIGHLIGHT_GUESS_LANG = config.HIGHLIGHT_GUESS_LANG
+    config.STREAM_TEMPLATES = config.STREAM_TEMPLATES
+    config.ASSET_COMPARE = config.ASSET_COMPARE
+    config.ASSET_THREADS = config.ASSET_THREADS
+    config.ASSET_COPY_MODE = config.ASSET_COPY_MODE
+    config.OUTPUT_SWAP = config.OUTPUT_SWAP
+    config.WRITE_IF_CHANGED = config.WRITE_IF_CHANGED
+    config.WRITER_THREADS = config.WRITER_THREADS
+    config.PRECOMPRESS = config.PRECOMPRESS
+    config.PRECOMPRESS_EXTENSIONS = config.PRECOMPRESS_EXTENSIONS
+    config.PRECOMPRESS_MIN_SIZE = config.PRECOMPRESS_MIN_SIZE
+    config.PRECOMPRESS_MIN_SAVINGS = config.PRECOMPRESS_MIN_SAVINGS
     config.SECTIONS = config.SECTIONS
     config.NAV_ITEMS = config.NAV_ITEMS
     config.ADDITIONAL_CSS_FILES = config.ADDITIONAL_CSS_FILES
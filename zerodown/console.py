@@ -6,6 +6,7 @@ This module provides styled, colorful terminal output for Zerodown using the ric
 
 import sys
 import time
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any, Union
 
 from rich.console import Console
@@ -40,6 +41,7 @@ class ZerodownConsole:
         self._progress = None
         self._live = None
         self._task_ids = {}
+        self._captured = None
         self.verbosity = verbosity
         
     def header(self, title: str):
@@ -66,6 +68,9 @@ class ZerodownConsole:
             message: The action or message description
             data: Optional data associated with the message
         """
+        if self._captured is not None:
+            self._captured.append(("info", message, data))
+            return
         if self.verbosity >= self.NORMAL:
             if data:
                 self.console.print(f"[cyan]ℹ[/] [bold]{message}[/] [dim cyan]→[/] [italic]{data}[/]")
@@ -79,6 +84,9 @@ class ZerodownConsole:
             message: The action or message description
             data: Optional data associated with the message
         """
+        if self._captured is not None:
+            self._captured.append(("success", message, data))
+            return
         if self.verbosity >= self.MINIMAL:
             if data:
                 self.console.print(f"[green]✓[/] [bold]{message}[/] [dim green]→[/] [italic]{data}[/]")
@@ -92,6 +100,9 @@ class ZerodownConsole:
             message: The action or message description
             data: Optional data associated with the message
         """
+        if self._captured is not None:
+            self._captured.append(("warning", message, data))
+            return
         if self.verbosity >= self.MINIMAL:
             if data:
                 self.console.print(f"[yellow]⚠[/] [bold]{message}[/] [dim yellow]→[/] [italic]{data}[/]")
@@ -105,11 +116,37 @@ class ZerodownConsole:
             message: The action or message description
             data: Optional data associated with the message
         """
+        if self._captured is not None:
+            self._captured.append(("error", message, data))
+            return
         if data:
             self.error_console.print(f"[bold red]✗ ERROR:[/] [bold]{message}[/] [dim red]→[/] [italic]{data}[/]")
         else:
             self.error_console.print(f"[bold red]✗ ERROR:[/] {message}")
         
+    @contextmanager
+    def capture(self):
+        """
+        Collect messages instead of printing them.
+        
+        Used by worker processes so their messages can be replayed by the
+        main process in a deterministic order.
+        
+        Yields:
+            list: Captured (level, message, data) tuples
+        """
+        previous = self._captured
+        self._captured = []
+        try:
+            yield self._captured
+        finally:
+            self._captured = previous
+            
+    def replay(self, messages: List[tuple]):
+        """Display messages previously collected with capture()."""
+        for level, message, data in messages:
+            getattr(self, level)(message, data)
+        
     def start_progress(self, description: str = "Building site"):
         """Start a progress display."""
         if self._progress is not None:
@@ -7,53 +7,88 @@ import datetime
 import sys
 from pathlib import Path
 from zerodown.markdown import parse_markdown_file
-from zerodown.templates import render_template
-from zerodown.utils import write_output_file
+from zerodown.shortcodes import process_shortcodes
+from zerodown.templates import render_page
+from zerodown.parallel import run_tasks
+from zerodown.profiling import current_page
 from zerodown.console import zconsole
 
 
-def process_section(config, jinja_env, section_key, section_config, all_items):
+def parse_sections(config, jobs=1, spill=None):
     """
-    Process a single section of content.
+    Parse the Markdown files of every section (the first build phase).
+    
+    All files in the content tree are parsed before any page is rendered, so
+    every page can see the complete site. Shortcodes are expanded afterwards
+    by expand_shortcodes, once the site index is complete.
+    
+    Args:
+        config: Configuration module
+        jobs: Number of worker processes for parsing
+        spill: Optional SpillStore receiving HTML that would stay in memory
+        
+    Returns:
+        dict: Sorted items per section key, in the order of config.SECTIONS
+    """
+    sections = {}
+    tasks = []
+    for section_key, section_config in config.SECTIONS.items():
+        section_tasks = list_section_files(config, section_key, section_config)
+        if section_tasks is None:
+            continue
+        sections[section_key] = []
+        tasks.extend(section_tasks)
+    
+    # Parse the markdown files of all sections, in parallel if several jobs were requested.
+    # In low-memory mode the HTML stays in the Markdown cache until a page needs it
+    state = {"config": config, "lazy_content": spill is not None}
+    for parsed_item in run_tasks(_parse_section_item, tasks, jobs, state):
+        if parsed_item:  # Check if parsing succeeded
+            if spill is not None:
+                spill.spill(parsed_item)
+            sections[parsed_item.section_key].append(parsed_item)
+    
+    # Sort items if configured
+    for section_key, section_items in sections.items():
+        section_config = config.SECTIONS[section_key]
+        sort_items(section_items, section_config, section_key)
+        zconsole.info(f"Sorted {len(section_items)} items by '{section_config.get('sort_by', 'date')}' (reverse={section_config.get('sort_reverse', True)})")
+    
+    return sections
+
+
+def list_section_files(config, section_key, section_config):
+    """
+    List the Markdown files of a section with their output paths.
     
     Args:
         config: Configuration module
-        jinja_env: Jinja2 environment
         section_key: Key identifying the section
         section_config: Configuration for this section
-        all_items: List to which processed items will be added
         
     Returns:
-        list: Processed items for this section
+        list: Tuples of (section_key, filepath, output_path), or None if the
+        section has to be skipped
     """
     if not isinstance(section_config, dict):
         zconsole.warning(f"Invalid configuration for section '{section_key}'. Skipping.")
-        return []
+        return None
 
-    section_title = section_config.get('title', section_key.capitalize())  # Default title
-    
     section_content_dir = os.path.join(config.CONTENT_DIR, section_key)
     section_output_dir = os.path.join(config.OUTPUT_DIR, section_key)
 
     if not os.path.isdir(section_content_dir):
         zconsole.warning(f"Content directory not found for section '{section_key}': {section_content_dir}. Skipping section.")
-        return []  # Skip this section if content dir doesn't exist
-
-    try:
-        os.makedirs(section_output_dir, exist_ok=True)  # Ensure output dir exists
-    except OSError as e:
-        zconsole.error(f"Failed to create output directory '{section_output_dir}': {e}. Skipping section.")
-        return []
+        return None  # Skip this section if content dir doesn't exist
 
-    section_items = []
-
-    # Find and parse all markdown files in the section directory
+    # Find all markdown files in the section directory
     try:
         filenames = os.listdir(section_content_dir)
     except OSError as e:
         zconsole.error(f"Error reading content directory '{section_content_dir}': {e}. Skipping section.")
-        return []
+        return None
 
+    tasks = []
     for filename in filenames:
         if filename.lower().endswith(".md") and not filename.startswith('.'):  # Ignore hidden files
             filepath = os.path.join(section_content_dir, filename)
@@ -61,47 +96,164 @@ def process_section(config, jinja_env, section_key, section_config, all_items):
                 # Determine the output path for this item
                 output_filename = os.path.splitext(filename)[0] + '.html'
                 output_path = os.path.join(section_output_dir, output_filename)
-                
-                # Create context for shortcode processing
-                item_context = {
-                    "config": config,
-                    "section_key": section_key,
-                    "section_config": section_config,
-                    "latest_items": all_items  # Pass existing items for dynamic content
-                }
-                
-                # Parse the markdown file with asset handling and shortcode processing
-                parsed_item = parse_markdown_file(
-                    filepath, 
-                    output_path=output_path, 
-                    base_url=config.BASE_URL,
-                    context=item_context
-                )
-                
-                if parsed_item:  # Check if parsing succeeded
-                    # Add URL and section info
-                    parsed_item["url"] = f"/{section_key}/{parsed_item['slug']}.html"
-                    parsed_item["section_key"] = section_key
-                    section_items.append(parsed_item)
+                tasks.append((section_key, filepath, output_path))
+    return tasks
 
-    # Sort items if configured
-    sort_items(section_items, section_config, section_key)
-    zconsole.info(f"Sorted {len(section_items)} items by '{section_config.get('sort_by', 'date')}' (reverse={section_config.get('sort_reverse', True)})")
+
+def parse_section_file(config, section_key, filepath):
+    """
+    Parse a single Markdown file of a section, e.g. after it changed.
+    
+    Args:
+        config: Configuration module
+        section_key: Key identifying the section
+        filepath: Path to the Markdown file
+        
+    Returns:
+        ContentItem: Parsed item with URL and section info (shortcodes not
+        expanded), or None on failure
+    """
+    output_filename = os.path.splitext(os.path.basename(filepath))[0] + '.html'
+    output_path = os.path.join(config.OUTPUT_DIR, section_key, output_filename)
+    return _parse_section_item({"config": config}, (section_key, filepath, output_path))
+
+
+def _parse_section_item(state, task):
+    """
+    Parse a single section item (runs in a worker process when building in parallel).
+    
+    Args:
+        state: Dictionary with config and lazy_content
+        task: Tuple of (section_key, filepath, output_path)
+        
+    Returns:
+        dict: Parsed item with URL and section info, or None on failure
+    """
+    section_key, filepath, output_path = task
+    config = state["config"]
+    
+    # Parse the markdown file with asset handling (shortcodes are expanded later).
+    # Lazy content is read back from the Markdown cache on every access, so it
+    # is only used when memory matters more than the extra reads
+    parsed_item = parse_markdown_file(
+        filepath, 
+        output_path=output_path, 
+        base_url=config.BASE_URL,
+        lazy_content=state.get("lazy_content", False)
+    )
+    
+    if parsed_item:  # Check if parsing succeeded
+        # Add URL and section info
+        parsed_item.url = f"/{section_key}/{parsed_item.slug}.html"
+        parsed_item.section_key = section_key
+    return parsed_item
+
+
+def expand_shortcodes(config, all_items, site, jobs=1, spill=None, indices=None):
+    """
+    Expand shortcodes in the content of every section item.
+    
+    Runs after all content has been parsed, so shortcodes see the complete,
+    frozen site index regardless of the section they appear in.
+    
+    Args:
+        config: Configuration module
+        all_items: List of all content items (updated in place)
+        site: Frozen SiteIndex over all_items
+        jobs: Number of worker processes
+        spill: Optional SpillStore receiving the expanded HTML
+        indices: Positions in all_items of the items to expand; None expands
+            every item
+    """
+    if indices is None:
+        indices = range(len(all_items))
+    # Only content with a bracket can contain shortcodes
+    tasks = [index for index in indices if '[' in (all_items[index].content_html or "")]
+    state = {
+        "config": config,
+        "all_items": all_items,
+        "site": site
+    }
+    for index, html_content in zip(tasks, run_tasks(_expand_item_shortcodes, tasks, jobs, state)):
+        if html_content is not None:
+            all_items[index].content_html = html_content
+            if spill is not None:
+                spill.spill(all_items[index])
+
+
+def _expand_item_shortcodes(state, index):
+    """
+    Expand the shortcodes of one item (runs in a worker process when building in parallel).
+    
+    Args:
+        state: Dictionary with config, all_items and site
+        index: Index of the item in all_items
+        
+    Returns:
+        str: Content HTML with shortcodes replaced, or None if nothing changed
+    """
+    config = state["config"]
+    item = state["all_items"][index]
+    item_context = shortcode_context(config, item, state["all_items"], state["site"])
+    html_content = item.content_html
+    with current_page(os.path.join(config.OUTPUT_DIR, item.section_key, f"{item.slug}.html")):
+        expanded = process_shortcodes(html_content, item_context)
+    return expanded if expanded != html_content else None
+
+
+def shortcode_context(config, item, all_items, site):
+    """
+    Create the context for expanding the shortcodes of a section item.
+    
+    Args:
+        config: Configuration module
+        item: Section item whose content is expanded
+        all_items: List of all content items
+        site: Frozen SiteIndex over all_items
+        
+    Returns:
+        dict: Shortcode context
+    """
+    return {
+        "config": config,
+        "section_key": item.section_key,
+        "section_config": config.SECTIONS.get(item.section_key, {}),
+        "latest_items": all_items,  # Pass all items for dynamic content
+        "site": site
+    }
+
+
+def render_section(config, jinja_env, section_key, section_config, section_items, manifest=None, jobs=1):
+    """
+    Render the item pages and the list page of a section (the second build phase).
+    
+    Args:
+        config: Configuration module
+        jinja_env: Jinja2 environment
+        section_key: Key identifying the section
+        section_config: Configuration for this section
+        section_items: Parsed, sorted items of this section
+        manifest: Optional BuildManifest used to skip unchanged pages
+        jobs: Number of worker processes for rendering
+    """
+    section_title = section_config.get('title', section_key.capitalize())  # Default title
+    section_output_dir = os.path.join(config.OUTPUT_DIR, section_key)
+
+    try:
+        os.makedirs(section_output_dir, exist_ok=True)  # Ensure output dir exists
+    except OSError as e:
+        zconsole.error(f"Failed to create output directory '{section_output_dir}': {e}. Skipping section.")
+        return
 
     # Build individual pages for each item
     zconsole.info(f"Building {len(section_items)} individual pages using template '{section_config.get('template', 'page.html')}'...")
-    build_item_pages(config, jinja_env, section_items, section_config)
+    build_item_pages(config, jinja_env, section_items, section_config, manifest, jobs)
 
     # Build section list page
     list_template = section_config.get('list_template', 'list.html')
     index_path = f"{section_output_dir}/index.html"
     zconsole.info(f"Building section list page '{index_path}' using template '{list_template}'...")
-    build_section_list(config, jinja_env, section_items, section_config, section_key, section_title)
-
-    # Add items to the global list
-    all_items.extend(section_items)
-    
-    return section_items
+    build_section_list(config, jinja_env, section_items, section_config, section_key, section_title, manifest)
 
 
 def sort_items(items, config, section_key):
@@ -121,7 +273,7 @@ def sort_items(items, config, section_key):
 
     # Handle cases where the sort key might be missing or have incompatible types
     def get_sort_value(item):
-        value = item['metadata'].get(sort_key)
+        value = item.metadata.get(sort_key)
         if value is None:
             # Provide default fallback values for sorting if key is missing
             if isinstance(sort_key, str) and 'date' in sort_key:
@@ -137,7 +289,7 @@ def sort_items(items, config, section_key):
         zconsole.warning(f"Could not sort section '{section_key}' by '{sort_key}'. Check data types are comparable. Error: {e}")
 
 
-def build_item_pages(config, jinja_env, items, section_config):
+def build_item_pages(config, jinja_env, items, section_config, manifest=None, jobs=1):
     """
     Build individual HTML pages for each content item.
     
@@ -146,27 +298,86 @@ def build_item_pages(config, jinja_env, items, section_config):
         jinja_env: Jinja2 environment
         items: List of content items
         section_config: Configuration for this section
+        manifest: Optional BuildManifest used to skip unchanged pages
+        jobs: Number of worker processes for rendering
     """
     if not items:
         return
         
     item_template = section_config.get("template", "page.html")  # Default to page.html
     
-    for item in items:
-        output_path = os.path.join(config.OUTPUT_DIR, item["section_key"], f"{item['slug']}.html")
-        page_title = f"{item['metadata'].get('title', 'Untitled')} - {config.SITE_NAME}"
+    # Work out which pages need rendering (and their manifest digests)
+    tasks = []
+    digests = {}
+    for index, item in enumerate(items):
+        output_path = os.path.join(config.OUTPUT_DIR, item.section_key, f"{item.slug}.html")
+        
+        if manifest is not None:
+            digest = manifest.page_digest(output_path, item_template, sources=[item.filepath])
+            if manifest.is_fresh(output_path, digest):
+                continue
+            digests[index] = digest
+        
+        tasks.append(index)
+    
+    # Compile the template once, so forked workers inherit it instead of each loading it
+    if tasks and jobs > 1:
+        try:
+            jinja_env.get_template(item_template)
+        except Exception:
+            pass  # Reported when the page is rendered
+    
+    render_state = {
+        "config": config,
+        "jinja_env": jinja_env,
+        "items": items,
+        "item_template": item_template,
+        "section_config": section_config
+    }
+    for index, output_path in zip(tasks, run_tasks(_render_item_page, tasks, jobs, render_state)):
+        if manifest is not None and output_path:
+            manifest.record(output_path, digests[index])
+
+
+def _render_item_page(state, index):
+    """
+    Render and write a single item page (runs in a worker process when building in parallel).
+    
+    Args:
+        state: Dictionary with config, jinja_env, items, item_template and section_config
+        index: Index of the item to render
         
-        context = {
-            "item": item,
-            "title": page_title,
-            "description": item['metadata'].get('description', config.SITE_DESCRIPTION)
-        }
+    Returns:
+        str: Path of the written output file
+    """
+    config = state["config"]
+    item = state["items"][index]
+    output_path = os.path.join(config.OUTPUT_DIR, item.section_key, f"{item.slug}.html")
+    render_page(config, state["jinja_env"], state["item_template"], item_page_context(config, item),
+                output_path, state["section_config"])
+    return output_path
+
+
+def item_page_context(config, item):
+    """
+    Create the template context of a section item's page.
+    
+    Args:
+        config: Configuration module
+        item: Section item
         
-        html_output = render_template(jinja_env, item_template, context)
-        write_output_file(output_path, html_output)
+    Returns:
+        dict: Template context
+    """
+    page_title = f"{item.metadata.get('title', 'Untitled')} - {config.SITE_NAME}"
+    return {
+        "item": item,
+        "title": page_title,
+        "description": item.metadata.get('description', config.SITE_DESCRIPTION)
+    }
 
 
-def build_section_list(config, jinja_env, items, section_config, section_key, section_title):
+def build_section_list(config, jinja_env, items, section_config, section_key, section_title, manifest=None):
     """
     Build a list page for a section.
     
@@ -177,25 +388,50 @@ def build_section_list(config, jinja_env, items, section_config, section_key, se
         section_config: Configuration for this section
         section_key: Key identifying the section
         section_title: Title for the section
+        manifest: Optional BuildManifest used to skip an unchanged list page
     """
     list_template = section_config.get("list_template", "list.html")  # Default to list.html
     list_output_path = os.path.join(config.OUTPUT_DIR, section_key, "index.html")
-    list_title = f"{section_title} - {config.SITE_NAME}"  # Use defined section title
+    
+    if manifest is not None:
+        sources = [item.filepath for item in items]
+        digest = manifest.page_digest(list_output_path, list_template, sources=sources)
+        if manifest.is_fresh(list_output_path, digest):
+            return
     
     # Logging is now handled in the process_section function
     
-    context = {
+    context = section_list_context(config, items, section_config, section_key, section_title)
+    render_page(config, jinja_env, list_template, context, list_output_path, section_config)
+    
+    if manifest is not None:
+        manifest.record(list_output_path, digest)
+
+
+def section_list_context(config, items, section_config, section_key, section_title):
+    """
+    Create the template context of a section's list page.
+    
+    Args:
+        config: Configuration module
+        items: Sorted items of the section
+        section_config: Configuration for this section
+        section_key: Key identifying the section
+        section_title: Title for the section
+        
+    Returns:
+        dict: Template context
+    """
+    list_title = f"{section_title} - {config.SITE_NAME}"  # Use defined section title
+    return {
         "items": items,
         "section": section_config,
         "section_key": section_key,
         "title": list_title
     }
-    
-    html_output = render_template(jinja_env, list_template, context)
-    write_output_file(list_output_path, html_output)
 
 
-def build_homepage(config, jinja_env, all_items):
+def build_homepage(config, jinja_env, all_items, site, manifest=None):
     """
     Build the main homepage.
     
@@ -203,14 +439,50 @@ def build_homepage(config, jinja_env, all_items):
         config: Configuration module
         jinja_env: Jinja2 environment
         all_items: List of all content items
+        site: Frozen SiteIndex over all_items
+        manifest: Optional BuildManifest used to skip an unchanged homepage
     """
     zconsole.subheader("Building top-level pages")
     
     index_output_path = os.path.join(config.OUTPUT_DIR, "index.html")
+    home_md_path = os.path.join(config.CONTENT_DIR, "home.md")
+    
+    if manifest is not None:
+        # The homepage lists items from every section, so it depends on the whole site
+        digest = manifest.page_digest(index_output_path, "index.html", sources=[home_md_path],
+                                      depends_on_site=True)
+        if manifest.is_fresh(index_output_path, digest):
+            return
+    
+    context = homepage_context(config, all_items, site, index_output_path)
+    success = render_page(config, jinja_env, "index.html", context, index_output_path)
+    
+    if success:
+        zconsole.success(f"Built homepage: {index_output_path}")
+    
+    if manifest is not None:
+        manifest.record(index_output_path, digest)
+
+
+def homepage_context(config, all_items, site, output_path):
+    """
+    Create the template context of the homepage, parsing content/home.md
+    if it exists.
+    
+    Args:
+        config: Configuration module
+        all_items: List of all content items
+        site: Frozen SiteIndex over all_items
+        output_path: Output path of the homepage
+        
+    Returns:
+        dict: Template context
+    """
     context = {
         "title": config.SITE_NAME,
         "description": config.SITE_DESCRIPTION,
         "latest_items": all_items,  # Pass all items for potential use on homepage
+        "site": site,
         "config": config  # Pass the entire config object for shortcodes
     }
     
@@ -220,7 +492,7 @@ def build_homepage(config, jinja_env, all_items):
         # Parse the home.md file with context for shortcodes
         home_content = parse_markdown_file(
             home_md_path,
-            output_path=index_output_path,
+            output_path=output_path,
             base_url=config.BASE_URL,
             context=context  # Pass context for shortcode processing
         )
@@ -231,15 +503,10 @@ def build_homepage(config, jinja_env, all_items):
             # For backward compatibility, also provide home_html
             if "home_html" not in context and "content_html" in home_content:
                 context["home_html"] = home_content["content_html"]
-    
-    html_output = render_template(jinja_env, "index.html", context)
-    success = write_output_file(index_output_path, html_output)
-    
-    if success:
-        zconsole.success(f"Built homepage: {index_output_path}")
+    return context
 
 
-def process_top_level_pages(config, jinja_env):
+def process_top_level_pages(config, jinja_env, all_items, site, manifest=None, filenames=None):
     """
     Process any standalone Markdown pages at the top level of the content directory.
     Excludes 'home.md' which is handled by build_homepage.
@@ -247,15 +514,23 @@ def process_top_level_pages(config, jinja_env):
     Args:
         config: Configuration module
         jinja_env: Jinja2 environment
+        all_items: List of all content items
+        site: Frozen SiteIndex over all_items
+        manifest: Optional BuildManifest used to skip unchanged pages
+        filenames: Names of the Markdown files to process; None processes
+            every page in the content directory
     """
     zconsole.info("Processing top-level content pages...")
     
     # List files in the content directory root
-    try:
-        content_files = os.listdir(config.CONTENT_DIR)
-    except FileNotFoundError:
-        zconsole.warning(f"Content directory not found: {config.CONTENT_DIR}")
-        return
+    if filenames is not None:
+        content_files = filenames
+    else:
+        try:
+            content_files = os.listdir(config.CONTENT_DIR)
+        except FileNotFoundError:
+            zconsole.warning(f"Content directory not found: {config.CONTENT_DIR}")
+            return
         
     for filename in content_files:
         # Process only .md files, excluding home.md and hidden files
@@ -266,38 +541,73 @@ def process_top_level_pages(config, jinja_env):
                 output_filename = os.path.splitext(filename)[0] + '.html'
                 output_path = os.path.join(config.OUTPUT_DIR, output_filename)
                 
-                # Basic context for parsing (might need more for shortcodes)
-                parse_context = {"config": config}
-                
-                # Parse the markdown file
-                parsed_item = parse_markdown_file(
-                    source_path, 
-                    output_path=output_path, 
-                    base_url=config.BASE_URL,
-                    context=parse_context 
-                )
+                page = top_level_page(config, source_path, output_path, all_items, site)
                 
-                if parsed_item:
-                    # Decide on template - use frontmatter or default
-                    default_template = getattr(config, 'TOP_LEVEL_TEMPLATE', 'page.html')
-                    page_template = parsed_item.get('metadata', {}).get('template', default_template)
+                if page:
+                    page_template, render_context = page
                     
-                    # Create rendering context
-                    render_context = {
-                        "item": parsed_item,
-                        "config": config,
-                        # Title precedence: frontmatter > filename > default
-                        "title": parsed_item.get('metadata', {}).get('title', filename.replace('.md', '').capitalize()),
-                        "description": parsed_item.get('metadata', {}).get('description', config.SITE_DESCRIPTION),
-                        # Pass the HTML content for the template - no need to escape as it's already HTML
-                        "content": parsed_item.get('content_html')
-                    }
+                    if manifest is not None:
+                        # The template is chosen in the frontmatter, so the check follows parsing
+                        digest = manifest.page_digest(output_path, page_template, sources=[source_path])
+                        if manifest.is_fresh(output_path, digest):
+                            continue
                     
                     # Render and write
-                    html_output = render_template(jinja_env, page_template, render_context)
-                    success = write_output_file(output_path, html_output)
+                    success = render_page(config, jinja_env, page_template, render_context, output_path)
                     
                     if success:
                         zconsole.success(f"Built page: {output_path}")
+                    
+                    if manifest is not None:
+                        manifest.record(output_path, digest)
                 else:
                     zconsole.warning(f"Failed to parse top-level page: {source_path}")
+
+
+def top_level_page(config, source_path, output_path, all_items, site):
+    """
+    Parse a top-level Markdown page and create its template context.
+    
+    Args:
+        config: Configuration module
+        source_path: Path of the Markdown file
+        output_path: Output path of the page
+        all_items: List of all content items
+        site: Frozen SiteIndex over all_items
+        
+    Returns:
+        tuple: (template name, template context), or None if parsing failed
+    """
+    # Context for shortcode processing
+    parse_context = {
+        "config": config,
+        "latest_items": all_items,
+        "site": site
+    }
+    
+    # Parse the markdown file
+    parsed_item = parse_markdown_file(
+        source_path, 
+        output_path=output_path, 
+        base_url=config.BASE_URL,
+        context=parse_context 
+    )
+    if not parsed_item:
+        return None
+    
+    # Decide on template - use frontmatter or default
+    default_template = getattr(config, 'TOP_LEVEL_TEMPLATE', 'page.html')
+    page_template = parsed_item.get('metadata', {}).get('template', default_template)
+    
+    # Create rendering context
+    filename = os.path.basename(source_path)
+    render_context = {
+        "item": parsed_item,
+        "config": config,
+        # Title precedence: frontmatter > filename > default
+        "title": parsed_item.get('metadata', {}).get('title', filename.replace('.md', '').capitalize()),
+        "description": parsed_item.get('metadata', {}).get('description', config.SITE_DESCRIPTION),
+        # Pass the HTML content for the template - no need to escape as it's already HTML
+        "content": parsed_item.get('content_html')
+    }
+    return page_template, render_context
@@ -0,0 +1,239 @@
+"""
+Dependency tracking for the Zerodown static site generator.
+
+While a site is built, every output page is linked to the inputs it was
+produced from: its Markdown sources, the templates it pulls in (following
+``extends``/``include``/``import`` chains through the Jinja AST), the
+``_includes`` fragments its templates read, and the shortcodes it uses.
+The graph is stored in the build manifest so later builds can invalidate
+exactly the affected pages and ``zerodown deps`` can report them.
+"""
+
+import os
+import json
+from jinja2 import meta, nodes
+
+# Marker stored when a template references another template dynamically
+ALL_TEMPLATES = "*"
+
+
+class DependencyGraph:
+    """
+    Maps output files to the templates, includes, sources and shortcodes
+    they depend on.
+    """
+
+    def __init__(self, config, pages=None):
+        self.config = config
+        self.pages = pages or {}
+        self.jinja_env = None
+        self._template_closures = {}
+        self._template_variables = {}
+        self._include_keys = None
+
+    @classmethod
+    def load(cls, config):
+        """
+        Load the dependency graph recorded by the previous build.
+
+        Args:
+            config: Configuration module
+
+        Returns:
+            DependencyGraph: The recorded graph (empty if none exists)
+        """
+        from zerodown.manifest import MANIFEST_FILENAME
+        from zerodown.utils import get_cache_dir
+        path = os.path.join(get_cache_dir(config), MANIFEST_FILENAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(config)
+        return cls(config, data.get("dependencies", {}))
+
+    def bind(self, jinja_env):
+        """
+        Attach the Jinja environment used to analyze templates.
+
+        Args:
+            jinja_env: Jinja2 environment of the current build
+        """
+        self.jinja_env = jinja_env
+        self._template_closures = {}
+        self._template_variables = {}
+
+    def _parse_template(self, name):
+        """Return the AST of a template, or None if it cannot be loaded."""
+        try:
+            source, _, _ = self.jinja_env.loader.get_source(self.jinja_env, name)
+            return self.jinja_env.parse(source)
+        except Exception:
+            return None
+
+    def templates_for(self, template_name):
+        """
+        Return every template a template depends on, including itself.
+
+        Follows ``extends``, ``include``, ``import`` and ``from`` references
+        recursively. A dynamic reference (e.g. ``{% include name %}``) makes
+        the page depend on every template.
+
+        Args:
+            template_name: Name of the template
+
+        Returns:
+            list: Sorted template names
+        """
+        if template_name in self._template_closures:
+            return self._template_closures[template_name]
+
+        closure = set()
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in closure:
+                continue
+            closure.add(name)
+            ast = self._parse_template(name) if self.jinja_env else None
+            if ast is None:
+                continue
+            # Collect every name the template reads. find_undeclared_variables
+            # is not used because it hides environment globals such as includes.
+            self._template_variables[name] = {
+                node.name for node in ast.find_all(nodes.Name) if node.ctx == 'load'
+            }
+            for referenced in meta.find_referenced_templates(ast):
+                if referenced is None:
+                    closure.add(ALL_TEMPLATES)
+                else:
+                    pending.append(referenced)
+
+        result = sorted(closure)
+        self._template_closures[template_name] = result
+        return result
+
+    def _includes_by_key(self):
+        """Map every global created by process_includes to its include file."""
+        if self._include_keys is None:
+            self._include_keys = {}
+            includes_dir = os.path.join(self.config.CONTENT_DIR, '_includes')
+            if os.path.isdir(includes_dir):
+                for include_file in os.listdir(includes_dir):
+                    if include_file.endswith('.md') and not include_file.startswith('.'):
+                        stem = os.path.splitext(include_file)[0]
+                        rel_path = f"_includes/{include_file}"
+                        self._include_keys[f"{stem}_html"] = rel_path
+                        self._include_keys[f"include_{stem}_"] = rel_path
+        return self._include_keys
+
+    def includes_for(self, templates):
+        """
+        Return the ``_includes`` files read by a set of templates.
+
+        Args:
+            templates: Template names (as returned by templates_for)
+
+        Returns:
+            list: Sorted include paths relative to CONTENT_DIR
+        """
+        include_keys = self._includes_by_key()
+        if ALL_TEMPLATES in templates:
+            return sorted(set(include_keys.values()))
+
+        includes = set()
+        for name in templates:
+            for variable in self._template_variables.get(name, ()):
+                if variable in include_keys:
+                    includes.add(include_keys[variable])
+                    continue
+                for key, rel_path in include_keys.items():
+                    if key.endswith('_') and variable.startswith(key):
+                        includes.add(rel_path)
+        return sorted(includes)
+
+    def reads_site(self, templates):
+        """
+        Check whether any of the templates queries the site index.
+
+        Args:
+            templates: Template names (as returned by templates_for)
+
+        Returns:
+            bool: True if a template reads the ``site`` global
+        """
+        if ALL_TEMPLATES in templates:
+            return True
+        return any("site" in self._template_variables.get(name, ()) for name in templates)
+
+    def content_key(self, path):
+        """
+        Return a path relative to CONTENT_DIR with forward slashes.
+
+        Args:
+            path: Path to a content file
+
+        Returns:
+            str: Relative path
+        """
+        return os.path.relpath(path, self.config.CONTENT_DIR).replace(os.sep, "/")
+
+    def record(self, output_key, sources, templates, includes, shortcodes, site):
+        """
+        Record the dependencies of an output file.
+
+        Args:
+            output_key: Output path relative to OUTPUT_DIR
+            sources: Markdown source paths
+            templates: Template names
+            includes: Include paths relative to CONTENT_DIR
+            shortcodes: Shortcode names used by the sources
+            site: Whether the page reads items from the whole site
+        """
+        self.pages[output_key] = {
+            "sources": sorted(self.content_key(source) for source in sources),
+            "templates": list(templates),
+            "includes": list(includes),
+            "shortcodes": sorted(shortcodes),
+            "site": bool(site),
+        }
+
+    def dependents(self, path):
+        """
+        Return the outputs that have to be rebuilt when a file changes.
+
+        Args:
+            path: Path to a template, include, content or config file
+
+        Returns:
+            list: Sorted output paths relative to OUTPUT_DIR, or None when
+            every output depends on the file (e.g. the config file)
+        """
+        abs_path = os.path.abspath(path)
+        template_dir = os.path.abspath(self.config.TEMPLATE_DIR)
+        content_dir = os.path.abspath(self.config.CONTENT_DIR)
+
+        if abs_path.startswith(template_dir + os.sep):
+            name = os.path.relpath(abs_path, template_dir).replace(os.sep, "/")
+            return sorted(key for key, deps in self.pages.items()
+                          if name in deps["templates"] or ALL_TEMPLATES in deps["templates"])
+
+        if abs_path.startswith(content_dir + os.sep):
+            rel_path = self.content_key(abs_path)
+            if rel_path.startswith("_includes/"):
+                return sorted(key for key, deps in self.pages.items() if rel_path in deps["includes"])
+
+            # Pages built from the file, plus pages listing items from the whole site
+            section_key = rel_path.split("/", 1)[0] if "/" in rel_path else None
+            is_section_item = section_key in (getattr(self.config, "SECTIONS", {}) or {})
+            section_index = f"{section_key}/index.html"
+            return sorted(key for key, deps in self.pages.items()
+                          if rel_path in deps["sources"]
+                          or (is_section_item and (deps["site"] or key == section_index)))
+
+        # Anything else (such as the config file) affects every page
+        return None
+
+    def to_dict(self):
+        """Return the graph as a JSON-serializable dictionary."""
+        return self.pages
@@ -0,0 +1,278 @@
+"""
+Code highlighting for the Zerodown static site generator.
+
+Wraps Python-Markdown's CodeHilite so highlighted code blocks are cached
+by a hash of (code, language, options), both in memory and on disk, and so
+the language of unlabeled blocks can be picked by a cheap heuristic instead
+of Pygments' ``guess_lexer``, which tries every available lexer.
+
+The cached highlighter is used through this module's Markdown extension,
+a drop-in replacement for ``markdown.extensions.codehilite`` that only
+affects the Markdown instances it is loaded into.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from markdown.extensions.attr_list import AttrListExtension
+from markdown.extensions.codehilite import (CodeHilite, CodeHiliteExtension, HiliteTreeprocessor,
+                                            parse_hl_lines)
+from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+try:
+    from markdown.extensions.attr_list import get_attrs_and_remainder
+except ImportError:  # Python-Markdown < 3.5
+    from markdown.extensions.attr_list import get_attrs
+
+    def get_attrs_and_remainder(attrs_string):
+        return get_attrs(attrs_string), ''
+from zerodown.cache import DiskCache, cache_key
+
+# How to pick a lexer for code blocks without a language
+GUESS_MODES = ('pygments', 'heuristic', 'none')
+DEFAULT_GUESS_MODE = 'pygments'
+
+# Maximum number of highlighted blocks kept in memory per process
+MEMORY_CACHE_SIZE = 4096
+
+_guess_mode = DEFAULT_GUESS_MODE
+_disk_cache = None
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()  # The lazy server highlights from several threads
+
+# Ordered (pattern, lexer alias) checks used by the 'heuristic' mode
+_HEURISTICS = [
+    (re.compile(r'\A#!.*\b(?:python[0-9.]*)\b'), 'python'),
+    (re.compile(r'\A#!.*\b(?:ba|z)?sh\b'), 'bash'),
+    (re.compile(r'\A#!.*\bnode\b'), 'javascript'),
+    (re.compile(r'\A<\?php'), 'php'),
+    (re.compile(r'\A\s*<(?:!DOCTYPE|html|div|p|span|head|body|ul|a)\b', re.I), 'html'),
+    (re.compile(r'\A\s*<\?xml\b'), 'xml'),
+    (re.compile(r'\A\s*[{\[]\s*"[^"]*"\s*:', re.S), 'json'),
+    (re.compile(r'^\s*(?:def|class)\s+\w+.*:\s*$|^\s*(?:from\s+\S+\s+)?import\s+\w+', re.M), 'python'),
+    (re.compile(r'^\s*#include\s*[<"]', re.M), 'c'),
+    (re.compile(r'^\s*package\s+\w+\s*$|^\s*func\s+\w+\(', re.M), 'go'),
+    (re.compile(r'^\s*(?:pub\s+)?fn\s+\w+|\blet\s+mut\b', re.M), 'rust'),
+    (re.compile(r'^\s*(?:const|let|var)\s+\w+\s*=|=>|\bfunction\s*\w*\(', re.M), 'javascript'),
+    (re.compile(r'^\s*(?:SELECT|INSERT|UPDATE|DELETE|CREATE\s+TABLE)\b', re.M | re.I), 'sql'),
+    (re.compile(r'^\s*[.#]?[\w-]+\s*\{[^}]*:[^}]*\}', re.M), 'css'),
+    (re.compile(r'^\s*\$\s+\w+', re.M), 'console'),
+    (re.compile(r'\A---\s*$|^[\w-]+:\s+\S', re.M), 'yaml'),
+]
+
+
+def guess_language(code):
+    """
+    Guess the language of a code block with a few cheap pattern checks.
+
+    Args:
+        code: Source code to inspect
+
+    Returns:
+        str: A Pygments lexer alias, or None if nothing matched
+    """
+    for pattern, language in _HEURISTICS:
+        if pattern.search(code):
+            return language
+    return None
+
+
+def configure_highlighting(config, cache_dir=None):
+    """
+    Apply a site's highlighting settings.
+
+    Args:
+        config: Configuration module, optionally with HIGHLIGHT_GUESS_LANG
+            ('pygments', 'heuristic' or 'none')
+        cache_dir: Directory for the persistent highlight cache, or None
+    """
+    global _guess_mode, _disk_cache
+    mode = str(getattr(config, 'HIGHLIGHT_GUESS_LANG', DEFAULT_GUESS_MODE) or 'none').lower()
+    if mode not in GUESS_MODES:
+        from zerodown.console import zconsole
+        zconsole.warning("Unknown highlight_guess_lang setting",
+                         f"'{mode}', expected one of {', '.join(GUESS_MODES)}; using '{DEFAULT_GUESS_MODE}'")
+        mode = DEFAULT_GUESS_MODE
+    _guess_mode = mode
+    _disk_cache = DiskCache(cache_dir) if cache_dir else None
+
+
+def guess_mode():
+    """Return the active language guessing mode."""
+    return _guess_mode
+
+
+class CachedCodeHilite(CodeHilite):
+    """
+    CodeHilite that caches highlighted HTML and applies the site's
+    language guessing strategy.
+    """
+
+    def hilite(self, shebang=True):
+        """
+        Highlight the code block, reusing a cached result when possible.
+
+        Args:
+            shebang: Whether a first line like ``#!python`` selects the language
+
+        Returns:
+            str: Highlighted HTML
+        """
+        self.src = self.src.strip('\n')
+        if self.lang is None and shebang:
+            self._parseHeader()
+
+        if _guess_mode != 'pygments' and self.guess_lang:
+            if self.lang is None and _guess_mode == 'heuristic':
+                self.lang = guess_language(self.src)
+            # Fall back to plain text instead of trying every lexer
+            self.guess_lang = False
+
+        formatter = getattr(self, 'pygments_formatter', 'html')  # Python-Markdown >= 3.4
+        if not isinstance(formatter, str):
+            formatter = f"{formatter.__module__}.{formatter.__qualname__}"
+        key = cache_key(
+            self.src,
+            self.lang,
+            self.guess_lang,
+            self.use_pygments,
+            self.lang_prefix,
+            formatter,
+            repr(sorted(self.options.items())),
+            _pygments_version(),
+        )
+
+        with _memory_lock:
+            html = _memory_cache.get(key)
+            if html is not None:
+                _memory_cache.move_to_end(key)
+                return html
+
+        if _disk_cache is not None:
+            html = _disk_cache.get(key)
+        if html is None:
+            html = super().hilite(shebang=False)
+            if _disk_cache is not None:
+                _disk_cache.set(key, html)
+
+        with _memory_lock:
+            _memory_cache[key] = html
+            if len(_memory_cache) > MEMORY_CACHE_SIZE:
+                _memory_cache.popitem(last=False)
+        return html
+
+
+class CachedHiliteTreeprocessor(HiliteTreeprocessor):
+    """Highlights indented code blocks with CachedCodeHilite."""
+
+    def run(self, root):
+        for block in root.iter('pre'):
+            if len(block) != 1 or block[0].tag != 'code' or block[0].text is None:
+                continue
+            local_config = self.config.copy()
+            code = CachedCodeHilite(
+                self.code_unescape(block[0].text),
+                tab_length=self.md.tab_length,
+                style=local_config.pop('pygments_style', 'default'),
+                **local_config
+            )
+            placeholder = self.md.htmlStash.store(code.hilite())
+            # Turn the block into a paragraph holding the placeholder, which
+            # is replaced by the stored HTML
+            block.clear()
+            block.tag = 'p'
+            block.text = placeholder
+
+
+class CachedFencedBlockPreprocessor(FencedBlockPreprocessor):
+    """
+    Highlights fenced code blocks with CachedCodeHilite.
+
+    Blocks that are not highlighted (without codehilite, or with
+    ``use_pygments=false``) are left to Python-Markdown's preprocessor.
+    """
+
+    def run(self, lines):
+        if not self.checked_for_deps:
+            for ext in self.md.registeredExtensions:
+                if isinstance(ext, CodeHiliteExtension):
+                    self.codehilite_conf = ext.getConfigs()
+                if isinstance(ext, AttrListExtension):
+                    self.use_attr_list = True
+            self.checked_for_deps = True
+        if not (self.codehilite_conf and self.codehilite_conf['use_pygments']):
+            return super().run(lines)
+
+        text = "\n".join(lines)
+        index = 0
+        while True:
+            m = self.FENCED_BLOCK_RE.search(text, index)
+            if not m:
+                break
+            lang, classes, config = None, [], {}
+            if m.group('attrs'):
+                attrs, remainder = get_attrs_and_remainder(m.group('attrs'))
+                if remainder:  # Unbalanced braces: not a fenced block
+                    index = m.end('attrs')
+                    continue
+                _, classes, config = self.handle_attrs(attrs)
+                if classes:
+                    lang = classes.pop(0)
+            else:
+                lang = m.group('lang') or None
+                if m.group('hl_lines'):
+                    config['hl_lines'] = parse_hl_lines(m.group('hl_lines'))
+            if not config.get('use_pygments', True):
+                index = m.end()
+                continue
+
+            local_config = self.codehilite_conf.copy()
+            local_config.update(config)
+            # Pygments may add a suffix to the last class, so css_class stays last
+            if classes:
+                local_config['css_class'] = f"{' '.join(classes)} {local_config['css_class']}"
+            code = CachedCodeHilite(
+                m.group('code'),
+                lang=lang,
+                style=local_config.pop('pygments_style', 'default'),
+                **local_config
+            )
+            placeholder = self.md.htmlStash.store(code.hilite(shebang=False))
+            text = f"{text[:m.start()]}\n{placeholder}\n{text[m.end():]}"
+            index = m.start() + 1 + len(placeholder)
+        return super().run(text.split("\n"))
+
+
+class CachedCodeHiliteExtension(CodeHiliteExtension):
+    """
+    The codehilite extension, highlighting with CachedCodeHilite.
+
+    Takes the same options as ``markdown.extensions.codehilite``. Fenced code
+    blocks are highlighted through it too when fenced_code (or extra) is
+    loaded before it.
+    """
+
+    def extendMarkdown(self, md):
+        hiliter = CachedHiliteTreeprocessor(md)
+        hiliter.config = self.getConfigs()
+        md.treeprocessors.register(hiliter, 'hilite', 30)
+
+        if 'fenced_code_block' in md.preprocessors:
+            fenced = md.preprocessors['fenced_code_block']
+            md.preprocessors.register(CachedFencedBlockPreprocessor(md, fenced.config),
+                                      'fenced_code_block', 25)
+
+        md.registerExtension(self)
+
+
+def makeExtension(**kwargs):
+    """Create the extension, so it can be loaded by name as 'zerodown.highlight'."""
+    return CachedCodeHiliteExtension(**kwargs)
+
+
+def _pygments_version():
+    try:
+        import pygments
+        return pygments.__version__
+    except ImportError:
+        return None
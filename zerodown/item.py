@@ -0,0 +1,116 @@
+"""
+Content item representation for the Zerodown static site generator.
+
+Every parsed page is a ContentItem. Items use ``__slots__`` instead of a
+per-instance dict, intern their section key and frontmatter keys, and can
+leave their HTML outside the process (in the Markdown cache or a spill
+file) until a template asks for it, which keeps large sites' memory use
+down. Items still behave like the dicts they replace, so templates
+(``item.metadata.title``, ``item.url``) and shortcodes (``item["metadata"]``,
+``item.get("section_key")``) keep working.
+"""
+
+import sys
+
+
+class ContentItem:
+    """
+    A parsed Markdown page.
+
+    Attributes:
+        metadata: Frontmatter dictionary
+        filepath: Path of the source file
+        slug: File name without extension
+        url: URL of the generated page (section items only)
+        section_key: Key of the section the item belongs to
+        content_html: Converted HTML. When the item holds a content
+            reference instead, the HTML is loaded on each access
+    """
+
+    __slots__ = ('metadata', 'filepath', 'slug', 'url', 'section_key', '_content_html', '_content_ref')
+
+    # Keys available through the dict-style interface
+    KEYS = ('metadata', 'content_html', 'filepath', 'slug', 'url', 'section_key')
+
+    def __init__(self, metadata, filepath, slug, content_html=None, content_ref=None,
+                 url=None, section_key=None):
+        """
+        Args:
+            metadata: Frontmatter dictionary
+            filepath: Path of the source file
+            slug: File name without extension
+            content_html: HTML held in memory
+            content_ref: Object whose load(filepath) method returns the HTML,
+                used instead of content_html
+            url: URL of the generated page
+            section_key: Key of the section the item belongs to
+        """
+        self.metadata = {sys.intern(key) if isinstance(key, str) else key: value
+                         for key, value in metadata.items()}
+        self.filepath = filepath
+        self.slug = slug
+        self.url = url
+        self.section_key = section_key
+        self._content_html = content_html
+        self._content_ref = content_ref
+
+    def __setattr__(self, name, value):
+        if name == 'section_key' and isinstance(value, str):
+            value = sys.intern(value)
+        object.__setattr__(self, name, value)
+
+    @property
+    def content_html(self):
+        """The item's HTML, loaded through its content reference if it is not held in memory."""
+        if self._content_html is None and self._content_ref is not None:
+            return self._content_ref.load(self.filepath)
+        return self._content_html
+
+    @content_html.setter
+    def content_html(self, value):
+        self._content_html = value
+        self._content_ref = None
+
+    def set_content_ref(self, content_ref):
+        """
+        Release the HTML held in memory in favour of a reference to it.
+
+        Args:
+            content_ref: Object whose load(filepath) method returns the HTML
+        """
+        self._content_html = None
+        self._content_ref = content_ref
+
+    @property
+    def content_in_memory(self):
+        """Whether the item's HTML is held in memory."""
+        return self._content_html is not None
+
+    # Dict-style access, for code written against the previous dict items
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.KEYS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        """Return an attribute by name, or default if it is missing or None."""
+        if key not in self.KEYS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def keys(self):
+        """Return the names of the attributes that are set."""
+        return [key for key in self.KEYS if getattr(self, key) is not None]
+
+    def __repr__(self):
+        return f"ContentItem({self.filepath!r})"
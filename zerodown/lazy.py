@@ -0,0 +1,428 @@
+"""
+On-demand rendering for the Zerodown development server.
+
+``serve --lazy`` starts without building the site. Only the front matter of
+the content files is read at startup, which is enough to sort sections and
+answer site queries; a page is parsed and rendered when its URL is first
+requested. Rendered pages are kept in an LRU cache, which is invalidated
+when content or templates change. Static files, styles and content assets
+are synced into the output directory as in a normal build.
+"""
+
+import os
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from zerodown.utils import (copy_static_assets, copy_styles, get_cache_dir, encode_output)
+from zerodown.templates import setup_jinja_env, process_includes, render_template
+from zerodown.content import (list_section_files, sort_items, shortcode_context, item_page_context,
+                              section_list_context, homepage_context, top_level_page)
+from zerodown.markdown import (parse_markdown_file, parse_front_matter, copy_content_assets,
+                               set_markdown_cache)
+from zerodown.shortcodes import configure_shortcode_templates
+from zerodown.highlight import configure_highlighting
+from zerodown.siteindex import SiteIndex
+from zerodown.item import ContentItem
+from zerodown.assets import AssetSync
+from zerodown.livereload import LiveReloadHandler, snapshot_outputs, diff_outputs
+from zerodown.console import zconsole
+
+# Number of rendered pages kept in memory
+DEFAULT_LAZY_CACHE_SIZE = 256
+
+# Number of items whose expanded HTML is kept in memory
+CONTENT_CACHE_SIZE = 4096
+
+
+class _LazyContent:
+    """Content reference that parses an item's Markdown when its HTML is read."""
+
+    __slots__ = ('site', 'item', 'output_path')
+
+    def __init__(self, site, item, output_path):
+        self.site = site
+        self.item = item
+        self.output_path = output_path
+
+    def load(self, filepath):
+        """
+        Parse the item and expand its shortcodes, reusing the HTML of an
+        earlier call while the file and the site are unchanged.
+
+        Args:
+            filepath: Path to the Markdown file
+
+        Returns:
+            str: HTML content
+        """
+        site = self.site
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return ""
+        key = (filepath, st.st_mtime_ns, st.st_size)
+        with site.lock:
+            html = site.content_cache.get(key)
+            if html is not None:
+                site.content_cache.move_to_end(key)
+                return html
+            generation = site.generation
+
+        context = shortcode_context(site.config, self.item, site.all_items, site.index)
+        parsed = parse_markdown_file(filepath, output_path=self.output_path,
+                                     base_url=site.config.BASE_URL, context=context)
+        html = parsed.content_html if parsed else ""
+
+        with site.lock:
+            # Shortcodes may have read an index that was replaced meanwhile
+            if generation == site.generation:
+                site.content_cache[key] = html
+                if len(site.content_cache) > CONTENT_CACHE_SIZE:
+                    site.content_cache.popitem(last=False)
+        return html
+
+
+class LazySite:
+    """
+    A site whose pages are rendered when they are requested.
+
+    Args:
+        config: Configuration module
+        cache_size: Number of rendered pages kept in memory
+    """
+
+    def __init__(self, config, cache_size=DEFAULT_LAZY_CACHE_SIZE):
+        self.config = config
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # Output path -> page bytes
+        self.content_cache = OrderedDict()  # (source path, mtime, size) -> expanded HTML
+        self.lock = threading.RLock()  # Guards the caches, not rendering
+        self.rendered = threading.Condition(self.lock)
+        self.rendering = set()  # Output paths being rendered
+        self.generation = 0  # Incremented whenever the caches are invalidated
+        self._front_matter = {}  # Source path -> (mtime, size, front matter)
+
+        cache_dir = get_cache_dir(config)
+        set_markdown_cache(os.path.join(cache_dir, 'markdown'))
+        configure_highlighting(config, os.path.join(cache_dir, 'highlight'))
+        # Templates are checked for changes on every use
+        self.env = setup_jinja_env(config, use_cache=True, auto_reload=True)
+        configure_shortcode_templates(self.env)
+
+        self.sync_assets()
+        self.scan()
+
+    def sync_assets(self):
+        """Copy new and changed static files, styles and content assets to the output directory."""
+        os.makedirs(self.config.OUTPUT_DIR, exist_ok=True)
+        sync = AssetSync(self.config)
+        copy_static_assets(self.config, sync)
+        copy_styles(self.config, sync)
+        copy_content_assets(self.config, sync)
+        sync.finish()
+
+    def _read_front_matter(self, filepath):
+        """Return a file's front matter, reusing it while the file is unchanged."""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        known = self._front_matter.get(filepath)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+        metadata = parse_front_matter(filepath)
+        if metadata is not None:
+            self._front_matter[filepath] = (st.st_mtime_ns, st.st_size, metadata)
+        return metadata
+
+    def scan(self):
+        """
+        Read the front matter of every section item and index the site.
+
+        Markdown is not converted here; items parse it when a page reads
+        their content_html.
+        """
+        config = self.config
+        process_includes(config, self.env)
+        sections = {}
+        for section_key, section_config in config.SECTIONS.items():
+            items = self._index_section(section_key, section_config)
+            if items is not None:
+                sections[section_key] = items
+        self._set_index(sections)
+        zconsole.info("Indexed content", f"{len(self.all_items)} items in {len(sections)} sections")
+
+    def _index_section(self, section_key, section_config, known=None):
+        """
+        Read the front matter of a section's items.
+
+        Args:
+            section_key: Key identifying the section
+            section_config: Configuration for this section
+            known: Items to reuse without reading their files again, by
+                absolute source path
+
+        Returns:
+            list: Sorted items of the section, or None if the section has to
+            be skipped
+        """
+        files = list_section_files(self.config, section_key, section_config)
+        if files is None:
+            return None
+        known = known or {}
+        # Keep the order of a full scan, where files are read in directory order
+        items = []
+        for _, filepath, output_path in files:
+            item = known.get(os.path.abspath(filepath))
+            if item is None:
+                metadata = self._read_front_matter(filepath)
+                if metadata is None:
+                    continue
+                slug = os.path.splitext(os.path.basename(filepath))[0]
+                item = ContentItem(metadata, filepath, slug, url=f"/{section_key}/{slug}.html",
+                                   section_key=section_key)
+                item.set_content_ref(_LazyContent(self, item, output_path))
+            items.append(item)
+        sort_items(items, section_config, section_key)
+        return items
+
+    def _set_index(self, sections):
+        """Replace the site index and drop every cached page and item HTML."""
+        all_items = [item for items in sections.values() for item in items]
+        index = SiteIndex(all_items, self.config).freeze()
+        with self.lock:
+            self.sections = sections
+            self.all_items = all_items
+            self.items_by_url = {item.url: item for item in all_items}
+            self.index = index
+            self.env.globals['site'] = index
+            self._invalidate(content=True)
+
+    def _invalidate(self, content):
+        """
+        Drop the cached pages, and optionally the cached item HTML. Renders
+        in flight are not cached when they finish. Called with the lock held.
+
+        Args:
+            content: Whether the expanded HTML of items is dropped too
+
+        Returns:
+            list: Output paths of the dropped pages
+        """
+        dropped = list(self.cache)
+        self.cache.clear()
+        if content:
+            self.content_cache.clear()
+        self.generation += 1
+        return dropped
+
+    def page_path(self, url_path):
+        """
+        Map a requested URL to the output path of a page.
+
+        Args:
+            url_path: Request path, possibly with a query string
+
+        Returns:
+            str: Output path relative to OUTPUT_DIR ('/' separators), or None
+            if the URL is not a page of the site
+        """
+        path = urllib.parse.unquote(url_path.split('?', 1)[0].split('#', 1)[0])
+        if path.endswith('/'):
+            path += 'index.html'
+        path = path.lstrip('/')
+        parts = path.split('/')
+        if len(parts) == 2 and parts[0] in self.sections:
+            if parts[1] == 'index.html' or f"/{path}" in self.items_by_url:
+                return path
+        elif len(parts) == 1 and parts[0].endswith('.html'):
+            source = os.path.join(self.config.CONTENT_DIR, parts[0][:-len('.html')] + '.md')
+            if parts[0] == 'index.html' or (parts[0] != 'home.html' and os.path.isfile(source)):
+                return path
+        return None
+
+    def is_section_url(self, url_path):
+        """Check whether a URL names a section without its trailing slash."""
+        return url_path.split('?', 1)[0].strip('/') in self.sections and not url_path.endswith('/')
+
+    def render(self, url_path):
+        """
+        Return a page of the site, rendering it if it is not cached.
+
+        The lock only guards the cache, so several pages render at once. A
+        request for a page that is already being rendered waits for that
+        render instead of repeating it.
+
+        Args:
+            url_path: Request path
+
+        Returns:
+            bytes: Page contents, or None if the URL is not a page of the site
+        """
+        with self.lock:
+            path = self.page_path(url_path)
+            if path is None:
+                return None
+            while path in self.rendering:
+                self.rendered.wait()
+            body = self.cache.get(path)
+            if body is not None:
+                self.cache.move_to_end(path)
+                return body
+            self.rendering.add(path)
+            generation = self.generation
+
+        body = None
+        try:
+            body = self._render(path)
+        finally:
+            with self.lock:
+                self.rendering.discard(path)
+                self.rendered.notify_all()
+                if body is not None and generation == self.generation:
+                    self.cache[path] = body
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+        return body
+
+    def _render(self, path):
+        """Render a page given its output path."""
+        config = self.config
+        output_path = os.path.join(config.OUTPUT_DIR, *path.split('/'))
+        parts = path.split('/')
+        if path == 'index.html':
+            context = homepage_context(config, self.all_items, self.index, output_path)
+            html = render_template(self.env, "index.html", context)
+        elif len(parts) == 1:
+            source = os.path.join(config.CONTENT_DIR, parts[0][:-len('.html')] + '.md')
+            page = top_level_page(config, source, output_path, self.all_items, self.index)
+            if page is None:
+                html = "<h1>Error parsing page</h1>"
+            else:
+                html = render_template(self.env, page[0], page[1])
+        elif parts[1] == 'index.html':
+            section_key = parts[0]
+            section_config = config.SECTIONS[section_key]
+            section_title = section_config.get('title', section_key.capitalize())
+            context = section_list_context(config, self.sections[section_key], section_config,
+                                           section_key, section_title)
+            html = render_template(self.env, section_config.get('list_template', 'list.html'), context)
+        else:
+            item = self.items_by_url[f"/{path}"]
+            section_config = config.SECTIONS[item.section_key]
+            html = render_template(self.env, section_config.get('template', 'page.html'),
+                                   item_page_context(config, item))
+        return encode_output(html)
+
+    def update(self, changes):
+        """
+        Bring the site up to date after source files changed.
+
+        Only the front matter of changed section files is read again. Cached
+        pages are dropped and rendered on their next request; they are
+        reported as changed, so open pages reload.
+
+        Args:
+            changes: List of changed paths (not including the configuration file)
+
+        Returns:
+            tuple: (changed output paths, removed output paths), relative to
+            OUTPUT_DIR with '/' separators
+        """
+        config = self.config
+        content_dir = os.path.abspath(config.CONTENT_DIR)
+        template_dir = os.path.abspath(config.TEMPLATE_DIR)
+        shortcode_dir = os.path.join(template_dir, 'shortcodes')
+        content_paths = set()
+        templates_changed = shortcodes_changed = assets_changed = False
+        for path in changes:
+            if path.startswith(template_dir + os.sep):
+                templates_changed = True
+                shortcodes_changed = shortcodes_changed or path.startswith(shortcode_dir + os.sep)
+            elif path.startswith(content_dir + os.sep) and path.endswith('.md'):
+                content_paths.add(os.path.abspath(path))
+            else:
+                assets_changed = True
+
+        changed, removed = [], []
+        if assets_changed:
+            before = snapshot_outputs(config.OUTPUT_DIR)
+            self.sync_assets()
+            changed, removed = diff_outputs(before, snapshot_outputs(config.OUTPUT_DIR))
+        if not (content_paths or templates_changed):
+            return changed, removed
+
+        with self.lock:
+            cached = list(self.cache)
+        if content_paths:
+            self._reindex(content_paths)
+        with self.lock:
+            # Shortcode output can be overridden from TEMPLATE_DIR/shortcodes/
+            cached.extend(self._invalidate(content=shortcodes_changed))
+            for path in dict.fromkeys(cached):
+                (changed if self.page_path(path) is not None else removed).append(path)
+        return changed, removed
+
+    def _reindex(self, paths):
+        """
+        Index the site again after Markdown files changed.
+
+        Args:
+            paths: Absolute paths of the changed Markdown files
+        """
+        config = self.config
+        content_dir = os.path.abspath(config.CONTENT_DIR)
+        affected = set()
+        includes_changed = False
+        for path in paths:
+            parts = os.path.relpath(path, content_dir).split(os.sep)
+            if parts[0] == '_includes':
+                includes_changed = True
+            elif len(parts) == 2 and parts[0] in config.SECTIONS:
+                affected.add(parts[0])
+        if includes_changed:
+            process_includes(config, self.env)
+        if not affected:
+            return  # Top-level pages are read when they are rendered
+
+        sections = {}
+        for section_key, section_config in config.SECTIONS.items():
+            if section_key not in affected:
+                if section_key in self.sections:
+                    sections[section_key] = self.sections[section_key]
+                continue
+            known = {os.path.abspath(item.filepath): item for item in self.sections.get(section_key, ())
+                     if os.path.abspath(item.filepath) not in paths}
+            items = self._index_section(section_key, section_config, known)
+            if items is not None:
+                sections[section_key] = items
+        self._set_index(sections)
+
+
+class LazyHandler(LiveReloadHandler):
+    """
+    Request handler that renders pages of a LazySite on request and serves
+    every other file from the output directory.
+
+    Subclasses set ``site`` to the LazySite being served.
+    """
+
+    site = None
+
+    def send_head(self):
+        if self.site.is_section_url(self.path):
+            self.send_response(301)
+            self.send_header("Location", self.path.split('?', 1)[0] + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        try:
+            body = self.site.render(self.path)
+        except Exception as e:
+            zconsole.error("Error rendering page", f"{self.path}: {e}")
+            self.send_error(500, "Error rendering page")
+            return None
+        if body is None:
+            return super().send_head()
+        return self.send_html(body)
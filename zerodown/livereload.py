@@ -0,0 +1,273 @@
+"""
+Live reload for the Zerodown development server.
+
+After every rebuild, the server compares the output directory with its state
+before the rebuild and pushes the list of changed files to the open pages
+over Server-Sent Events. A small script, injected into every HTML page the
+server sends, then:
+
+- reloads the page if its own output file changed or was removed;
+- otherwise swaps changed stylesheets in place, without a reload;
+- reloads the page if another file it uses (an image or script) changed.
+
+Everything is served by the development server itself; no network access
+or external service is needed.
+"""
+
+import io
+import os
+import json
+import queue
+import threading
+
+from zerodown.server import StaticFileHandler
+
+# URL of the event stream
+LIVERELOAD_PATH = "/__zerodown/livereload"
+
+# Seconds between keep-alive comments on idle event streams
+KEEPALIVE_INTERVAL = 15
+
+CLIENT_SCRIPT = """<script>
+(function () {
+  if (!window.EventSource) { return; }
+  function pathOf(url) {
+    var path = decodeURIComponent(new URL(url, location.href).pathname);
+    return path.charAt(path.length - 1) === "/" ? path + "index.html" : path;
+  }
+  var page = pathOf(location.href);
+  var source = new EventSource("%(path)s");
+  source.addEventListener("change", function (event) {
+    var data = JSON.parse(event.data);
+    var changed = data.changed.concat(data.removed);
+    if (changed.indexOf(page) !== -1) { location.reload(); return; }
+    var reload = false;
+    data.changed.forEach(function (path) {
+      if (/\\.html?$/.test(path)) { return; }
+      var isCss = /\\.css$/.test(path);
+      document.querySelectorAll("link[href], script[src], img[src], source[src]").forEach(function (el) {
+        var url = el.getAttribute("href") || el.getAttribute("src");
+        if (pathOf(url) !== path) { return; }
+        if (isCss && el.rel === "stylesheet") {
+          el.href = path + "?zd-reload=" + Date.now();
+        } else {
+          reload = true;
+        }
+      });
+    });
+    if (reload) { location.reload(); }
+  });
+})();
+</script>
+""" % {"path": LIVERELOAD_PATH}
+
+
+def snapshot_outputs(output_dir, paths=None):
+    """
+    Record the state of every file in an output directory.
+
+    Args:
+        output_dir: Directory to scan
+        paths: Only record these paths, relative to output_dir with '/'
+            separators; None records every file
+
+    Returns:
+        dict: Paths relative to output_dir (with '/' separators) mapped to
+        (inode, modification time, size)
+    """
+    snapshot = {}
+    if paths is not None:
+        for rel_path in paths:
+            try:
+                st = os.stat(os.path.join(output_dir, *rel_path.split("/")))
+            except OSError:
+                continue
+            snapshot[rel_path] = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return snapshot
+    for root, dirs, files in os.walk(output_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            try:
+                st = os.stat(path)  # Follows symlinked assets
+            except OSError:
+                continue
+            rel_path = os.path.relpath(path, output_dir).replace(os.sep, "/")
+            snapshot[rel_path] = (st.st_ino, st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def diff_outputs(before, after):
+    """
+    Compare two snapshots of the output directory.
+
+    Unchanged files keep their inode and timestamp: identical pages are not
+    rewritten, and a staged build hard-links them from the previous one.
+
+    Args:
+        before: Snapshot taken before a rebuild
+        after: Snapshot taken after it
+
+    Returns:
+        tuple: (changed or new paths, removed paths), sorted
+    """
+    changed = sorted(path for path, state in after.items() if before.get(path) != state)
+    removed = sorted(path for path in before if path not in after)
+    return changed, removed
+
+
+class LiveReloadHub:
+    """Delivers change notifications to the connected pages."""
+
+    def __init__(self):
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Register a client and return the queue its events arrive on."""
+        client = queue.Queue()
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def disconnect(self, client):
+        """Unregister a client."""
+        with self._lock:
+            self._clients.discard(client)
+
+    @property
+    def client_count(self):
+        with self._lock:
+            return len(self._clients)
+
+    def publish(self, changed, removed=()):
+        """
+        Notify every client of changed output files.
+
+        Args:
+            changed: Output paths (relative, '/' separators) that changed
+            removed: Output paths that were removed
+        """
+        if not changed and not removed:
+            return
+        data = json.dumps({
+            "changed": ["/" + path for path in changed],
+            "removed": ["/" + path for path in removed],
+        })
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(data)
+
+    def close(self):
+        """Disconnect every client."""
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put(None)
+
+
+def inject_client(html):
+    """
+    Add the live reload script to an HTML page.
+
+    Args:
+        html: Page contents (bytes)
+
+    Returns:
+        bytes: Page with the script before the closing body tag, or at the end
+    """
+    script = CLIENT_SCRIPT.encode("utf-8")
+    index = html.lower().rfind(b"</body>")
+    if index == -1:
+        return html + script
+    return html[:index] + script + html[index:]
+
+
+class LiveReloadHandler(StaticFileHandler):
+    """
+    Request handler that serves the event stream and injects the client
+    script into HTML pages.
+
+    Subclasses set ``hub`` to the LiveReloadHub of the server; without a
+    hub, pages are served unchanged, as static files.
+    """
+
+    hub = None
+
+    def do_GET(self):
+        if self.hub is not None and self.path.split("?", 1)[0] == LIVERELOAD_PATH:
+            self._send_events()
+        else:
+            super().do_GET()
+
+    def send_head(self):
+        if self.hub is None:
+            return super().send_head()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return super().send_head()  # Redirects to the URL with a slash
+            for index in ("index.html", "index.htm"):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return super().send_head()  # Directory listing
+        if not path.endswith((".html", ".htm")) or not os.path.isfile(path):
+            return super().send_head()
+
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        return self.send_html(body)
+
+    def send_html(self, body):
+        """
+        Send the headers of an HTML page, adding the live reload script.
+
+        Args:
+            body: Page contents (bytes)
+
+        Returns:
+            BytesIO: Response body, for do_GET to copy
+        """
+        if self.hub is not None:
+            body = inject_client(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        # Pages change with every rebuild
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def _send_events(self):
+        """Stream change notifications until the page is closed."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.end_headers()
+        self.close_connection = True
+
+        client = self.hub.connect()
+        try:
+            self.wfile.write(b"retry: 1000\n\n")
+            self.wfile.flush()
+            while True:
+                try:
+                    data = client.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    if data is None:
+                        break
+                    self.wfile.write(f"event: change\ndata: {data}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Page closed or reloaded
+        finally:
+            self.hub.disconnect(client)
@@ -0,0 +1,414 @@
+"""
+Build manifest handling for incremental builds in Zerodown.
+
+The manifest records, for every generated output file, a digest of the
+inputs that produced it (source files, templates, includes and config)
+together with the dependency graph behind that digest. An incremental
+build compares these digests with the previous build and only re-renders
+pages whose inputs actually changed.
+"""
+
+import os
+import json
+import hashlib
+import types
+
+from zerodown import __version__
+from zerodown.utils import get_cache_dir
+from zerodown.staging import published_output_dir
+from zerodown.deps import DependencyGraph, ALL_TEMPLATES
+from zerodown.console import zconsole
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_FORMAT = 2
+
+
+def hash_bytes(data):
+    """
+    Return a hex digest for a bytes object.
+
+    Args:
+        data: Bytes to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    """
+    Return a hex digest of a file's contents, or None if it cannot be read.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        str: Hex digest or None
+    """
+    try:
+        with open(path, "rb") as f:
+            return hash_bytes(f.read())
+    except OSError:
+        return None
+
+
+def hash_directory(directory):
+    """
+    Return a single digest covering every file below a directory.
+
+    Args:
+        directory: Directory to hash
+
+    Returns:
+        str: Hex digest (stable for a missing directory)
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(directory):
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                digest.update(os.path.relpath(path, directory).encode("utf-8"))
+                digest.update((hash_file(path) or "").encode("ascii"))
+    return digest.hexdigest()
+
+
+def hash_config(config):
+    """
+    Return a digest of the uppercase settings of a configuration object.
+
+    Functions and modules (common in Python configs) are ignored because
+    their representation is not stable between runs.
+
+    Args:
+        config: Configuration module or object
+
+    Returns:
+        str: Hex digest
+    """
+    settings = {}
+    for key in dir(config):
+        if not key.isupper():
+            continue
+        value = getattr(config, key)
+        if callable(value) or isinstance(value, types.ModuleType):
+            continue
+        settings[key] = value
+    encoded = json.dumps(settings, sort_keys=True, default=str)
+    return hash_bytes(encoded.encode("utf-8"))
+
+
+def combine_digests(*parts):
+    """
+    Combine several digests or strings into one digest.
+
+    Args:
+        *parts: Strings to combine (None values are allowed)
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """
+    Tracks the inputs of every output file across builds.
+
+    A manifest is always recorded, so a normal build can be followed by an
+    incremental one. When ``incremental`` is False every page is considered
+    stale and is rebuilt.
+    """
+
+    def __init__(self, config, previous=None, incremental=False):
+        self.config = config
+        self.path = os.path.join(get_cache_dir(config), MANIFEST_FILENAME)
+        self.output_dir = published_output_dir(config)
+        self.incremental = incremental
+        self.previous = previous or {}
+        self.outputs = {}
+        self.rendered = 0
+        self.skipped = 0
+        self.graph = DependencyGraph(config)
+        self._source_hashes = {}
+        self._source_shortcodes = {}
+        self._template_hashes = {}
+        self._site_digest = None
+        self.base_digest = combine_digests(__version__, hash_config(config))
+
+    @classmethod
+    def load(cls, config, incremental=False):
+        """
+        Load the manifest of the previous build.
+
+        Args:
+            config: Configuration module
+            incremental: Whether unchanged outputs may be skipped
+
+        Returns:
+            BuildManifest: Manifest for the current build. ``incremental`` is
+            switched off if no usable previous manifest exists.
+        """
+        manifest = cls(config, incremental=incremental)
+        if not incremental:
+            return manifest
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            zconsole.warning("No previous build manifest found", "performing a full build")
+            manifest.incremental = False
+            return manifest
+
+        if (data.get("format") != MANIFEST_FORMAT
+                or data.get("output_dir") != manifest.output_dir
+                or not os.path.isdir(config.OUTPUT_DIR)):
+            zconsole.warning("Build manifest is out of date", "performing a full build")
+            manifest.incremental = False
+            return manifest
+
+        manifest.previous = data.get("outputs", {})
+        return manifest
+
+    def refresh(self, paths):
+        """
+        Prepare the manifest of a finished build for an in-process update.
+
+        The outputs of the build become the previous outputs, so pages can
+        be checked with is_fresh() again, and the memoized digests of the
+        changed files are dropped.
+
+        Args:
+            paths: Paths of the changed source files and templates
+        """
+        self.previous = dict(self.outputs)
+        self.incremental = True
+        self.rendered = 0
+        self.skipped = 0
+
+        changed = {os.path.abspath(path) for path in paths}
+        for memo in (self._source_hashes, self._source_shortcodes):
+            for path in [path for path in memo if os.path.abspath(path) in changed]:
+                del memo[path]
+        self._site_digest = None
+
+        template_dir = os.path.abspath(self.config.TEMPLATE_DIR)
+        if any(path.startswith(template_dir + os.sep) for path in changed):
+            self._template_hashes = {}
+            self.graph.bind(self.graph.jinja_env)  # Template references may have changed
+
+    def source_hash(self, path):
+        """
+        Return the (memoized) content digest of a source file.
+
+        Args:
+            path: Path to the source file
+
+        Returns:
+            str: Hex digest or None
+        """
+        if path not in self._source_hashes:
+            self._source_hashes[path] = hash_file(path)
+        return self._source_hashes[path]
+
+    def source_shortcodes(self, path):
+        """
+        Return the registered shortcodes used by a source file.
+
+        Args:
+            path: Path to the source file
+
+        Returns:
+            set: Shortcode names
+        """
+        if path not in self._source_shortcodes:
+            from zerodown.shortcodes import find_shortcodes
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._source_shortcodes[path] = find_shortcodes(f.read())
+            except OSError:
+                self._source_shortcodes[path] = set()
+        return self._source_shortcodes[path]
+
+    def template_hash(self, template_name):
+        """
+        Return the content digest of a template.
+
+        Args:
+            template_name: Template name, or ALL_TEMPLATES for every template
+
+        Returns:
+            str: Hex digest or None if the template does not exist
+        """
+        if template_name not in self._template_hashes:
+            if template_name == ALL_TEMPLATES:
+                digest = hash_directory(self.config.TEMPLATE_DIR)
+            else:
+                digest = hash_file(os.path.join(self.config.TEMPLATE_DIR, template_name))
+            self._template_hashes[template_name] = digest
+        return self._template_hashes[template_name]
+
+    def site_digest(self):
+        """
+        Return a digest covering every Markdown source in every section.
+
+        Returns:
+            str: Hex digest
+        """
+        if self._site_digest is None:
+            parts = []
+            for section_key in sorted(getattr(self.config, "SECTIONS", {}) or {}):
+                section_dir = os.path.join(self.config.CONTENT_DIR, section_key)
+                if not os.path.isdir(section_dir):
+                    continue
+                for filename in sorted(os.listdir(section_dir)):
+                    if filename.lower().endswith(".md") and not filename.startswith('.'):
+                        path = os.path.join(section_dir, filename)
+                        parts.append(f"{section_key}/{filename}:{self.source_hash(path)}")
+            self._site_digest = combine_digests(*parts)
+        return self._site_digest
+
+    def page_digest(self, output_path, template_name, sources=(), depends_on_site=False):
+        """
+        Compute the input digest for a single output page and record its
+        dependencies in the graph.
+
+        The digest covers the page's sources, every template in its
+        extends/include chain, the includes those templates read and, if the
+        page uses item-querying shortcodes or its templates read ``site``,
+        all content in the site.
+
+        Args:
+            output_path: Path of the output file
+            template_name: Template used to render the page
+            sources: Source files whose content ends up in the page
+            depends_on_site: Whether the page reads data from the whole site
+
+        Returns:
+            str: Hex digest
+        """
+        from zerodown.shortcodes import ITEM_QUERY_SHORTCODES, SHORTCODE_TEMPLATES
+
+        templates = self.graph.templates_for(template_name)
+        includes = self.graph.includes_for(templates)
+        shortcodes = set()
+        for source in sources:
+            shortcodes |= self.source_shortcodes(source)
+        if shortcodes:
+            # Shortcode output can be overridden from TEMPLATE_DIR/shortcodes/
+            templates = sorted(set(templates) | {f"shortcodes/{name}.html" for name in SHORTCODE_TEMPLATES})
+        depends_on_site = (depends_on_site
+                           or bool(shortcodes & ITEM_QUERY_SHORTCODES)
+                           or self.graph.reads_site(templates))
+
+        parts = [self.base_digest]
+        for source in sources:
+            parts.append(source)
+            parts.append(self.source_hash(source))
+        for name in templates:
+            parts.append(name)
+            parts.append(self.template_hash(name))
+        for include in includes:
+            parts.append(include)
+            parts.append(self.source_hash(os.path.join(self.config.CONTENT_DIR, include)))
+        if depends_on_site:
+            parts.append(self.site_digest())
+
+        self.graph.record(self._key(output_path), sources, templates, includes, shortcodes, depends_on_site)
+        return combine_digests(*parts)
+
+    def _key(self, output_path):
+        return os.path.relpath(output_path, self.config.OUTPUT_DIR).replace(os.sep, "/")
+
+    def is_fresh(self, output_path, digest):
+        """
+        Check whether an output file is up to date and may be skipped.
+
+        A fresh output is recorded in the new manifest as a side effect.
+
+        Args:
+            output_path: Path of the output file
+            digest: Input digest computed for this build
+
+        Returns:
+            bool: True if the page does not need to be rebuilt
+        """
+        key = self._key(output_path)
+        if (self.incremental
+                and self.previous.get(key) == digest
+                and os.path.isfile(output_path)):
+            self.outputs[key] = digest
+            self.skipped += 1
+            return True
+        return False
+
+    def record(self, output_path, digest):
+        """
+        Record that an output file was rebuilt from the given inputs.
+
+        Args:
+            output_path: Path of the output file
+            digest: Input digest computed for this build
+        """
+        self.outputs[self._key(output_path)] = digest
+        self.rendered += 1
+
+    def remove_stale_outputs(self):
+        """
+        Delete outputs of the previous build that were not produced this time,
+        for example because their source file was removed.
+
+        Returns:
+            int: Number of deleted files
+        """
+        removed = 0
+        for key in self.previous:
+            if key in self.outputs:
+                continue
+            path = os.path.join(self.config.OUTPUT_DIR, key)
+            if os.path.isfile(path):
+                try:
+                    os.remove(path)
+                    removed += 1
+                    zconsole.info("Removed stale output", key)
+                    _remove_empty_parents(os.path.dirname(path), self.config.OUTPUT_DIR)
+                except OSError as e:
+                    zconsole.error("Error removing stale output", f"{path}: {e}")
+        return removed
+
+    def save(self):
+        """Write the manifest for use by the next incremental build."""
+        data = {
+            "format": MANIFEST_FORMAT,
+            "version": __version__,
+            "output_dir": self.output_dir,
+            "outputs": self.outputs,
+            "dependencies": {key: deps for key, deps in self.graph.to_dict().items()
+                             if key in self.outputs},
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            zconsole.error("Error writing build manifest", f"{self.path}: {e}")
+
+
+def _remove_empty_parents(directory, stop_dir):
+    """Remove empty directories from ``directory`` up to (excluding) ``stop_dir``."""
+    stop_dir = os.path.abspath(stop_dir)
+    directory = os.path.abspath(directory)
+    while directory != stop_dir and directory.startswith(stop_dir):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
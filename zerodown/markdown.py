@@ -5,12 +5,86 @@ Markdown processing for the Zerodown static site generator.
 import os
 import re
 import datetime
+import threading
 import frontmatter
 import markdown
 from markdown.extensions.wikilinks import WikiLinkExtension
 from markdown.treeprocessors import Treeprocessor
 from markdown.extensions import Extension
+from zerodown import __version__
+from zerodown.cache import DiskCache, cache_key
 from zerodown.shortcodes import process_shortcodes
+from zerodown.item import ContentItem
+from zerodown import highlight
+from zerodown.profiling import timed, current_page
+
+# Standard and reliable set of extensions
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.extra',        # Includes abbr, attr_list, def_list, fenced_code, footnotes, tables, smarty
+    'zerodown.highlight',               # Syntax highlighting (cached codehilite)
+    'markdown.extensions.toc',          # Table of contents
+    'markdown.extensions.sane_lists',   # Improved list handling
+    # 'markdown.extensions.nl2br',      # Often causes issues, leave out unless needed
+]
+MARKDOWN_EXTENSION_CONFIGS = {
+    'zerodown.highlight': {
+        'css_class': 'codehilite',
+        'linenums': False,
+        'guess_lang': True
+    },
+    'markdown.extensions.toc': {
+        'permalink': False  # Disable permalink symbols that add the ¶ character
+    }
+}
+
+# Cache of parsed Markdown files, enabled by the builder with set_markdown_cache()
+_markdown_cache = None
+
+# Configured Markdown instances, one per thread (and so one per worker process)
+_markdown_local = threading.local()
+
+
+def set_markdown_cache(cache_dir):
+    """
+    Enable or disable the persistent cache of parsed Markdown files.
+    
+    Args:
+        cache_dir: Directory for cached entries, or None to disable caching
+        
+    Returns:
+        DiskCache: The active cache, or None
+    """
+    global _markdown_cache
+    _markdown_cache = DiskCache(cache_dir) if cache_dir else None
+    return _markdown_cache
+
+
+def _markdown_cache_key(raw_content, filepath, base_url):
+    """
+    Build the cache key of a Markdown file.
+    
+    The key covers everything that affects the generated HTML: the file's
+    bytes, its source path (used for link and asset adjustment), the base URL,
+    the extension configuration, the highlighting strategy and the versions of
+    Zerodown and Python-Markdown. The output path is left out: links are made
+    site-absolute, and staged builds write to a different directory each time.
+    """
+    try:
+        import pygments
+        pygments_version = pygments.__version__
+    except ImportError:
+        pygments_version = None
+    return cache_key(
+        raw_content,
+        os.path.abspath(filepath),
+        base_url,
+        repr(MARKDOWN_EXTENSIONS),
+        repr(sorted(MARKDOWN_EXTENSION_CONFIGS.items())),
+        highlight.guess_mode(),
+        __version__,
+        markdown.__version__,
+        pygments_version,
+    )
 
 
 class AssetProcessor(Treeprocessor):
@@ -18,8 +92,19 @@ class AssetProcessor(Treeprocessor):
     A Markdown treeprocessor that adjusts image and link paths to work correctly
     in the generated site.
     """
-    def __init__(self, md, item_path, output_path, base_url):
+    def __init__(self, md, item_path=None, output_path=None, base_url=None):
         super().__init__(md)
+        self.set_document(item_path, output_path, base_url)
+        
+    def set_document(self, item_path, output_path=None, base_url=None):
+        """
+        Set the paths of the document about to be converted.
+        
+        Args:
+            item_path: Path to the markdown file being processed (None disables adjustment)
+            output_path: Path where the HTML will be output
+            base_url: Base URL of the site
+        """
         self.item_path = item_path  # Path to the markdown file being processed
         self.output_path = output_path  # Path where the HTML will be output
         self.base_url = base_url  # Base URL of the site
@@ -29,6 +114,10 @@ class AssetProcessor(Treeprocessor):
         Process all image and anchor elements to adjust their paths.
         Also handles image dimensions specified in Markdown.
         """
+        # Nothing to adjust for content that doesn't come from a file
+        if not self.item_path:
+            return root
+            
         # Process images
         for img in root.findall('.//img'):
             if 'src' in img.attrib:
@@ -129,21 +218,47 @@ class AssetExtension(Extension):
     """
     Markdown extension that adjusts image and link paths.
     """
-    def __init__(self, item_path, output_path, base_url):
+    def __init__(self, item_path=None, output_path=None, base_url=None):
         super().__init__()
         self.item_path = item_path
         self.output_path = output_path
         self.base_url = base_url
+        self.processor = None
         
     def extendMarkdown(self, md):
+        self.processor = AssetProcessor(md, self.item_path, self.output_path, self.base_url)
         md.treeprocessors.register(
-            AssetProcessor(md, self.item_path, self.output_path, self.base_url),
+            self.processor,
             'asset_processor',
             175  # Priority: after 'inline' (150) but before 'prettify' (200)
         )
 
 
-def parse_markdown_file(filepath, output_path=None, base_url=None, context=None):
+def get_markdown_instance():
+    """
+    Returns this thread's configured Markdown instance, creating it on first use.
+    
+    Building a Markdown object instantiates every extension, which is a large
+    share of the cost of converting a small page, so the instance is reused and
+    reset() between documents instead.
+    
+    Returns:
+        tuple: (markdown.Markdown, AssetExtension) for this thread
+    """
+    instance = getattr(_markdown_local, 'instance', None)
+    if instance is None:
+        asset_ext = AssetExtension()
+        md = markdown.Markdown(
+            extensions=list(MARKDOWN_EXTENSIONS) + [asset_ext],
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+            output_format='html5'
+        )
+        instance = (md, asset_ext)
+        _markdown_local.instance = instance
+    return instance
+
+
+def parse_markdown_file(filepath, output_path=None, base_url=None, context=None, lazy_content=False):
     """
     Parses a Markdown file, extracting front matter and converting content.
     Also processes links and assets to work correctly in the final site.
@@ -153,45 +268,129 @@ def parse_markdown_file(filepath, output_path=None, base_url=None, context=None)
         output_path: Path where the HTML will be output (for link adjustment)
         base_url: Base URL of the site (for link adjustment)
         context: Context dictionary for shortcode processing
+        lazy_content: Leave the HTML in the Markdown cache and load it when
+            the item's content_html is read (ignored without a cache or
+            when shortcodes are processed)
         
     Returns:
-        dict: Dictionary with metadata, HTML content, filepath, and slug
+        ContentItem: Item with metadata, HTML content, filepath, and slug
     """
+    with timed("parse", output_path):
+        return _parse_markdown_file(filepath, output_path, base_url, context, lazy_content)
+
+
+def _parse_markdown_file(filepath, output_path, base_url, context, lazy_content):
+    """Implementation of parse_markdown_file (see there for the arguments)."""
     try:
-        post = frontmatter.load(filepath)
+        with open(filepath, 'rb') as f:
+            raw_content = f.read()
         
-        # Get the content
-        content = post.content
+        # Unchanged files are served from the cache, skipping conversion entirely
+        key = None
+        cached = None
+        if _markdown_cache is not None:
+            key = _markdown_cache_key(raw_content, filepath, base_url)
+            cached = _markdown_cache.get(key)
         
-        # Convert Markdown to HTML with asset processing and shortcode processing
-        html_content = convert_markdown_to_html(content, filepath, output_path, base_url, context)
+        if cached is not None:
+            metadata, html_content = cached
+        else:
+            post = frontmatter.loads(raw_content.decode('utf-8'))
+            metadata = post.metadata
+            
+            # Convert Markdown to HTML with asset processing (shortcodes are applied below)
+            html_content = convert_markdown_to_html(post.content, filepath, output_path, base_url)
+            _normalize_date(metadata, filepath)
+            
+            if key is not None:
+                _markdown_cache.set(key, (metadata, html_content))
         
-        # Ensure date is a Python date object if present
-        if 'date' in post.metadata and not isinstance(post.metadata['date'], datetime.date):
-           try:
-               # Handle both date and datetime strings
-               date_str = str(post.metadata['date'])
-               if ' ' in date_str:  # Likely datetime
-                    parsed_date = datetime.datetime.strptime(date_str.split(' ')[0], '%Y-%m-%d').date()
-               else:  # Likely date only
-                    parsed_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-               post.metadata['date'] = parsed_date
-           except (ValueError, TypeError):
-               print(f"Warning: Could not parse date '{post.metadata.get('date')}' in {filepath}. Expected YYYY-MM-DD.")
-               post.metadata['date'] = None
+        slug = os.path.splitext(os.path.basename(filepath))[0]  # Use filename (without ext) as slug
+        
+        if lazy_content and key is not None and not context:
+            return ContentItem(metadata, filepath, slug, content_ref=CachedContent(key, output_path, base_url))
+        
+        # Shortcodes depend on the rest of the site, so they are never cached
+        if context:
+            with current_page(output_path):
+                html_content = process_shortcodes(html_content, context)
 
-        return {
-            "metadata": post.metadata,
-            "content_html": html_content,
-            "filepath": filepath,
-            "slug": os.path.splitext(os.path.basename(filepath))[0]  # Use filename (without ext) as slug
-        }
+        return ContentItem(metadata, filepath, slug, content_html=html_content)
     except Exception as e:
         from zerodown.console import zconsole
         zconsole.error("Error parsing Markdown file", f"{filepath}: {e}")
         return None
 
 
+def _normalize_date(metadata, filepath):
+    """Ensure the 'date' in a file's front matter is a Python date object if present."""
+    if 'date' in metadata and not isinstance(metadata['date'], datetime.date):
+       try:
+           # Handle both date and datetime strings
+           date_str = str(metadata['date'])
+           if ' ' in date_str:  # Likely datetime
+                parsed_date = datetime.datetime.strptime(date_str.split(' ')[0], '%Y-%m-%d').date()
+           else:  # Likely date only
+                parsed_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+           metadata['date'] = parsed_date
+       except (ValueError, TypeError):
+           from zerodown.console import zconsole
+           zconsole.warning(f"Could not parse date '{metadata.get('date')}' in {filepath}. Expected YYYY-MM-DD.")
+           metadata['date'] = None
+
+
+def parse_front_matter(filepath):
+    """
+    Reads only the front matter of a Markdown file, without converting it.
+    
+    Args:
+        filepath: Path to the Markdown file
+        
+    Returns:
+        dict: Front matter, with the same date handling as parse_markdown_file,
+        or None if the file cannot be read
+    """
+    try:
+        post = frontmatter.load(filepath)
+    except Exception as e:
+        from zerodown.console import zconsole
+        zconsole.error("Error reading front matter", f"{filepath}: {e}")
+        return None
+    metadata = post.metadata
+    _normalize_date(metadata, filepath)
+    return metadata
+
+
+class CachedContent:
+    """
+    Reference to the HTML of a parsed file in the Markdown cache, used by
+    items parsed with lazy content.
+    """
+    
+    __slots__ = ('key', 'output_path', 'base_url')
+    
+    def __init__(self, key, output_path=None, base_url=None):
+        self.key = key
+        self.output_path = output_path
+        self.base_url = base_url
+    
+    def load(self, filepath):
+        """
+        Loads the HTML from the Markdown cache.
+        
+        Args:
+            filepath: Path to the Markdown file
+            
+        Returns:
+            str: HTML content (re-parsed from the source if the cache entry is gone)
+        """
+        cached = _markdown_cache.get(self.key) if _markdown_cache is not None else None
+        if cached is not None:
+            return cached[1]
+        item = parse_markdown_file(filepath, output_path=self.output_path, base_url=self.base_url)
+        return item.content_html if item else ""
+
+
 def parse_markdown_content(content, source_path=None, output_path=None, base_url=None):
     """
     Parses Markdown content from a string, extracting front matter and converting content.
@@ -246,37 +445,18 @@ def convert_markdown_to_html(content, source_path=None, output_path=None, base_u
     # DO NOT pre-process code blocks - let the markdown processor handle them directly
     # This prevents issues with nesting and content being treated as code blocks
     
-    # Standard and reliable set of extensions
-    extensions = [
-        'markdown.extensions.extra',        # Includes abbr, attr_list, def_list, fenced_code, footnotes, tables, smarty
-        'markdown.extensions.codehilite',   # Syntax highlighting
-        'markdown.extensions.toc',          # Table of contents
-        'markdown.extensions.sane_lists',   # Improved list handling
-        # 'markdown.extensions.nl2br',      # Often causes issues, leave out unless needed
-    ]
-    extension_configs = {
-        'markdown.extensions.codehilite': {
-            'css_class': 'codehilite',
-            'linenums': False,
-            'guess_lang': True
-        },
-        'markdown.extensions.toc': {
-            'permalink': False  # Disable permalink symbols that add the ¶ character
-        }
-    }
+    md, asset_ext = get_markdown_instance()
 
-    # Add asset processing if source_path is provided
-    if source_path:
-        asset_ext = AssetExtension(source_path, output_path, base_url)
-        extensions.append(asset_ext)
+    # Asset processing only applies if source_path is provided
+    asset_ext.processor.set_document(source_path, output_path, base_url)
 
     # Convert Markdown to HTML
-    html_content = markdown.markdown(
-        content,
-        extensions=extensions,
-        extension_configs=extension_configs,
-        output_format='html5'
-    )
+    try:
+        with timed("markdown", output_path):
+            html_content = md.convert(content)
+    finally:
+        md.reset()
+        asset_ext.processor.set_document(None)
 
     # Process shortcodes AFTER HTML generation if context is provided
     if context:
@@ -285,7 +465,7 @@ def convert_markdown_to_html(content, source_path=None, output_path=None, base_u
     return html_content
 
 
-def copy_content_assets(config):
+def copy_content_assets(config, sync=None):
     """
     Copy assets from content directory to output directory.
     This ensures that images and other assets referenced in Markdown files
@@ -293,6 +473,7 @@ def copy_content_assets(config):
     
     Args:
         config: Configuration module with CONTENT_DIR and OUTPUT_DIR defined
+        sync: Optional AssetSync that copies only new and changed files
     """
     assets_dir = os.path.join(config.CONTENT_DIR, 'assets')
     output_assets_dir = os.path.join(config.OUTPUT_DIR, 'assets')
@@ -303,6 +484,14 @@ def copy_content_assets(config):
     
     from zerodown.console import zconsole
     zconsole.info("Copying content assets", f"from {assets_dir} to {output_assets_dir}")
+    if sync is not None:
+        try:
+            sync.sync_tree(assets_dir, output_assets_dir, skip_hidden=True)
+        except OSError as e:
+            zconsole.error("Error copying content assets", str(e))
+        return
+    from zerodown.utils import copy_asset_file, get_asset_copy_mode
+    copy_mode = get_asset_copy_mode(config)
     try:
         os.makedirs(output_assets_dir, exist_ok=True)
         for root, dirs, files in os.walk(assets_dir):
@@ -321,8 +510,7 @@ def copy_content_assets(config):
                 
                 # Copy the file
                 try:
-                    import shutil
-                    shutil.copy2(src_path, dst_path)
+                    copy_asset_file(src_path, dst_path, copy_mode)
                 except Exception as e:
                     from zerodown.console import zconsole
                     zconsole.error("Error copying asset", f"{src_path}: {e}")
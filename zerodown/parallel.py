@@ -0,0 +1,111 @@
+"""
+Parallel processing helpers for the Zerodown static site generator.
+
+Pages are parsed and rendered on a pool of forked worker processes. Forking
+lets workers inherit the configuration, Jinja environment and content items
+without pickling them, so only small task descriptions and results cross
+process boundaries.
+"""
+
+import os
+import multiprocessing
+from zerodown.console import zconsole
+from zerodown.utils import write_stats, flush_output_files
+from zerodown.profiling import get_profiler
+
+# State shared with forked workers, set just before the pool is created
+_worker_state = None
+
+
+def resolve_jobs(jobs):
+    """
+    Normalize a requested number of parallel jobs.
+
+    Args:
+        jobs: Requested number of jobs (0 or None means one per CPU)
+
+    Returns:
+        int: Number of jobs to use (at least 1)
+    """
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, int(jobs))
+
+
+def can_fork():
+    """
+    Check whether the platform supports forked worker processes.
+
+    Returns:
+        bool: True if the 'fork' start method is available
+    """
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def run_tasks(func, tasks, jobs=1, state=None):
+    """
+    Run ``func(state, task)`` for every task, in parallel when possible.
+
+    Results are returned in task order, and console messages emitted by a
+    task are replayed in the main process in that same order, so output is
+    deterministic regardless of scheduling. Output write counts and profiling
+    records from workers are added to those of the main process.
+
+    Args:
+        func: Module-level function taking (state, task)
+        tasks: List of picklable task descriptions
+        jobs: Number of worker processes to use
+        state: Data shared with all tasks (inherited by forked workers)
+
+    Returns:
+        list: Results of each task, in task order
+    """
+    tasks = list(tasks)
+    if jobs <= 1 or len(tasks) < 2 or not can_fork():
+        return [func(state, task) for task in tasks]
+
+    global _worker_state
+    _worker_state = state
+    workers = min(jobs, len(tasks))
+    # Several chunks per worker keeps the pool balanced when page sizes vary
+    chunksize = max(1, len(tasks) // (workers * 4))
+    chunks = [(func, tasks[start:start + chunksize]) for start in range(0, len(tasks), chunksize)]
+    # Writer threads must not be running while the process forks
+    flush_output_files(close=True)
+    results = []
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for chunk_results, writes, timings in pool.imap(_run_chunk, chunks):
+                for result, messages in chunk_results:
+                    zconsole.replay(messages)
+                    results.append(result)
+                write_stats.add(writes)
+                if timings:
+                    get_profiler().merge(timings)
+    finally:
+        _worker_state = None
+    return results
+
+
+def _run_chunk(call):
+    """
+    Run a chunk of tasks in a worker, capturing console messages per task.
+
+    Pages queued for background writing are flushed at the end of the
+    chunk, before the worker reports back (and may be terminated).
+    """
+    func, chunk = call
+    writes = write_stats.snapshot()
+    results = []
+    for index, task in enumerate(chunk):
+        with zconsole.capture() as messages:
+            try:
+                result = func(_worker_state, task)
+            except Exception as e:
+                zconsole.error("Unexpected error in worker process", f"{task}: {e}")
+                result = None
+            if index == len(chunk) - 1:
+                flush_output_files()
+        results.append((result, messages))
+    profiler = get_profiler()
+    return results, write_stats.since(writes), profiler.drain() if profiler else None
@@ -0,0 +1,415 @@
+"""
+Build profiling for the Zerodown static site generator.
+
+When a build runs with ``--profile``, the builder times every phase (wall
+clock and CPU time, including finished worker processes) and the pipeline records
+how long each page spends being parsed, converted from Markdown, having
+its shortcodes expanded, rendered and written. The results are saved as a
+JSON report with the slowest pages and templates.
+
+With ``--trace``, the same phase and page spans are saved in the Chrome
+trace event format, to be opened in a trace viewer such as Perfetto or
+chrome://tracing. Every worker process and writer thread gets its own track.
+
+Profiling is off unless a BuildProfiler is started; the timing helpers are
+then no-ops.
+"""
+
+import os
+import json
+import time
+import threading
+import datetime
+
+from zerodown import __version__
+from zerodown.console import zconsole
+
+# Per-page stages, in pipeline order
+PAGE_STAGES = ('parse', 'markdown', 'shortcode', 'render', 'write')
+
+# Number of slowest pages and templates listed in the report
+DEFAULT_PROFILE_TOP = 20
+
+# Profiler of the current build (inherited by forked worker processes)
+_profiler = None
+
+# Page being processed by the current thread, for stages timed deep in the pipeline
+_local = threading.local()
+
+
+class _NullTimer:
+    """Context manager used when profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _cpu_time():
+    """CPU time of this process and its finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class _StageTimer:
+    """Times one stage of a page and records it with the profiler."""
+
+    __slots__ = ('profiler', 'stage', 'page', 'template', 'start')
+
+    def __init__(self, profiler, stage, page, template):
+        self.profiler = profiler
+        self.stage = stage
+        self.page = page
+        self.template = template
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.stage, self.page, time.perf_counter() - self.start, self.template,
+                             self.start)
+        return False
+
+
+class BuildProfiler:
+    """
+    Collects phase and page timings for one build.
+
+    Page timings recorded in worker processes are collected with drain()
+    and added to the main process's profiler with merge() (run_tasks does
+    this).
+    """
+
+    def __init__(self, config, jobs=1):
+        self.config = config
+        self.jobs = jobs
+        self.phases = []
+        self._phase = None
+        self.records = []
+        self.pid = os.getpid()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = _cpu_time()
+
+    def _page_key(self, path):
+        """Return a page path relative to the output directory."""
+        if path is None:
+            return None
+        return os.path.relpath(path, self.config.OUTPUT_DIR).replace(os.sep, "/")
+
+    def record(self, stage, page, seconds, template=None, start=None):
+        """
+        Record the duration of one stage of a page.
+
+        Args:
+            stage: One of PAGE_STAGES
+            page: Output path of the page
+            seconds: Duration in seconds
+            template: Template name, for render timings
+            start: time.perf_counter() value when the stage started; defaults
+                to ``seconds`` before now
+        """
+        if self.pid != os.getpid():
+            # First record in a forked worker: drop the records inherited from the parent
+            self.pid = os.getpid()
+            self.records = []
+        if start is None:
+            start = time.perf_counter() - seconds
+        self.records.append((stage, self._page_key(page), seconds, template,
+                             start, self.pid, threading.current_thread().name))
+
+    def drain(self):
+        """
+        Return and forget the page timings recorded so far.
+
+        Returns:
+            list: Records to pass to merge() in the main process
+        """
+        if self.pid != os.getpid():
+            return []
+        records, self.records = self.records, []
+        return records
+
+    def merge(self, records):
+        """Add page timings recorded by a worker process."""
+        self.records.extend(records)
+
+    def enter_phase(self, name):
+        """
+        End the current build phase and start timing the next one.
+
+        Args:
+            name: Phase name, e.g. "styles" or "section:posts"; None only
+                ends the current phase
+        """
+        now_wall = time.perf_counter()
+        now_cpu = _cpu_time()
+        if self._phase is not None:
+            phase_name, start_wall, start_cpu = self._phase
+            self.phases.append({
+                "name": phase_name,
+                "start": round(start_wall - self.start_wall, 6),
+                "wall": round(now_wall - start_wall, 6),
+                "cpu": round(now_cpu - start_cpu, 6),
+            })
+        self._phase = (name, now_wall, now_cpu) if name is not None else None
+
+    def report(self, top=DEFAULT_PROFILE_TOP):
+        """
+        Build the profile report.
+
+        Args:
+            top: Number of slowest pages and templates to list
+
+        Returns:
+            dict: JSON-serializable report
+        """
+        self.enter_phase(None)
+        pages = {}
+        templates = {}
+        totals = dict.fromkeys(PAGE_STAGES, 0.0)
+        for stage, page, seconds, template, *_ in self.records:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+            if page is not None:
+                timings = pages.setdefault(page, {})
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            if template is not None:
+                entry = templates.setdefault(template, {"template": template, "renders": 0,
+                                                        "total": 0.0, "max": 0.0})
+                entry["renders"] += 1
+                entry["total"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+
+        page_rows = []
+        for page, timings in pages.items():
+            # 'markdown' runs inside 'parse', so it is not added to the total
+            total = sum(seconds for stage, seconds in timings.items() if stage != 'markdown')
+            row = {"page": page, "total": round(total, 6)}
+            row.update({stage: round(timings[stage], 6) for stage in PAGE_STAGES if stage in timings})
+            page_rows.append(row)
+        page_rows.sort(key=lambda row: row["total"], reverse=True)
+
+        template_rows = sorted(templates.values(), key=lambda row: row["total"], reverse=True)
+        for row in template_rows:
+            row["mean"] = round(row["total"] / row["renders"], 6)
+            row["total"] = round(row["total"], 6)
+            row["max"] = round(row["max"], 6)
+
+        return {
+            "zerodown": __version__,
+            "site": getattr(self.config, 'SITE_NAME', None),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "jobs": self.jobs,
+            "total": {
+                "wall": round(time.perf_counter() - self.start_wall, 6),
+                "cpu": round(_cpu_time() - self.start_cpu, 6),
+            },
+            "phases": self.phases,
+            "stage_totals": {stage: round(seconds, 6) for stage, seconds in totals.items()},
+            "page_count": len(page_rows),
+            "slowest_pages": page_rows[:top],
+            "slowest_templates": template_rows[:top],
+            "pages": {row["page"]: {key: value for key, value in row.items() if key != "page"}
+                      for row in sorted(page_rows, key=lambda row: row["page"])},
+        }
+
+    def save(self, path, top=DEFAULT_PROFILE_TOP):
+        """
+        Write the profile report as JSON.
+
+        Args:
+            path: Report file path
+            top: Number of slowest pages and templates to list
+
+        Returns:
+            bool: True if the report was written
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(top), f, indent=2)
+            return True
+        except OSError as e:
+            zconsole.error("Error writing profile report", f"{path}: {e}")
+            return False
+
+    def trace_events(self):
+        """
+        Build the phase and page spans in the Chrome trace event format.
+
+        Phases are complete ("X") events on the main thread of the build
+        process; page stages are placed on the process and thread that ran
+        them, so worker processes and writer threads appear as separate
+        tracks. Timestamps are microseconds since the start of the build.
+
+        Returns:
+            dict: JSON-serializable trace
+        """
+        self.enter_phase(None)
+        main_pid = os.getpid()
+        events = []
+        workers = {main_pid: 0}
+        threads = {}
+
+        def track(pid, thread):
+            if pid not in workers:
+                workers[pid] = len(workers)
+            if (pid, thread) not in threads:
+                threads[(pid, thread)] = len([key for key in threads if key[0] == pid])
+            return threads[(pid, thread)]
+
+        main_tid = track(main_pid, threading.main_thread().name)
+        end = time.perf_counter() - self.start_wall
+        events.append({"name": "build", "cat": "build", "ph": "X", "pid": main_pid, "tid": main_tid,
+                       "ts": 0, "dur": round(end * 1e6, 3),
+                       "args": {"site": getattr(self.config, 'SITE_NAME', None), "jobs": self.jobs}})
+        for phase in self.phases:
+            events.append({"name": phase["name"], "cat": "phase", "ph": "X",
+                           "pid": main_pid, "tid": main_tid,
+                           "ts": round(phase["start"] * 1e6, 3), "dur": round(phase["wall"] * 1e6, 3),
+                           "args": {"cpu": phase["cpu"]}})
+
+        for stage, page, seconds, template, start, pid, thread in self.records:
+            tid = track(pid, thread)
+            args = {"page": page, "worker": workers[pid]}
+            if template is not None:
+                args["template"] = template
+            events.append({"name": stage, "cat": "page", "ph": "X", "pid": pid, "tid": tid,
+                           "ts": round((start - self.start_wall) * 1e6, 3),
+                           "dur": round(seconds * 1e6, 3), "args": args})
+
+        # Name the tracks
+        for pid, worker in workers.items():
+            name = "zerodown build" if pid == main_pid else f"worker {worker}"
+            events.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                           "args": {"name": name}})
+            events.append({"name": "process_sort_index", "ph": "M", "pid": pid, "tid": 0,
+                           "args": {"sort_index": worker}})
+        for (pid, thread), tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": thread}})
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "zerodown": __version__,
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            },
+        }
+
+    def save_trace(self, path):
+        """
+        Write the build timeline as a Chrome trace event file.
+
+        Args:
+            path: Trace file path
+
+        Returns:
+            bool: True if the trace was written
+        """
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.trace_events(), f, separators=(",", ":"))
+            return True
+        except OSError as e:
+            zconsole.error("Error writing build trace", f"{path}: {e}")
+            return False
+
+
+def start_profiling(config, jobs=1):
+    """
+    Start profiling a build.
+
+    Args:
+        config: Configuration module
+        jobs: Number of worker processes of the build
+
+    Returns:
+        BuildProfiler: The active profiler
+    """
+    global _profiler
+    _profiler = BuildProfiler(config, jobs)
+    return _profiler
+
+
+def stop_profiling():
+    """Stop profiling, turning the timing helpers back into no-ops."""
+    global _profiler
+    _profiler = None
+
+
+def get_profiler():
+    """Return the active BuildProfiler, or None if profiling is off."""
+    return _profiler
+
+
+def enter_phase(name):
+    """
+    Start timing the next build phase if profiling is on.
+
+    Args:
+        name: Phase name; None only ends the current phase
+    """
+    if _profiler is not None:
+        _profiler.enter_phase(name)
+
+
+def timed(stage, page=None, template=None):
+    """
+    Time one stage of a page if profiling is on.
+
+    Args:
+        stage: One of PAGE_STAGES
+        page: Output path of the page; defaults to the page set with current_page()
+        template: Template name, for render timings
+
+    Returns:
+        Context manager
+    """
+    if _profiler is None:
+        return _NULL_TIMER
+    if page is None:
+        page = getattr(_local, "page", None)
+    return _StageTimer(_profiler, stage, page, template)
+
+
+class _PageScope:
+    """Sets the page of the current thread while it is processed."""
+
+    __slots__ = ('page', 'previous')
+
+    def __init__(self, page):
+        self.page = page
+
+    def __enter__(self):
+        self.previous = getattr(_local, "page", None)
+        _local.page = self.page
+        return self
+
+    def __exit__(self, *exc):
+        _local.page = self.previous
+        return False
+
+
+def current_page(output_path):
+    """
+    Attribute the stages timed by this thread to a page.
+
+    Args:
+        output_path: Output path of the page
+
+    Returns:
+        Context manager
+    """
+    if _profiler is None:
+        return _NULL_TIMER
+    return _PageScope(output_path)
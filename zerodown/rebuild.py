@@ -0,0 +1,358 @@
+"""
+In-process rebuilds for the Zerodown development server.
+
+``serve --watch`` builds the site once and keeps what the build parsed in
+memory: the Jinja environment, the items of every section, the site index,
+and the build and asset manifests with the dependency graph. When sources
+change, the changed paths are mapped through the dependency graph to the
+outputs they affect. Only the changed Markdown files are parsed again, only
+the changed assets are synced and only the affected pages are rendered,
+straight into the published output directory. Pages are written under a
+temporary name and moved into place, and only when their content changed.
+
+Changes the graph does not cover, such as a new include file, a section
+directory that did not exist or a removed directory, fall back to a full
+incremental build. Compressed siblings of changed pages are refreshed by
+the next build; until then the server ignores siblings older than the file
+they compress.
+"""
+
+import os
+
+from zerodown.builder import build_site
+from zerodown.utils import copy_styles, set_write_if_changed, write_stats, flush_output_files
+from zerodown.templates import set_stream_all, process_includes
+from zerodown.content import (list_section_files, parse_section_file, sort_items, expand_shortcodes,
+                              build_item_pages, build_section_list, build_homepage,
+                              process_top_level_pages)
+from zerodown.shortcodes import configure_shortcode_templates, ITEM_QUERY_SHORTCODES
+from zerodown.siteindex import SiteIndex
+from zerodown.deps import ALL_TEMPLATES
+from zerodown.livereload import snapshot_outputs, diff_outputs
+from zerodown.console import zconsole
+
+
+def _is_below(path, directory):
+    """Check whether an absolute path is inside a directory."""
+    return path.startswith(directory + os.sep)
+
+
+class LiveSite:
+    """
+    A built site kept in memory and updated in place when its sources change.
+
+    Args:
+        config: Configuration module
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.state = None  # Parsed site of the last build, see build_site()
+
+    def build(self):
+        """
+        Build the site incrementally and keep its parsed state.
+
+        Returns:
+            bool: True if the build was successful
+        """
+        state = {}
+        success = build_site(self.config, incremental=True, state=state)
+        self.state = state if success and state else None
+        return success
+
+    def update(self, changes):
+        """
+        Render the pages and sync the assets affected by changed files.
+
+        Args:
+            changes: List of changed absolute paths (not including the
+                configuration file)
+
+        Returns:
+            tuple: (changed output paths, removed output paths), relative to
+            OUTPUT_DIR with '/' separators, or None if the changes need a
+            full build
+        """
+        if self.state is None:
+            return None
+        try:
+            return self._update(changes)
+        except Exception as e:
+            zconsole.error("Update failed, rebuilding the site", str(e))
+            self.state = None
+            return None
+        finally:
+            flush_output_files(close=True)
+
+    def _update(self, changes):
+        """Implementation of update (see there for the arguments)."""
+        config = self.config
+        state = self.state
+        manifest = state["manifest"]
+        graph = manifest.graph
+        asset_sync = state["asset_sync"]
+        content_dir = os.path.abspath(config.CONTENT_DIR)
+        template_dir = os.path.abspath(config.TEMPLATE_DIR)
+        styles_dir = os.path.abspath(config.STYLES_DIR)
+        static_dir = os.path.abspath(config.STATIC_DIR)
+
+        pages = set()            # Output keys to render
+        removed_pages = set()    # Output keys whose source is gone
+        section_changes = {}     # Section key -> changed Markdown files
+        top_level = set()        # Changed top-level Markdown files
+        assets = {}              # Output key -> (source, destination)
+        includes_changed = styles_changed = shortcode_templates_changed = False
+
+        for path in changes:
+            if os.path.isdir(path):
+                continue  # The files of a new directory are reported as well
+            if not os.path.lexists(path) and self._tracks_below(path):
+                return None  # A directory was removed or moved away
+
+            if _is_below(path, template_dir):
+                pages.update(graph.dependents(path))
+                if _is_below(path, os.path.join(template_dir, 'shortcodes')):
+                    shortcode_templates_changed = True
+            elif _is_below(path, content_dir):
+                rel_path = graph.content_key(path)
+                parts = rel_path.split('/')
+                filename = parts[-1]
+                if parts[0] == 'assets' and len(parts) > 1:
+                    if not filename.startswith('.'):
+                        assets[rel_path] = (os.path.join(config.CONTENT_DIR, *parts),
+                                            os.path.join(config.OUTPUT_DIR, *parts))
+                    continue
+                if filename.startswith('.') or not filename.lower().endswith('.md'):
+                    continue  # Not part of the site
+                if parts[0] == '_includes' and len(parts) == 2:
+                    # New and removed includes add or remove template globals
+                    stem = os.path.splitext(filename)[0]
+                    if f"{stem}_html" not in state["includes"] or not os.path.isfile(path):
+                        return None
+                    includes_changed = True
+                    pages.update(graph.dependents(path))
+                elif len(parts) == 1:
+                    if filename.lower() == 'home.md':
+                        pages.add('index.html')
+                    else:
+                        top_level.add(filename)
+                elif len(parts) == 2 and parts[0] in (getattr(config, 'SECTIONS', {}) or {}):
+                    if parts[0] not in state["sections"]:
+                        return None  # The section was skipped by the build
+                    section_changes.setdefault(parts[0], set()).add(path)
+                    pages.update(graph.dependents(path))
+            if _is_below(path, styles_dir):
+                styles_changed = True
+            if _is_below(path, static_dir):
+                rel_path = os.path.relpath(path, static_dir)
+                key = rel_path.replace(os.sep, "/")
+                assets[key] = (os.path.join(config.STATIC_DIR, rel_path),
+                               os.path.join(config.OUTPUT_DIR, rel_path))
+            elif not (_is_below(path, template_dir) or _is_below(path, content_dir)
+                      or _is_below(path, styles_dir)):
+                return None
+
+        # Top-level pages are rendered, or removed with their source
+        for filename in top_level:
+            key = os.path.splitext(filename)[0] + '.html'
+            if os.path.isfile(os.path.join(config.CONTENT_DIR, filename)):
+                pages.add(key)
+            else:
+                removed_pages.add(key)
+
+        # Outputs that may change, to tell open pages which ones did
+        asset_keys = set(assets)
+        if styles_changed:
+            asset_keys |= {key for key, entry in asset_sync.files.items()
+                           if os.path.abspath(entry["source"]).startswith(styles_dir + os.sep)}
+        before = snapshot_outputs(config.OUTPUT_DIR, pages | removed_pages | asset_keys)
+
+        write_stats.reset()
+        set_write_if_changed(getattr(config, 'WRITE_IF_CHANGED', True))
+        set_stream_all(True)  # Pages replace their output file atomically
+        manifest.refresh(changes)
+        jinja_env = state["jinja_env"]
+        if any(_is_below(path, template_dir) for path in changes):
+            if jinja_env.cache is not None:
+                jinja_env.cache.clear()  # The environment does not check templates for changes
+            if shortcode_templates_changed:
+                configure_shortcode_templates(jinja_env)
+
+        if includes_changed:
+            for key in state["includes"]:
+                jinja_env.globals.pop(key, None)
+            state["includes"] = process_includes(config, jinja_env)
+
+        assets_changed = self._sync_assets(assets, styles_changed)
+
+        # Parse the changed items and put every section back in build order
+        fresh = []
+        for section_key, paths in section_changes.items():
+            items, new_items, removed_keys = self._update_section(section_key, paths)
+            state["sections"][section_key] = items
+            fresh.extend(new_items)
+            removed_pages |= removed_keys
+            pages.update(f"{section_key}/{item.slug}.html" for item in new_items)
+        if section_changes:
+            all_items = [item for items in state["sections"].values() for item in items]
+            site = SiteIndex(all_items, config).freeze()
+            jinja_env.globals['site'] = site
+            state["all_items"], state["site"] = all_items, site
+        all_items, site = state["all_items"], state["site"]
+
+        # Expand the shortcodes of new items, and of affected items whose
+        # shortcodes list other items or use a changed shortcode template
+        fresh_ids = {id(item) for item in fresh}
+        expand = []
+        for index, item in enumerate(all_items):
+            if id(item) in fresh_ids:
+                expand.append(index)
+                continue
+            if f"{item.section_key}/{item.slug}.html" not in pages:
+                continue
+            used = manifest.source_shortcodes(item.filepath)
+            if (section_changes and used & ITEM_QUERY_SHORTCODES) or (shortcode_templates_changed and used):
+                parsed = parse_section_file(config, item.section_key, item.filepath)
+                if parsed is not None:
+                    item.content_html = parsed.content_html
+                    expand.append(index)
+        if expand:
+            expand_shortcodes(config, all_items, site, indices=expand)
+
+        # Forget the outputs of removed sources
+        pages -= removed_pages
+        for key in removed_pages:
+            manifest.outputs.pop(key, None)
+            graph.pages.pop(key, None)
+
+        self._render(pages, top_level)
+        flush_output_files(close=True)
+        deleted = manifest.remove_stale_outputs()
+
+        manifest.save()
+        if assets_changed:
+            asset_sync.save()
+
+        zconsole.success("Updated site", f"{manifest.rendered} pages rendered, "
+                                         f"{write_stats.written} written, {asset_sync.copied} assets copied, "
+                                         f"{deleted + asset_sync.removed} files deleted")
+        after = snapshot_outputs(config.OUTPUT_DIR, pages | removed_pages | asset_keys)
+        return diff_outputs(before, after)
+
+    def _tracks_below(self, path):
+        """Check whether any source of the last build is inside a (removed) directory."""
+        state = self.state
+        prefix = path + os.sep
+        template_dir = os.path.abspath(self.config.TEMPLATE_DIR)
+        content_dir = os.path.abspath(self.config.CONTENT_DIR)
+        sources = [item.filepath for item in state["all_items"]]
+        sources += [entry["source"] for entry in state["asset_sync"].files.values()]
+        for deps in state["manifest"].graph.pages.values():
+            sources += [os.path.join(template_dir, name) for name in deps["templates"] if name != ALL_TEMPLATES]
+            sources += [os.path.join(content_dir, name) for name in deps["includes"]]
+        return any(os.path.abspath(source).startswith(prefix) for source in sources)
+
+    def _sync_assets(self, assets, styles_changed):
+        """
+        Copy changed assets and remove the outputs of deleted ones.
+
+        Args:
+            assets: Output keys mapped to (source path, output path)
+            styles_changed: Whether a file in STYLES_DIR changed
+
+        Returns:
+            bool: True if the asset manifest changed
+        """
+        asset_sync = self.state["asset_sync"]
+        asset_sync.copied = asset_sync.unchanged = asset_sync.removed = 0
+        asset_sync.previous = dict(asset_sync.files)
+        changed = False
+        for key, (src_path, dst_path) in sorted(assets.items()):
+            if os.path.isfile(src_path):
+                asset_sync.sync_file(src_path, dst_path)
+                changed = True
+            else:
+                entry = asset_sync.files.get(key)
+                # Only an output copied from this source is removed with it
+                if entry and os.path.abspath(entry["source"]) == os.path.abspath(src_path):
+                    del asset_sync.files[key]
+                    changed = True
+        if styles_changed:
+            copy_styles(self.config, asset_sync)
+            changed = True
+        asset_sync.finish(save=False)  # Removes the outputs of deleted assets
+        return changed
+
+    def _update_section(self, section_key, paths):
+        """
+        Parse the changed Markdown files of a section.
+
+        Args:
+            section_key: Key identifying the section
+            paths: Absolute paths of the changed files
+
+        Returns:
+            tuple: (sorted items of the section, newly parsed items, output
+            keys of removed items)
+        """
+        config = self.config
+        section_config = config.SECTIONS[section_key]
+        previous = self.state["sections"][section_key]
+        known = {os.path.abspath(item.filepath): item for item in previous if
+                 os.path.abspath(item.filepath) not in paths}
+
+        # Keep the order of a full build, where items are parsed in directory order
+        items, new_items = [], []
+        for _, filepath, _ in list_section_files(config, section_key, section_config) or []:
+            item = known.get(os.path.abspath(filepath))
+            if item is None:
+                item = parse_section_file(config, section_key, filepath)
+                if item is None:
+                    continue
+                new_items.append(item)
+            items.append(item)
+        sort_items(items, section_config, section_key)
+
+        slugs = {item.slug for item in items}
+        removed_keys = {f"{section_key}/{item.slug}.html" for item in previous if item.slug not in slugs}
+        return items, new_items, removed_keys
+
+    def _render(self, pages, top_level):
+        """
+        Render the pages with the given output keys, skipping those whose
+        inputs did not change.
+
+        Args:
+            pages: Output paths relative to OUTPUT_DIR
+            top_level: Changed top-level Markdown files
+        """
+        config = self.config
+        state = self.state
+        jinja_env = state["jinja_env"]
+        manifest = state["manifest"]
+        all_items, site = state["all_items"], state["site"]
+
+        for section_key, section_items in state["sections"].items():
+            section_config = config.SECTIONS[section_key]
+            items = [item for item in section_items if f"{section_key}/{item.slug}.html" in pages]
+            build_item_pages(config, jinja_env, items, section_config, manifest)
+            if f"{section_key}/index.html" in pages:
+                section_title = section_config.get('title', section_key.capitalize())
+                build_section_list(config, jinja_env, section_items, section_config, section_key,
+                                   section_title, manifest)
+
+        if 'index.html' in pages:
+            build_homepage(config, jinja_env, all_items, site, manifest)
+
+        # Top-level pages are the remaining outputs at the root of the site
+        filenames = set(top_level)
+        for key in pages:
+            if '/' not in key and key != 'index.html':
+                filenames.update(graph_source for graph_source in
+                                 manifest.graph.pages.get(key, {}).get("sources", ()) if '/' not in graph_source)
+        filenames = sorted(filename for filename in filenames
+                           if os.path.splitext(filename)[0] + '.html' in pages
+                           and os.path.isfile(os.path.join(config.CONTENT_DIR, filename)))
+        if filenames:
+            process_top_level_pages(config, jinja_env, all_items, site, manifest, filenames)
@@ -0,0 +1,227 @@
+"""
+Static file server for Zerodown sites.
+
+Serves the output directory over HTTP/1.1 on a thread per connection, so a
+slow client does not hold up the others. Responses carry ETag and
+Last-Modified validators and conditional requests are answered with
+``304 Not Modified``. Precompressed ``.br`` and ``.gz`` siblings of a file
+are sent to clients that accept them, byte ranges are supported, and file
+bodies are sent with sendfile() instead of being copied through Python.
+"""
+
+import os
+import datetime
+import email.utils
+import http.server
+from http import HTTPStatus
+
+# Precompressed siblings, in order of preference
+CONTENT_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header.
+
+    Args:
+        header: Header value, or None
+
+    Returns:
+        set: Content codings the client accepts
+    """
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(coding for coding, _ in CONTENT_ENCODINGS)
+    return accepted
+
+
+def _parse_range(header, size):
+    """
+    Parse a single byte range.
+
+    Args:
+        header: Range header value
+        size: Size of the representation
+
+    Returns:
+        tuple: (start, end) inclusive, None if the header is absent, has
+        several ranges or is malformed (the whole file is sent), or
+        False if the range cannot be satisfied
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start:
+            start = int(start)
+            end = int(end) if end else size - 1
+        elif end:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(end))
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def make_etag(st, suffix=""):
+    """Return the entity tag of a file from its modification time and size."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+
+
+class StaticFileHandler(http.server.SimpleHTTPRequestHandler):
+    """Request handler for the files of a built site."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY a keep-alive
+    # client waits for its delayed ACK before the body is sent
+    disable_nagle_algorithm = True
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return super().send_head()  # Redirects to the URL with a slash
+            for index in ("index.html", "index.htm"):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                return super().send_head()  # Directory listing
+        if path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        # Pick a precompressed sibling the client accepts, if it is up to date
+        content_type = self.guess_type(path)
+        encoding = None
+        send_path, send_st = path, st
+        has_variants = False
+        accepted = _accepted_encodings(self.headers.get("Accept-Encoding"))
+        for coding, suffix in CONTENT_ENCODINGS:
+            try:
+                variant_st = os.stat(path + suffix)
+            except OSError:
+                continue
+            if variant_st.st_mtime_ns < st.st_mtime_ns:
+                continue  # Older than the file it compresses
+            has_variants = True
+            if encoding is None and coding in accepted:
+                encoding = coding
+                send_path, send_st = path + suffix, variant_st
+        etag = make_etag(send_st, f"-{encoding}" if encoding else "")
+        last_modified = self.date_time_string(st.st_mtime)
+
+        def common_headers():
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Cache-Control", "no-cache")
+            if has_variants:
+                self.send_header("Vary", "Accept-Encoding")
+
+        if self._not_modified(etag, st):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            common_headers()
+            self.end_headers()
+            return None
+
+        try:
+            f = open(send_path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        size = send_st.st_size
+        byte_range = None
+        if_range = self.headers.get("If-Range")
+        if if_range is None or if_range == etag or if_range == last_modified:
+            byte_range = _parse_range(self.headers.get("Range"), size)
+        if byte_range is False:
+            f.close()
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            common_headers()
+            self.end_headers()
+            return None
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        common_headers()
+        self.end_headers()
+        self._sendfile = (f, start, end - start + 1)
+        return f
+
+    def _not_modified(self, etag, st):
+        """Check the conditional request headers against a file's validators."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            # Weak comparison: W/"x" matches "x"
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, IndexError, OverflowError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=datetime.timezone.utc)
+            return int(st.st_mtime) <= since.timestamp()
+        return False
+
+    def copyfile(self, source, outputfile):
+        """Send a response body, with sendfile() for the files opened by send_head."""
+        sendfile, self._sendfile = getattr(self, "_sendfile", None), None
+        if sendfile is None or sendfile[0] is not source:
+            return super().copyfile(source, outputfile)
+        _, offset, count = sendfile
+        if count > 0:
+            # socket.sendfile() uses os.sendfile() where available and falls back to send()
+            self.connection.sendfile(source, offset, count)
+
+
+class StaticServer(http.server.ThreadingHTTPServer):
+    """HTTP server handling every connection on its own thread."""
+
+    daemon_threads = True
+    # Room for bursts of connections, e.g. from a load test
+    request_queue_size = 128
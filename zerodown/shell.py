@@ -15,8 +15,9 @@ from pathlib import Path
 from zerodown import __version__
 from zerodown.config import load_config, create_default_config
 from zerodown.builder import build_site
+from zerodown.profiling import DEFAULT_PROFILE_TOP
 from zerodown.console import zconsole, ZerodownConsole
-from zerodown.cli import init_site, serve_site
+from zerodown.cli import init_site, serve_site, show_dependents, precompile_templates
 
 
 class ZerodownShell(cmd.Cmd):
@@ -76,13 +77,22 @@ class ZerodownShell(cmd.Cmd):
         """
         Build the site.
         
-        Usage: build [PATH] [--config CONFIG] [-v] [-q]
+        Usage: build [PATH] [--config CONFIG] [--incremental] [-j JOBS] [--no-cache] [--low-memory]
+               [--profile REPORT] [--profile-top N] [--trace TRACE] [--precompress] [-v] [-q]
         
         Arguments:
           PATH                  Path to the site directory (default: current directory)
           
         Options:
           --config CONFIG       Path to the configuration file (default: config.py)
+          --incremental         Only rebuild pages whose inputs changed
+          -j, --jobs JOBS       Number of worker processes (0 = one per CPU)
+          --no-cache            Do not reuse cached Markdown or highlighted code
+          --low-memory          Keep only item summaries in memory, spilling HTML to disk
+          --profile REPORT      Write a JSON report with phase and per-page timings
+          --profile-top N       Number of slowest pages and templates in the report
+          --trace TRACE         Write the build timeline as Chrome trace events
+          --precompress         Write .gz (and .br) copies of compressible outputs
           -v, --verbose         Increase output verbosity
           -q, --quiet           Suppress all output except errors
         """
@@ -95,6 +105,38 @@ class ZerodownShell(cmd.Cmd):
             '--config', default='config.py',
             help='Path to the configuration file (default: config.py)'
         )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only rebuild pages whose sources, templates or config changed'
+        )
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=1,
+            help='Number of worker processes for parsing and rendering (0 = one per CPU, default: 1)'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Do not reuse parsed Markdown or highlighted code from the build cache'
+        )
+        parser.add_argument(
+            '--low-memory', action='store_true',
+            help='Keep only item summaries in memory, spilling page HTML to disk'
+        )
+        parser.add_argument(
+            '--profile', metavar='REPORT',
+            help='Write a JSON report with phase and per-page timings to REPORT'
+        )
+        parser.add_argument(
+            '--profile-top', type=int, default=DEFAULT_PROFILE_TOP, metavar='N',
+            help=f'Number of slowest pages and templates listed in the profile report (default: {DEFAULT_PROFILE_TOP})'
+        )
+        parser.add_argument(
+            '--trace', metavar='TRACE',
+            help='Write the build timeline to TRACE in the Chrome trace event format'
+        )
+        parser.add_argument(
+            '--precompress', action='store_true',
+            help='Write .gz (and .br, with the brotli module) copies of compressible outputs'
+        )
         parser.add_argument(
             '-v', '--verbose', action='count', default=0,
             help='Increase output verbosity (can be used multiple times)'
@@ -110,6 +152,8 @@ class ZerodownShell(cmd.Cmd):
             
             # Get absolute paths before changing directory
             site_path = os.path.abspath(args.path)
+            profile_path = os.path.abspath(args.profile) if args.profile else None
+            trace_path = os.path.abspath(args.trace) if args.trace else None
             
             # Check if the site path exists
             if not os.path.exists(site_path):
@@ -134,7 +178,10 @@ class ZerodownShell(cmd.Cmd):
                 
                 try:
                     config = load_config(config_path)
-                    build_site(config)
+                    build_site(config, incremental=args.incremental, jobs=args.jobs,
+                               use_cache=not args.no_cache, low_memory=args.low_memory,
+                               profile=profile_path, profile_top=args.profile_top,
+                               trace=trace_path, precompress=args.precompress or None)
                 except Exception as e:
                     from zerodown.console import zconsole
                     zconsole.error("Build failed", str(e))
@@ -155,7 +202,8 @@ class ZerodownShell(cmd.Cmd):
         """
         Serve the site locally.
         
-        Usage: serve [PATH] [--port PORT] [--config CONFIG] [-v] [-q]
+        Usage: serve [PATH] [--port PORT] [--config CONFIG] [--watch] [--poll] [--no-livereload]
+               [--lazy] [--no-build] [-v] [-q]
         
         Arguments:
           PATH                  Path to the site directory (default: current directory)
@@ -163,6 +211,11 @@ class ZerodownShell(cmd.Cmd):
         Options:
           --port PORT           Port to serve on (default: 8000)
           --config CONFIG       Path to the configuration file (default: config.py)
+          --watch               Rebuild changed pages and assets when sources change
+          --poll                With --watch, poll for changes instead of using inotify
+          --no-livereload       With --watch, do not reload open pages after a rebuild
+          --lazy                Render pages on request instead of building first
+          --no-build            Serve the existing output without building first
           -v, --verbose         Increase output verbosity
           -q, --quiet           Suppress all output except errors
         """
@@ -179,6 +232,26 @@ class ZerodownShell(cmd.Cmd):
             '--config', default='config.py',
             help='Path to the configuration file (default: config.py)'
         )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Rebuild changed pages and assets when the site sources change'
+        )
+        parser.add_argument(
+            '--poll', action='store_true',
+            help='With --watch, poll for changes instead of using inotify'
+        )
+        parser.add_argument(
+            '--no-livereload', action='store_true',
+            help='With --watch, do not reload open pages after a rebuild'
+        )
+        parser.add_argument(
+            '--lazy', action='store_true',
+            help='Render pages when they are requested instead of building the site first (implies --watch)'
+        )
+        parser.add_argument(
+            '--no-build', action='store_true',
+            help='Serve the existing output directory without building the site first'
+        )
         parser.add_argument(
             '-v', '--verbose', action='count', default=0,
             help='Increase output verbosity (can be used multiple times)'
@@ -213,7 +286,9 @@ class ZerodownShell(cmd.Cmd):
                 config_path = os.path.join(site_path, config_path)
             
             try:
-                serve_site(args.port, config_path, site_path)
+                serve_site(args.port, config_path, site_path, watch=args.watch, poll=args.poll,
+                           livereload=not args.no_livereload, lazy=args.lazy,
+                           build=not args.no_build)
             except Exception as e:
                 from zerodown.console import zconsole
                 zconsole.error("Server error", str(e))
@@ -225,6 +300,67 @@ class ZerodownShell(cmd.Cmd):
             from zerodown.console import zconsole
             zconsole.info("Server stopped")
     
+    def do_deps(self, arg):
+        """
+        Show the pages that depend on a file.
+        
+        Usage: deps FILE [PATH] [--config CONFIG]
+        
+        Arguments:
+          FILE                  Template, include, content or config file
+          PATH                  Path to the site directory (default: current directory)
+          
+        Options:
+          --config CONFIG       Path to the configuration file (default: config.py)
+        """
+        parser = argparse.ArgumentParser(prog="deps", description="Show the pages that depend on a file")
+        parser.add_argument('file', help='Template, include, content or config file')
+        parser.add_argument(
+            'path', nargs='?', default='.',
+            help='Path to the site directory (default: current directory)'
+        )
+        parser.add_argument(
+            '--config', default='config.py',
+            help='Path to the configuration file (default: config.py)'
+        )
+        
+        try:
+            args = parser.parse_args(shlex.split(arg))
+            show_dependents(args.file, args.config, args.path)
+        except SystemExit:
+            # Catch the SystemExit to prevent the shell from exiting
+            pass
+    
+    def do_compile_templates(self, arg):
+        """
+        Precompile templates into the template cache.
+        
+        Usage: compile_templates [PATH] [--config CONFIG]
+        
+        Arguments:
+          PATH                  Path to the site directory (default: current directory)
+          
+        Options:
+          --config CONFIG       Path to the configuration file (default: config.py)
+        """
+        parser = argparse.ArgumentParser(prog="compile_templates",
+                                         description="Precompile templates into the template cache")
+        parser.add_argument(
+            'path', nargs='?', default='.',
+            help='Path to the site directory (default: current directory)'
+        )
+        parser.add_argument(
+            '--config', default='config.py',
+            help='Path to the configuration file (default: config.py)'
+        )
+        
+        try:
+            args = parser.parse_args(shlex.split(arg))
+            precompile_templates(args.config, args.path)
+        except SystemExit:
+            # Catch the SystemExit to prevent the shell from exiting
+            pass
+    
     def do_cd(self, arg):
         """
         Change the current working directory.
@@ -7,26 +7,126 @@ through shortcodes like [latest_posts], [section_list], etc.
 
 import re
 import os
-from jinja2 import Template
+from jinja2 import Environment, TemplateNotFound
+from zerodown.siteindex import SiteIndex
+from zerodown.profiling import timed
 
 # Registry of available shortcodes
 SHORTCODE_REGISTRY = {}
 
-def register_shortcode(name):
+# Shortcodes that read other content items (context["site"])
+ITEM_QUERY_SHORTCODES = set()
+
+# Compiled built-in shortcode templates, by template name
+SHORTCODE_TEMPLATES = {}
+
+# Templates loaded from the site's TEMPLATE_DIR ("shortcodes/<name>.html")
+_template_overrides = {}
+
+# Environment for built-in templates (no autoescaping, like jinja2.Template)
+_builtin_env = Environment()
+
+# Match shortcodes like [shortcode_name param1="value1" param2="value2"]
+# More specific pattern to avoid matching common markdown
+SHORTCODE_PATTERN = re.compile(r'(?<!\s)\[(\w+)(?:\s+([^\]]+))?\](?!\()')
+
+# Match param="value" or param='value' patterns
+PARAM_PATTERN = re.compile(r'(\w+)=["\']([^"\']+)["\']')
+
+def register_shortcode(name, queries_items=True, template=None):
     """
     Decorator to register a shortcode handler function.
     
     Args:
         name: Name of the shortcode
+        queries_items: Whether the shortcode reads other content items, which
+            makes pages using it depend on every item in the site
+        template: Optional Jinja template source for the shortcode's HTML,
+            compiled once here and available through get_shortcode_template(name)
         
     Returns:
         Function decorator
     """
     def decorator(func):
         SHORTCODE_REGISTRY[name] = func
+        if queries_items:
+            ITEM_QUERY_SHORTCODES.add(name)
+        else:
+            ITEM_QUERY_SHORTCODES.discard(name)
+        if template is not None:
+            register_shortcode_template(name, template)
         return func
     return decorator
 
+def register_shortcode_template(name, source):
+    """
+    Compile a shortcode template once and store it under a name.
+    
+    Args:
+        name: Template name (a site can override it with shortcodes/<name>.html)
+        source: Jinja template source
+    """
+    SHORTCODE_TEMPLATES[name] = _builtin_env.from_string(source)
+
+def configure_shortcode_templates(jinja_env):
+    """
+    Load shortcode template overrides from the site's TEMPLATE_DIR.
+    
+    A file named shortcodes/<name>.html replaces the built-in template of the
+    same name. Overrides are compiled once by the shared Jinja environment.
+    
+    Args:
+        jinja_env: The site's Jinja2 environment
+    """
+    _template_overrides.clear()
+    for name in SHORTCODE_TEMPLATES:
+        try:
+            _template_overrides[name] = jinja_env.get_template(f"shortcodes/{name}.html")
+        except TemplateNotFound:
+            continue
+
+def get_shortcode_template(name):
+    """
+    Return the compiled template for a shortcode.
+    
+    Args:
+        name: Template name
+        
+    Returns:
+        jinja2.Template: The site override if present, else the built-in template
+    """
+    return _template_overrides.get(name) or SHORTCODE_TEMPLATES[name]
+
+def get_site_index(context):
+    """
+    Return the site index for a shortcode context.
+    
+    Args:
+        context: Context dictionary with "site" (a SiteIndex) or "latest_items"
+        
+    Returns:
+        SiteIndex: Index over the site's items, or None if the context has none
+    """
+    site = context.get("site")
+    if site is None and "latest_items" in context:
+        site = SiteIndex(context["latest_items"])
+        context["site"] = site
+    return site
+
+def find_shortcodes(content):
+    """
+    Find the registered shortcodes referenced by content.
+
+    Args:
+        content: Content to check (Markdown or HTML)
+
+    Returns:
+        set: Names of registered shortcodes that appear in brackets
+    """
+    if '[' not in content:
+        return set()
+    return {name for name in SHORTCODE_REGISTRY if f"[{name}" in content}
+
 def process_shortcodes(content, context):
     """
     Process all shortcodes in the content.
@@ -38,40 +138,30 @@ def process_shortcodes(content, context):
     Returns:
         str: Processed content with shortcodes replaced
     """
-    # Match shortcodes like [shortcode_name param1="value1" param2="value2"]
-    # More specific pattern to avoid matching common markdown
-    pattern = r'(?<!\s)\[(\w+)(?:\s+([^\]]+))?\](?!\()'
+    # Fast path: without a bracket there is nothing to scan for
+    if '[' not in content:
+        return content
     
     def replace_shortcode(match):
+        # Markdown links like [text](url) are excluded by the pattern's lookahead
         shortcode_name = match.group(1)
         params_str = match.group(2) or ""
         
-        # Check if this is part of a markdown link pattern like [text](url)
-        # Look ahead to see if the match is followed by a parenthesis, which would indicate a markdown link
-        match_end_pos = match.end()
-        if match_end_pos < len(content) and match_end_pos + 1 <= len(content):
-            next_char = content[match_end_pos:match_end_pos+1]
-            if next_char == '(':
-                # This is part of a markdown link, not a shortcode
-                return match.group(0)
-        
         # Skip if it looks like a standard Markdown reference-style link
-        if re.match(r'^[\w\-\.]+$', shortcode_name) and not params_str:
+        # (the pattern only captures word characters as the name)
+        if not params_str:
             # This is probably a reference-style Markdown link
             return match.group(0)
         
         # Avoid processing if there are spaces around the shortcode name
         # This helps prevent false positives in documentation
-        if " " in match.group(0).strip()[1:-1]:
+        if " " in match.group(0):
             return match.group(0)
         
         # Parse parameters
         params = {}
-        if params_str:
-            # Match param="value" or param='value' patterns
-            param_pattern = r'(\w+)=["\']([^"\']+)["\']'
-            for param_match in re.finditer(param_pattern, params_str):
-                params[param_match.group(1)] = param_match.group(2)
+        for param_match in PARAM_PATTERN.finditer(params_str):
+            params[param_match.group(1)] = param_match.group(2)
         
         # Execute the shortcode
         if shortcode_name in SHORTCODE_REGISTRY:
@@ -87,11 +177,27 @@ def process_shortcodes(content, context):
                 return f"<p>Unknown shortcode: [{shortcode_name}]</p>"
             return match.group(0)  # Return the original text for false positives
     
-    return re.sub(pattern, replace_shortcode, content)
+    with timed("shortcode"):
+        return SHORTCODE_PATTERN.sub(replace_shortcode, content)
 
 # Define built-in shortcodes
 
-@register_shortcode("featured_items")
+FEATURED_ITEMS_TEMPLATE = """
+<div class="featured-items">
+    <ul>
+        {% for item in items %}
+        <li>
+            <a href="{{ item.url }}">{{ item.metadata.title }}</a>
+            {% if item.metadata.description %}
+            <p>{{ item.metadata.description }}</p>
+            {% endif %}
+        </li>
+        {% endfor %}
+    </ul>
+</div>
+"""
+
+@register_shortcode("featured_items", template=FEATURED_ITEMS_TEMPLATE)
 def featured_items_shortcode(context, count="3", section=None):
     """
     Display featured items.
@@ -104,42 +210,35 @@ def featured_items_shortcode(context, count="3", section=None):
     Returns:
         str: HTML for the featured items
     """
-    count = int(count)
-    items = []
-    
-    if "latest_items" in context:
-        for item in context["latest_items"]:
-            # Filter by section if provided
-            if section and item.get("section_key") != section:
-                continue
-                
-            # Check if item is featured
-            if item.get("metadata", {}).get("featured"):
-                items.append(item)
-        
-        items = items[:count]
+    site = get_site_index(context)
+    items = site.query(section=section or None, featured=True, limit=int(count)) if site else []
     
     if not items:
         return "<p>No featured items found. Mark items as featured by adding <code>featured: true</code> to their frontmatter.</p>"
     
-    template_str = """
-    <div class="featured-items">
-        <ul>
-            {% for item in items %}
-            <li>
-                <a href="{{ item.url }}">{{ item.metadata.title }}</a>
-                {% if item.metadata.description %}
-                <p>{{ item.metadata.description }}</p>
-                {% endif %}
-            </li>
-            {% endfor %}
-        </ul>
-    </div>
-    """
-    template = Template(template_str)
-    return template.render(items=items)
+    return get_shortcode_template("featured_items").render(items=items)
+
+LATEST_POSTS_TEMPLATE = """
+<div class="latest-posts">
+    <ul>
+        {% for item in items %}
+        <li>
+            <a href="{{ item.url }}">{{ item.metadata.title }}</a>
+            {% if item.metadata.date %}
+            <time datetime="{{ item.metadata.date }}">
+                {{ item.metadata.date.strftime('%B %d, %Y') }}
+            </time>
+            {% endif %}
+            {% if item.metadata.description %}
+            <p>{{ item.metadata.description }}</p>
+            {% endif %}
+        </li>
+        {% endfor %}
+    </ul>
+</div>
+"""
 
-@register_shortcode("latest_posts")
+@register_shortcode("latest_posts", template=LATEST_POSTS_TEMPLATE)
 def latest_posts_shortcode(context, count="3", section="posts"):
     """
     Display the latest posts from a section.
@@ -152,42 +251,37 @@ def latest_posts_shortcode(context, count="3", section="posts"):
     Returns:
         str: HTML for the latest posts
     """
-    count = int(count)
-    items = []
-    
-    if "latest_items" in context:
-        for item in context["latest_items"]:
-            if item.get("section_key") == section:
-                items.append(item)
-        
-        items = items[:count]  # Limit to requested count
+    site = get_site_index(context)
+    items = site.query(section=section, limit=int(count)) if site else []
     
     if not items:
         return "<p>No posts found.</p>"
     
-    template_str = """
-    <div class="latest-posts">
-        <ul>
-            {% for item in items %}
-            <li>
-                <a href="{{ item.url }}">{{ item.metadata.title }}</a>
-                {% if item.metadata.date %}
-                <time datetime="{{ item.metadata.date }}">
-                    {{ item.metadata.date.strftime('%B %d, %Y') }}
-                </time>
-                {% endif %}
-                {% if item.metadata.description %}
-                <p>{{ item.metadata.description }}</p>
-                {% endif %}
-            </li>
-            {% endfor %}
-        </ul>
-    </div>
-    """
-    template = Template(template_str)
-    return template.render(items=items)
+    return get_shortcode_template("latest_posts").render(items=items)
+
+SECTION_LIST_TEMPLATE = """
+<div class="section-list">
+    <ul>
+        {% for item in items %}
+        <li><a href="{{ item.url }}">{{ item.metadata.title }}</a></li>
+        {% endfor %}
+    </ul>
+</div>
+"""
 
-@register_shortcode("section_list")
+SECTION_LIST_SECTIONS_TEMPLATE = """
+<div class="section-list">
+    <ul>
+        {% for section_key, section_config in sections.items() %}
+        <li><a href="/{{ section_key }}/">{{ section_config.title }}</a></li>
+        {% endfor %}
+    </ul>
+</div>
+"""
+
+register_shortcode_template("section_list_sections", SECTION_LIST_SECTIONS_TEMPLATE)
+
+@register_shortcode("section_list", template=SECTION_LIST_TEMPLATE)
 def section_list_shortcode(context, section=None):
     """
     Display a list of all sections or items in a section.
@@ -201,26 +295,13 @@ def section_list_shortcode(context, section=None):
     """
     if section:
         # List items from a specific section
-        items = []
-        if "latest_items" in context:
-            for item in context["latest_items"]:
-                if item.get("section_key") == section:
-                    items.append(item)
+        site = get_site_index(context)
+        items = site.query(section=section) if site else []
         
         if not items:
             return f"<p>No items found in section '{section}'.</p>"
         
-        template_str = """
-        <div class="section-list">
-            <ul>
-                {% for item in items %}
-                <li><a href="{{ item.url }}">{{ item.metadata.title }}</a></li>
-                {% endfor %}
-            </ul>
-        </div>
-        """
-        template = Template(template_str)
-        return template.render(items=items)
+        return get_shortcode_template("section_list").render(items=items)
     else:
         # List all sections
         sections = {}
@@ -236,19 +317,38 @@ def section_list_shortcode(context, section=None):
         if not sections:
             return "<p>No sections found.</p>"
         
-        template_str = """
-        <div class="section-list">
-            <ul>
-                {% for section_key, section_config in sections.items() %}
-                <li><a href="/{{ section_key }}/">{{ section_config.title }}</a></li>
-                {% endfor %}
-            </ul>
+        return get_shortcode_template("section_list_sections").render(sections=sections)
+
+FEATURED_PROJECTS_TEMPLATE = """
+<div class="featured-projects">
+    <div class="project-grid">
+        {% for project in projects %}
+        <div class="project-card">
+            {% if project.metadata.image %}
+            <div class="project-card-image">
+                <img src="{{ project.metadata.image }}" alt="{{ project.metadata.title }}" style="max-width: 100%; height: auto; max-height: 100px; width: auto;">
+            </div>
+            {% endif %}
+            <div class="project-card-content">
+                <h3 class="project-card-title">
+                    <a href="{{ project.url }}">{{ project.metadata.title }}</a>
+                </h3>
+                <div class="project-card-description">
+                    {% if project.metadata.summary %}
+                        {{ project.metadata.summary }}
+                    {% else %}
+                        {{ project.content_html | striptags | truncate(100) | safe }}
+                    {% endif %}
+                </div>
+                <a href="{{ project.url }}" class="read-more">View Project</a>
+            </div>
         </div>
-        """
-        template = Template(template_str)
-        return template.render(sections=sections)
+        {% endfor %}
+    </div>
+</div>
+"""
 
-@register_shortcode("featured_projects")
+@register_shortcode("featured_projects", template=FEATURED_PROJECTS_TEMPLATE)
 def featured_projects_shortcode(context, count="3"):
     """
     Display featured projects.
@@ -260,46 +360,10 @@ def featured_projects_shortcode(context, count="3"):
     Returns:
         str: HTML for the featured projects
     """
-    count = int(count)
-    projects = []
-    
-    if "latest_items" in context:
-        for item in context["latest_items"]:
-            if item.get("section_key") == "projects" and item.get("metadata", {}).get("featured"):
-                projects.append(item)
-        
-        projects = projects[:count]
+    site = get_site_index(context)
+    projects = site.query(section="projects", featured=True, limit=int(count)) if site else []
     
     if not projects:
         return "<p>No featured projects found. Mark projects as featured by adding <code>featured: true</code> to their frontmatter.</p>"
     
-    template_str = """
-    <div class="featured-projects">
-        <div class="project-grid">
-            {% for project in projects %}
-            <div class="project-card">
-                {% if project.metadata.image %}
-                <div class="project-card-image">
-                    <img src="{{ project.metadata.image }}" alt="{{ project.metadata.title }}" style="max-width: 100%; height: auto; max-height: 100px; width: auto;">
-                </div>
-                {% endif %}
-                <div class="project-card-content">
-                    <h3 class="project-card-title">
-                        <a href="{{ project.url }}">{{ project.metadata.title }}</a>
-                    </h3>
-                    <div class="project-card-description">
-                        {% if project.metadata.summary %}
-                            {{ project.metadata.summary }}
-                        {% else %}
-                            {{ project.content_html | striptags | truncate(100) | safe }}
-                        {% endif %}
-                    </div>
-                    <a href="{{ project.url }}" class="read-more">View Project</a>
-                </div>
-            </div>
-            {% endfor %}
-        </div>
-    </div>
-    """
-    template = Template(template_str)
-    return template.render(projects=projects)
\ No newline at end of file
+    return get_shortcode_template("featured_projects").render(projects=projects)
\ No newline at end of file
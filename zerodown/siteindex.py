@@ -0,0 +1,242 @@
+"""
+Site-wide content queries for the Zerodown static site generator.
+
+The SiteIndex wraps the list of parsed content items and keeps indexes by
+section, by tag and by truthy frontmatter field, plus lazily computed sort
+orders per field. Shortcodes and templates query it instead of scanning
+every item, e.g. ``site.query(section="posts", featured=True, sort="-date", limit=3)``.
+"""
+
+from zerodown.console import zconsole
+
+
+def _field_value(item, field):
+    """Return a frontmatter field, falling back to the item's own keys (url, slug, ...)."""
+    metadata = item.get("metadata") or {}
+    if field in metadata:
+        return metadata[field]
+    return item.get(field)
+
+
+def _item_tags(item):
+    """Return the tags of an item as a list of strings."""
+    tags = (item.get("metadata") or {}).get("tags")
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        return [tag.strip() for tag in tags.split(",") if tag.strip()]
+    if isinstance(tags, (list, tuple, set)):
+        return [str(tag) for tag in tags]
+    return [str(tags)]
+
+
+class SiteIndex:
+    """
+    Indexed, read-only view of every content item in the site.
+
+    Items keep the order in which they were added (section by section, each
+    section in its configured sort order). Until the index is frozen, the
+    indexes are rebuilt whenever the underlying list has grown.
+    """
+
+    def __init__(self, items=None, config=None):
+        self.items = items if items is not None else []
+        self.config = config
+        self.frozen = False
+        self._indexed_count = None
+        self._by_section = {}
+        self._by_tag = {}
+        self._by_field = {}
+        self._orders = {}
+        self._sets = {}
+        self._results = {}
+
+    def _refresh(self):
+        """Rebuild the indexes if items were added since they were built."""
+        if self.frozen or self._indexed_count == len(self.items):
+            return
+        by_section = {}
+        by_tag = {}
+        by_field = {}
+        for position, item in enumerate(self.items):
+            by_section.setdefault(item.get("section_key"), []).append(position)
+            for tag in _item_tags(item):
+                by_tag.setdefault(tag, []).append(position)
+            for key, value in (item.get("metadata") or {}).items():
+                try:
+                    truthy = bool(value)
+                except Exception:
+                    continue
+                if truthy:
+                    by_field.setdefault(key, []).append(position)
+        self._by_section = by_section
+        self._by_tag = by_tag
+        self._by_field = by_field
+        self._orders = {}
+        self._sets = {}
+        self._results = {}
+        self._indexed_count = len(self.items)
+
+    def freeze(self):
+        """
+        Build the indexes for the complete site and stop tracking changes.
+
+        Freezing before pages are rendered lets forked worker processes
+        inherit the finished indexes.
+
+        Returns:
+            SiteIndex: This index
+        """
+        self._refresh()
+        self.items = tuple(self.items)
+        self.frozen = True
+        return self
+
+    def _as_set(self, positions):
+        """Return a (cached) set of an index list for membership tests."""
+        key = id(positions)
+        if key not in self._sets:
+            self._sets[key] = (positions, set(positions))
+        return self._sets[key][1]
+
+    def _order(self, field, reverse):
+        """
+        Return (positions, ranks) for items sorted by a field.
+
+        Items without a value for the field come last in both directions, and
+        ties keep their original order.
+        """
+        key = (field, reverse)
+        if key not in self._orders:
+            present = []
+            missing = []
+            for position, item in enumerate(self.items):
+                if _field_value(item, field) is None:
+                    missing.append(position)
+                else:
+                    present.append(position)
+            try:
+                present.sort(key=lambda position: _field_value(self.items[position], field), reverse=reverse)
+            except TypeError as e:
+                zconsole.warning(f"Could not sort items by '{field}', comparing values as text", str(e))
+                present.sort(key=lambda position: str(_field_value(self.items[position], field)), reverse=reverse)
+            positions = present + missing
+            ranks = [0] * len(self.items)
+            for rank, position in enumerate(positions):
+                ranks[position] = rank
+            self._orders[key] = (positions, ranks)
+        return self._orders[key]
+
+    def query(self, section=None, tag=None, featured=None, sort=None, limit=None, **fields):
+        """
+        Return the items matching all given filters.
+
+        Args:
+            section: Only items from this section key
+            tag: Only items with this tag
+            featured: True for featured items only, False to exclude them
+            sort: Field to sort by, prefixed with '-' for descending order
+                (e.g. "-date"); without it items keep their site order
+            limit: Maximum number of items to return
+            **fields: Other frontmatter filters. True/False test whether the
+                field is truthy, any other value must be equal
+
+        Returns:
+            list: Matching content items
+        """
+        self._refresh()
+        if featured is not None:
+            fields["featured"] = featured
+        if limit is not None:
+            limit = max(0, int(limit))
+
+        # Repeated queries (e.g. the same shortcode on many pages) are answered
+        # from a cache that is cleared whenever the indexes are rebuilt
+        try:
+            cache_key = (section, tag, sort, limit, tuple(sorted(fields.items())))
+            hash(cache_key)
+        except TypeError:
+            cache_key = None
+        if cache_key is not None and cache_key in self._results:
+            return list(self._results[cache_key])
+
+        # Narrow down using the precomputed indexes, smallest first
+        indexed = []
+        excluded = []
+        compared = []
+        if section is not None:
+            indexed.append(self._by_section.get(section, []))
+        if tag is not None:
+            indexed.append(self._by_tag.get(str(tag), []))
+        for field, value in fields.items():
+            if value is True:
+                indexed.append(self._by_field.get(field, []))
+            elif value is False:
+                excluded.append(self._as_set(self._by_field.get(field, [])))
+            else:
+                compared.append((field, value))
+        indexed.sort(key=len)
+
+        if indexed:
+            candidates = indexed[0]
+            others = [self._as_set(positions) for positions in indexed[1:]]
+        else:
+            candidates = range(len(self.items))
+            others = []
+
+        def matches(position):
+            if any(position not in positions for positions in others):
+                return False
+            if any(position in positions for positions in excluded):
+                return False
+            item = self.items[position]
+            return all(_field_value(item, field) == value for field, value in compared)
+
+        if sort:
+            reverse = sort.startswith("-")
+            positions, ranks = self._order(sort.lstrip("-+"), reverse)
+            if indexed and len(candidates) * 4 < len(positions):
+                ordered = sorted(candidates, key=ranks.__getitem__)
+            else:
+                candidate_set = self._as_set(candidates) if indexed else None
+                ordered = (p for p in positions if candidate_set is None or p in candidate_set)
+        else:
+            ordered = candidates
+
+        results = []
+        for position in ordered:
+            if limit is not None and len(results) >= limit:
+                break
+            if matches(position):
+                results.append(self.items[position])
+        if cache_key is not None:
+            self._results[cache_key] = results
+        return list(results)
+
+    def count(self, **filters):
+        """
+        Return the number of items matching the filters of query().
+
+        Args:
+            **filters: Same filters as query()
+
+        Returns:
+            int: Number of matching items
+        """
+        return len(self.query(**filters))
+
+    def sections(self):
+        """Return the keys of every section with items, in site order."""
+        self._refresh()
+        return [key for key in self._by_section if key is not None]
+
+    def tags(self):
+        """Return a dictionary of tag names to item counts, sorted by name."""
+        self._refresh()
+        return {tag: len(self._by_tag[tag]) for tag in sorted(self._by_tag)}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
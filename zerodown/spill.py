@@ -0,0 +1,93 @@
+"""
+Spilling of page HTML to disk for low-memory builds.
+
+In low-memory mode only lightweight item summaries (metadata, URLs and
+paths) stay in memory. HTML that is not already available from the
+Markdown cache is written to a spill directory and read back whenever a
+template touches ``item.content_html``.
+"""
+
+import os
+import shutil
+import tempfile
+from zerodown.console import zconsole
+
+
+class SpilledContent:
+    """Reference to item HTML stored in a spill file."""
+
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, filepath):
+        """
+        Read the spilled HTML.
+
+        Args:
+            filepath: Path of the item's source file (unused)
+
+        Returns:
+            str: HTML content
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class SpillStore:
+    """
+    A per-build directory of spilled HTML bodies.
+
+    The directory is created under the cache directory rather than the
+    system temporary directory, which is often memory-backed on CI runners.
+    """
+
+    def __init__(self, parent_dir):
+        os.makedirs(parent_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix="spill-", dir=parent_dir)
+        self.count = 0
+        self.bytes = 0
+
+    def spill(self, item):
+        """
+        Move an item's in-memory HTML to a spill file.
+
+        Items whose HTML is already loaded lazily are left alone.
+
+        Args:
+            item: ContentItem to release
+
+        Returns:
+            bool: True if the HTML was spilled
+        """
+        if not item.content_in_memory:
+            return False
+        data = item.content_html.encode("utf-8")
+        path = os.path.join(self.directory, f"{self.count}.html")
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except OSError as e:
+            zconsole.warning("Could not spill page content, keeping it in memory", f"{item.filepath}: {e}")
+            return False
+        item.set_content_ref(SpilledContent(path))
+        self.count += 1
+        self.bytes += len(data)
+        return True
+
+    def spill_all(self, items):
+        """
+        Spill the HTML of every item held in memory.
+
+        Args:
+            items: ContentItems to release
+
+        Returns:
+            int: Number of spilled items
+        """
+        return sum(1 for item in items if self.spill(item))
+
+    def cleanup(self):
+        """Remove the spill directory."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,369 @@
+"""
+Staged output directory for the Zerodown static site generator.
+
+Builds are written into a staging directory next to OUTPUT_DIR, which is
+swapped into place once the build has finished. Anything serving OUTPUT_DIR
+keeps seeing the previous complete site until then, instead of an empty or
+half-built directory.
+
+Two swap strategies are supported:
+
+- ``rename``: exchange the staging and output directories. On Linux this is
+  a single atomic renameat2(RENAME_EXCHANGE) call; elsewhere the previous
+  output is renamed away first, leaving a very short gap.
+- ``symlink``: OUTPUT_DIR is a symlink to the current build directory and
+  is repointed atomically.
+"""
+
+import os
+import sys
+import shutil
+import ctypes
+import ctypes.util
+import datetime
+
+from zerodown.console import zconsole
+
+# Ways of putting a finished build in place ('none' writes into OUTPUT_DIR directly)
+OUTPUT_SWAP_MODES = ('rename', 'symlink', 'none')
+
+# renameat2() arguments (Linux)
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+# Staging directories of the running builds -> the output directories they replace
+_staged = {}
+
+
+def published_output_dir(config):
+    """
+    Return the absolute output directory a build is published to.
+
+    While a build is staged, config.OUTPUT_DIR names its staging directory;
+    records kept across builds (manifests) refer to the published one.
+
+    Args:
+        config: Configuration module with OUTPUT_DIR defined
+
+    Returns:
+        str: Absolute path of the output directory
+    """
+    output_dir = os.path.abspath(config.OUTPUT_DIR)
+    return _staged.get(output_dir, output_dir)
+
+
+def _exchange_paths(path_a, path_b):
+    """
+    Atomically exchange two paths with renameat2(RENAME_EXCHANGE).
+
+    Args:
+        path_a: First path
+        path_b: Second path
+
+    Returns:
+        bool: True if the paths were exchanged, False if not supported
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False  # No libc or glibc older than 2.28
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    result = renameat2(AT_FDCWD, os.fsencode(path_a), AT_FDCWD, os.fsencode(path_b), RENAME_EXCHANGE)
+    return result == 0
+
+
+def _process_exists(pid):
+    """Check whether a process is running (assumed so where this cannot be checked)."""
+    if sys.platform == 'win32':
+        return True  # os.kill() would terminate the process
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Running, but owned by another user
+    return True
+
+
+def _link_tree(src_dir, dest_dir, keep=None, skip=None):
+    """
+    Recreate a directory tree with hard links to the original files.
+
+    Args:
+        src_dir: Existing directory
+        dest_dir: New directory
+        keep: Optional set of paths relative to src_dir (with '/' separators)
+            to link; None links everything
+        skip: Optional function taking a top-level entry name and returning
+            True for entries that are not linked
+
+    Returns:
+        int: Number of linked files
+    """
+    linked = 0
+    for root, dirs, files in os.walk(src_dir):
+        rel_root = os.path.relpath(root, src_dir)
+        target_root = os.path.join(dest_dir, rel_root) if rel_root != '.' else dest_dir
+        if skip is not None and rel_root == '.':
+            dirs[:] = [name for name in dirs if not skip(name)]
+            files = [name for name in files if not skip(name)]
+        for filename in files:
+            rel_path = os.path.normpath(os.path.join(rel_root, filename)).replace(os.sep, "/")
+            if keep is not None and rel_path not in keep:
+                continue
+            src_path = os.path.join(root, filename)
+            dst_path = os.path.join(target_root, filename)
+            os.makedirs(target_root, exist_ok=True)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+            else:
+                try:
+                    os.link(src_path, dst_path)
+                except OSError:
+                    shutil.copy2(src_path, dst_path)
+            linked += 1
+        # Symlinks to directories are listed in dirs but not walked
+        for dirname in list(dirs):
+            src_path = os.path.join(root, dirname)
+            if os.path.islink(src_path):
+                dirs.remove(dirname)
+                if keep is None:
+                    os.makedirs(target_root, exist_ok=True)
+                    os.symlink(os.readlink(src_path), os.path.join(target_root, dirname))
+    return linked
+
+
+class StagedOutput:
+    """
+    Redirects a build into a staging directory and swaps it into place.
+
+    While the build runs, ``config.OUTPUT_DIR`` points at the staging
+    directory; commit() or abort() restore it.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.target = os.path.abspath(config.OUTPUT_DIR)
+        self.mode = str(getattr(config, 'OUTPUT_SWAP', 'rename') or 'none').lower()
+        if self.mode not in OUTPUT_SWAP_MODES:
+            zconsole.warning("Unknown output_swap setting",
+                             f"'{self.mode}', expected one of {', '.join(OUTPUT_SWAP_MODES)}; using 'rename'")
+            self.mode = 'rename'
+        self.staging_dir = None
+        self.seeded = 0
+
+    @property
+    def enabled(self):
+        """Whether the build is written to a staging directory."""
+        return self.mode != 'none'
+
+    def begin(self, keep=None):
+        """
+        Create the staging directory and point OUTPUT_DIR at it.
+
+        The staging directory is seeded with hard links to the files of the
+        current output, so unchanged pages and assets need not be rewritten.
+        Build steps must replace seeded files rather than write into them
+        (write_output_file and copy_asset_file do).
+
+        Args:
+            keep: Optional set of output paths (relative, '/' separators) to
+                seed; None seeds the complete previous output
+
+        Returns:
+            bool: True if the build is staged, False if it writes into
+            OUTPUT_DIR directly
+        """
+        if not self.enabled:
+            return False
+
+        parent, name = os.path.split(self.target)
+        if os.path.ismount(self.target):
+            if self.mode == 'symlink':
+                zconsole.warning("Output directory is a mount point and cannot become a symlink",
+                                 f"{self.target}; using output_swap 'rename'")
+                self.mode = 'rename'
+            # Staged inside the mount, so its files can be renamed into place
+            parent = self.target
+        self._sweep_stale(parent, name)
+
+        staging_dir = os.path.join(parent, f".{name}.staging-{os.getpid()}")
+        if self.mode == 'symlink':
+            # Kept as the published build, so every build needs a new name
+            staging_dir += datetime.datetime.now().strftime("-%Y%m%d-%H%M%S-%f")
+
+        try:
+            if os.path.lexists(staging_dir):
+                shutil.rmtree(staging_dir)
+            os.makedirs(staging_dir)
+            if os.path.isdir(self.target) and (keep is None or keep):
+                self.seeded = _link_tree(os.path.realpath(self.target), staging_dir, keep,
+                                         skip=self._is_staging_name)
+        except OSError as e:
+            zconsole.warning("Could not create staging directory, building in place", f"{staging_dir}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            self.mode = 'none'
+            return False
+
+        zconsole.info("Staging build", f"in {staging_dir} ({self.seeded} files seeded)")
+        self.staging_dir = staging_dir
+        self.config.OUTPUT_DIR = staging_dir
+        _staged[os.path.abspath(staging_dir)] = self.target
+        return True
+
+    def _is_staging_name(self, entry):
+        """Check whether a directory entry is a staging directory of this output."""
+        name = os.path.basename(self.target)
+        return entry.startswith(f".{name}.staging-")
+
+    def _sweep_stale(self, directory, name):
+        """
+        Remove staging directories left behind by builds that were killed.
+
+        Args:
+            directory: Directory the staging directories are created in
+            name: Name of the output directory
+        """
+        prefix = f".{name}.staging-"
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            return
+        output_dir = os.path.join(directory, name)
+        published = os.path.realpath(output_dir) if os.path.islink(output_dir) else None
+        for entry in entries:
+            if not entry.startswith(prefix):
+                continue
+            # Also matches '<pid>.old', '<pid>-<stamp>' and '<pid>-<stamp>.link'
+            pid = entry[len(prefix):].split('.', 1)[0].split('-', 1)[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _process_exists(int(pid)):
+                continue
+            path = os.path.join(directory, entry)
+            if os.path.realpath(path) == published:
+                continue  # The symlinked build being served
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                zconsole.info("Removed stale staging directory", path)
+            except OSError as e:
+                zconsole.warning("Could not remove stale staging directory", f"{path}: {e}")
+
+    def commit(self):
+        """
+        Swap the finished build into place and remove the previous one.
+
+        Returns:
+            bool: True if the new build is in place
+        """
+        if self.staging_dir is None:
+            return True
+        self.config.OUTPUT_DIR = self.target
+        staging_dir, self.staging_dir = self.staging_dir, None
+        _staged.pop(os.path.abspath(staging_dir), None)
+        try:
+            if self.mode == 'symlink':
+                self._swap_symlink(staging_dir)
+            else:
+                self._swap_rename(staging_dir)
+        except OSError as e:
+            zconsole.error("Error swapping in the new build", f"{self.target}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return False
+        zconsole.info("Published build", self.target)
+        return True
+
+    def abort(self):
+        """Discard the staging directory of a failed build."""
+        if self.staging_dir is None:
+            return
+        self.config.OUTPUT_DIR = self.target
+        _staged.pop(os.path.abspath(self.staging_dir), None)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        self.staging_dir = None
+
+    def _swap_rename(self, staging_dir):
+        """Move the staging directory to OUTPUT_DIR."""
+        if not os.path.lexists(self.target):
+            os.rename(staging_dir, self.target)
+            return
+
+        if os.path.ismount(self.target):
+            self._replace_contents(staging_dir)
+            return
+
+        # Switching from symlinked builds: the linked directory goes as well
+        linked_dir = os.path.realpath(self.target) if os.path.islink(self.target) else None
+
+        if _exchange_paths(staging_dir, self.target):
+            old = staging_dir  # Now holds the previous build
+        else:
+            old = f"{staging_dir}.old"
+            os.rename(self.target, old)
+            os.rename(staging_dir, self.target)
+        self._remove_previous(old)
+        if linked_dir:
+            self._remove_previous(linked_dir)
+
+    def _swap_symlink(self, staging_dir):
+        """Repoint the OUTPUT_DIR symlink at the staging directory."""
+        previous = None
+        if os.path.islink(self.target):
+            previous = os.path.realpath(self.target)
+        elif os.path.lexists(self.target):
+            # First symlinked build: move the real directory out of the way
+            previous = f"{staging_dir}.old"
+            os.rename(self.target, previous)
+
+        link = f"{staging_dir}.link"
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(staging_dir), link)
+        os.replace(link, self.target)
+        if previous and previous != os.path.realpath(staging_dir):
+            self._remove_previous(previous)
+
+    def _replace_contents(self, staging_dir):
+        """
+        Move the staged files into OUTPUT_DIR entry by entry.
+
+        Used when OUTPUT_DIR cannot be renamed, e.g. because it is a mount
+        point; the staging directory is then inside OUTPUT_DIR, on the same
+        file system.
+        """
+        staged = set(os.listdir(staging_dir))
+        for name in os.listdir(self.target):
+            if name not in staged and not self._is_staging_name(name):
+                path = os.path.join(self.target, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+        for name in sorted(staged):
+            src_path = os.path.join(staging_dir, name)
+            dst_path = os.path.join(self.target, name)
+            if os.path.isdir(dst_path) and not os.path.islink(dst_path):
+                old = f"{src_path}.old"
+                os.rename(dst_path, old)
+                os.rename(src_path, dst_path)
+                shutil.rmtree(old)
+            elif os.path.lexists(dst_path) and os.path.samefile(src_path, dst_path):
+                # Seeded hard link: rename() does nothing when both names are the same file
+                os.remove(src_path)
+            else:
+                os.replace(src_path, dst_path)
+        os.rmdir(staging_dir)
+
+    def _remove_previous(self, path):
+        """Delete the previous build after it was swapped out."""
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            zconsole.warning("Could not remove the previous build", f"{path}: {e}")
@@ -5,16 +5,62 @@ Template handling for the Zerodown static site generator.
 import os
 import sys
 import datetime
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+from zerodown.utils import (get_cache_dir, write_output_file, queue_output_file, replace_if_changed,
+                            ensure_output_dir)
 from zerodown.console import zconsole
+from zerodown.profiling import timed
 
+# Size of the write buffer used when streaming pages to disk
+STREAM_BUFFER_SIZE = 64 * 1024
 
-def setup_jinja_env(config):
+# Stream every page, regardless of STREAM_TEMPLATES (set for low-memory builds)
+_stream_all = False
+
+
+def set_stream_all(enabled):
+    """
+    Enables or disables streaming for every page.
+    
+    Args:
+        enabled: True to stream all pages to their output files
+    """
+    global _stream_all
+    _stream_all = bool(enabled)
+
+
+def get_bytecode_cache(config):
+    """
+    Returns the persistent cache for compiled templates.
+    
+    Jinja stores each template's bytecode together with a checksum of its
+    source, so edited templates are recompiled automatically.
+    
+    Args:
+        config: Configuration module
+        
+    Returns:
+        FileSystemBytecodeCache: Cache under CACHE_DIR/templates, or None if
+        the directory cannot be created
+    """
+    directory = os.path.join(get_cache_dir(config), 'templates')
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as e:
+        zconsole.warning("Template cache disabled", f"could not create {directory}: {e}")
+        return None
+    return FileSystemBytecodeCache(directory)
+
+
+def setup_jinja_env(config, use_cache=True, auto_reload=True):
     """
     Sets up the Jinja2 templating environment.
     
     Args:
         config: Configuration module with TEMPLATE_DIR defined
+        use_cache: Load and store compiled templates in the persistent bytecode cache
+        auto_reload: Check templates for changes on every use. A single build
+            can turn this off, as templates do not change while it runs.
         
     Returns:
         Environment: Configured Jinja2 environment
@@ -23,7 +69,9 @@ def setup_jinja_env(config):
     try:
         env = Environment(
             loader=FileSystemLoader(config.TEMPLATE_DIR),
-            autoescape=select_autoescape(['html', 'xml'])
+            autoescape=select_autoescape(['html', 'xml']),
+            bytecode_cache=get_bytecode_cache(config) if use_cache else None,
+            auto_reload=auto_reload
         )
         # Add globals after initialization
         env.globals['config'] = config
@@ -34,6 +82,31 @@ def setup_jinja_env(config):
          sys.exit(1)
 
 
+def compile_templates(config):
+    """
+    Precompiles every template in TEMPLATE_DIR into the bytecode cache, so
+    later builds skip parsing and compiling them.
+    
+    Args:
+        config: Configuration module with TEMPLATE_DIR defined
+        
+    Returns:
+        tuple: (number of compiled templates, number of templates with errors)
+    """
+    env = setup_jinja_env(config)
+    compiled = 0
+    failed = 0
+    for template_name in env.list_templates(filter_func=lambda name: not os.path.basename(name).startswith('.')):
+        try:
+            env.get_template(template_name)
+            compiled += 1
+            zconsole.info("Compiled template", template_name)
+        except Exception as e:
+            failed += 1
+            zconsole.error("Error compiling template", f"{template_name}: {e}")
+    return compiled, failed
+
+
 def render_template(env, template_name, context):
     """
     Renders a Jinja2 template with the given context.
@@ -55,6 +128,86 @@ def render_template(env, template_name, context):
         return f"<h1>Error rendering template</h1><p>{e}</p>"
 
 
+def should_stream(config, template_name, section_config=None):
+    """
+    Checks whether a page should be streamed to its output file.
+    
+    Args:
+        config: Configuration module, optionally with STREAM_TEMPLATES
+        template_name: Name of the template used for the page
+        section_config: Configuration of the page's section, optionally with 'stream'
+        
+    Returns:
+        bool: True if the page should be rendered with render_template_to_file
+    """
+    if _stream_all or (section_config and section_config.get('stream')):
+        return True
+    return template_name in (getattr(config, 'STREAM_TEMPLATES', None) or ())
+
+
+def render_template_to_file(env, template_name, context, output_path):
+    """
+    Renders a Jinja2 template chunk by chunk straight into an output file.
+    
+    Unlike render_template, the page is never held in memory as a whole, so
+    memory use stays flat for very large pages such as long section lists.
+    The file is written under a temporary name and moved into place when
+    complete, unless the existing output is identical.
+    
+    Args:
+        env: Jinja2 environment
+        template_name: Name of the template to render
+        context: Dictionary of variables to pass to the template
+        output_path: Path where to write the page
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        ensure_output_dir(os.path.dirname(output_path))
+        template = env.get_template(template_name)
+        with open(tmp_path, "w", encoding="utf-8", buffering=STREAM_BUFFER_SIZE) as f:
+            f.writelines(template.generate(context))
+        replace_if_changed(tmp_path, output_path)
+        return True
+    except OSError as e:
+        zconsole.error(f"Error writing file {output_path}: {e}")
+        return False
+    except Exception as e:
+        zconsole.error("Error rendering template", f"{template_name} with context keys {list(context.keys())}: {e}")
+        return write_output_file(output_path, f"<h1>Error rendering template</h1><p>{e}</p>")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def render_page(config, env, template_name, context, output_path, section_config=None):
+    """
+    Renders a page and writes it to its output file, streaming it if the
+    template or section is configured for streaming. Otherwise the page may
+    be written by a background writer thread (see queue_output_file).
+    
+    Args:
+        config: Configuration module
+        env: Jinja2 environment
+        template_name: Name of the template to render
+        context: Dictionary of variables to pass to the template
+        output_path: Path where to write the page
+        section_config: Configuration of the page's section, if any
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if should_stream(config, template_name, section_config):
+        # Rendering and writing overlap, so both are timed as rendering
+        with timed("render", output_path, template_name):
+            return render_template_to_file(env, template_name, context, output_path)
+    with timed("render", output_path, template_name):
+        html_output = render_template(env, template_name, context)
+    return queue_output_file(output_path, html_output)
+
+
 def process_includes(config, jinja_env):
     """
     Process Markdown includes for global template context.
@@ -4,62 +4,356 @@ Utility functions for the Zerodown static site generator.
 
 import os
 import shutil
-import sys
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from zerodown.console import zconsole
+from zerodown.profiling import timed
 
+# How asset files are placed in the output directory
+ASSET_COPY_MODES = ('copy', 'hardlink', 'reflink', 'symlink')
 
-def clean_output_dir(config):
+# ioctl request that clones a file's extents on copy-on-write filesystems (Linux)
+FICLONE = 0x40049409
+
+# Whether output files whose content is unchanged are left untouched
+_write_if_changed = True
+
+# Output directories known to exist, so pages can be written without makedirs calls
+_known_dirs = set()
+
+# Number of background threads writing rendered pages (0 = write synchronously)
+_writer_threads = 0
+_writer = None
+
+
+class WriteStats:
+    """Counts output files written and left unchanged during a build."""
+
+    def __init__(self):
+        self.written = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()  # Pages are also written by writer threads
+
+    def record(self, written):
+        """
+        Count one output file.
+        
+        Args:
+            written: True if the file was written, False if it was unchanged
+        """
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.unchanged += 1
+
+    def reset(self):
+        """Reset the counts at the start of a build."""
+        self.written = 0
+        self.unchanged = 0
+
+    def snapshot(self):
+        """Return the current counts as a tuple."""
+        return (self.written, self.unchanged)
+
+    def since(self, snapshot):
+        """Return the counts added since a snapshot was taken."""
+        return (self.written - snapshot[0], self.unchanged - snapshot[1])
+
+    def add(self, delta):
+        """Add counts reported by a worker process."""
+        with self._lock:
+            self.written += delta[0]
+            self.unchanged += delta[1]
+
+
+# Counts of the current build (merged back from worker processes by run_tasks)
+write_stats = WriteStats()
+
+
+def set_write_if_changed(enabled):
+    """
+    Enables or disables skipping writes of unchanged output files.
+    
+    Args:
+        enabled: Compare new output with the existing file before writing
+    """
+    global _write_if_changed
+    _write_if_changed = bool(enabled)
+
+
+def reset_output_dirs():
+    """Forgets the output directories created by a previous build."""
+    _known_dirs.clear()
+
+
+def make_output_dirs(directories):
+    """
+    Creates output directories in one pass, before pages are written.
+    
+    Pages written into these directories skip their own directory checks.
+    
+    Args:
+        directories: Iterable of directory paths
+    """
+    for directory in sorted(set(directories)):
+        ensure_output_dir(directory)
+
+
+def ensure_output_dir(directory):
+    """
+    Creates an output directory unless it is already known to exist.
+    
+    Args:
+        directory: Directory path
+    """
+    if directory not in _known_dirs:
+        os.makedirs(directory, exist_ok=True)
+        _known_dirs.add(directory)
+
+
+def encode_output(content):
     """
-    Removes and recreates the output directory.
+    Encodes page content as it is stored on disk (UTF-8, platform newlines).
     
     Args:
-        config: Configuration module with OUTPUT_DIR defined
+        content: String content
+        
+    Returns:
+        bytes: Encoded content
     """
-    zconsole.info("Cleaning directory", config.OUTPUT_DIR)
+    if os.linesep != "\n":
+        content = content.replace("\n", os.linesep)
+    return content.encode("utf-8")
+
+
+def _same_file_content(path, data):
+    """Checks whether a file holds exactly the given bytes."""
     try:
-        if os.path.exists(config.OUTPUT_DIR):
-            shutil.rmtree(config.OUTPUT_DIR)
-        os.makedirs(config.OUTPUT_DIR)
-    except OSError as e:
-        zconsole.error("Error cleaning output directory", str(e))
-        sys.exit(1)
+        with open(path, "rb") as f:
+            return f.read(len(data) + 1) == data
+    except OSError:
+        return False
+
+
+def _same_files(path_a, path_b):
+    """Checks whether two files of equal size have identical content."""
+    try:
+        with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+            while True:
+                chunk_a = fa.read(1024 * 1024)
+                if chunk_a != fb.read(1024 * 1024):
+                    return False
+                if not chunk_a:
+                    return True
+    except OSError:
+        return False
+
+
+def replace_if_changed(tmp_path, output_path):
+    """
+    Moves a freshly written file into place unless the existing file is identical.
+    
+    Args:
+        tmp_path: Path of the new file
+        output_path: Path of the output file
+        
+    Returns:
+        bool: True if the output was replaced, False if it was unchanged
+            (tmp_path is then removed)
+    """
+    if _write_if_changed:
+        try:
+            existing = os.lstat(output_path)
+            if (stat.S_ISREG(existing.st_mode)
+                    and existing.st_size == os.stat(tmp_path).st_size
+                    and _same_files(tmp_path, output_path)):
+                os.remove(tmp_path)
+                write_stats.record(False)
+                return False
+        except FileNotFoundError:
+            pass
+    os.replace(tmp_path, output_path)
+    write_stats.record(True)
+    return True
+
+
+def get_cache_dir(config):
+    """
+    Returns the directory used for build caches and manifests.
+    
+    Args:
+        config: Configuration module, optionally with CACHE_DIR defined
+        
+    Returns:
+        str: Path to the cache directory
+    """
+    return getattr(config, 'CACHE_DIR', '.zerodown-cache')
+
+
+def remove_unlisted_files(output_dir, keep):
+    """
+    Removes every file of a directory tree that is not listed, and the
+    directories left empty.
+    
+    Args:
+        output_dir: Directory to clean
+        keep: Set of paths relative to output_dir (with '/' separators) to keep
+        
+    Returns:
+        int: Number of removed files
+        
+    Raises:
+        OSError: If a file cannot be removed
+    """
+    removed = 0
+    for root, dirs, files in os.walk(output_dir, topdown=False):
+        for filename in files:
+            path = os.path.join(root, filename)
+            rel_path = os.path.relpath(path, output_dir).replace(os.sep, "/")
+            if rel_path not in keep:
+                os.remove(path)
+                removed += 1
+        for dirname in dirs:
+            path = os.path.join(root, dirname)
+            if os.path.islink(path):
+                os.remove(path)
+                removed += 1
+            elif not os.listdir(path):
+                os.rmdir(path)
+    return removed
+
+
+def get_asset_copy_mode(config):
+    """
+    Returns the configured way of placing asset files in the output directory.
+    
+    Args:
+        config: Configuration module, optionally with ASSET_COPY_MODE defined
+        
+    Returns:
+        str: One of ASSET_COPY_MODES
+    """
+    mode = str(getattr(config, 'ASSET_COPY_MODE', 'copy') or 'copy').lower()
+    if mode not in ASSET_COPY_MODES:
+        zconsole.warning("Unknown asset_copy_mode setting",
+                         f"'{mode}', expected one of {', '.join(ASSET_COPY_MODES)}; using 'copy'")
+        mode = 'copy'
+    return mode
+
+
+def _reflink_file(src_path, dst_path):
+    """
+    Clones a file, falling back to an in-kernel copy and then a regular copy.
+    
+    Args:
+        src_path: Source file
+        dst_path: Destination file (must not exist)
+    """
+    try:
+        with open(src_path, "rb") as fsrc, open(dst_path, "wb") as fdst:
+            try:
+                import fcntl
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except (ImportError, OSError):
+                # No copy-on-write support: let the kernel copy the data
+                # without passing it through user space
+                if not hasattr(os, 'copy_file_range'):
+                    raise
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+        shutil.copystat(src_path, dst_path)
+    except (ImportError, OSError):
+        shutil.copy2(src_path, dst_path)
+
 
+def copy_asset_file(src_path, dst_path, mode='copy'):
+    """
+    Places a file in the output directory.
+    
+    Any existing destination is removed first, so a hard-linked or
+    symlinked output is never written through to its source.
+    
+    Args:
+        src_path: Source file
+        dst_path: Destination path
+        mode: One of ASSET_COPY_MODES. 'hardlink' falls back to a copy
+            across filesystems
+        
+    Raises:
+        OSError: If the file cannot be placed
+    """
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    if mode == 'hardlink':
+        try:
+            os.link(src_path, dst_path)
+            return
+        except OSError:
+            pass  # Different filesystem or no hard link support
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src_path), dst_path)
+        return
+    elif mode == 'reflink':
+        _reflink_file(src_path, dst_path)
+        return
+    shutil.copy2(src_path, dst_path)
 
-def copy_static_assets(config):
+
+def copy_static_assets(config, sync=None):
     """
     Copies static files (images, fonts, etc.) to the output directory.
     
     Args:
         config: Configuration module with STATIC_DIR and OUTPUT_DIR defined
+        sync: Optional AssetSync that copies only new and changed files
     """
     zconsole.info("Copying static assets", f"from {config.STATIC_DIR} to {config.OUTPUT_DIR}")
     if os.path.exists(config.STATIC_DIR) and os.path.isdir(config.STATIC_DIR):
         try:
-            shutil.copytree(config.STATIC_DIR, config.OUTPUT_DIR, dirs_exist_ok=True)
+            if sync is not None:
+                sync.sync_tree(config.STATIC_DIR, config.OUTPUT_DIR)
+            else:
+                copy_mode = get_asset_copy_mode(config)
+                shutil.copytree(config.STATIC_DIR, config.OUTPUT_DIR, dirs_exist_ok=True,
+                                copy_function=lambda src, dst: copy_asset_file(src, dst, copy_mode))
         except OSError as e:
             zconsole.error("Error copying static assets", str(e))
     else:
         zconsole.warning("Static directory not found or not a directory", f"'{config.STATIC_DIR}', skipping")
 
 
-def copy_styles(config):
+def copy_styles(config, sync=None):
     """
     Copies the selected theme CSS file as main.css.
     
     Args:
         config: Configuration module with STYLES_DIR, OUTPUT_DIR, and THEME_CSS_FILE defined
+        sync: Optional AssetSync that copies only new and changed files
     """
     styles_output_dir = os.path.join(config.OUTPUT_DIR, 'styles')
     selected_theme_file = getattr(config, 'THEME_CSS_FILE', 'main.css')
     source_css_path = os.path.join(config.STYLES_DIR, selected_theme_file)
     target_css_path = os.path.join(styles_output_dir, 'main.css')
+    copy_mode = get_asset_copy_mode(config)
+
+    def copy_css(src_path, dst_path):
+        if sync is not None:
+            sync.sync_file(src_path, dst_path)
+        else:
+            os.makedirs(styles_output_dir, exist_ok=True)
+            copy_asset_file(src_path, dst_path, copy_mode)
 
     zconsole.info("Applying theme", f"Copying '{source_css_path}' to '{target_css_path}'")
 
     if os.path.isfile(source_css_path):
         try:
-            os.makedirs(styles_output_dir, exist_ok=True)
-            shutil.copy2(source_css_path, target_css_path)
+            copy_css(source_css_path, target_css_path)
         except OSError as e:
              zconsole.error("Error copying theme CSS", str(e))
     else:
@@ -69,13 +363,12 @@ def copy_styles(config):
     additional_css_files = getattr(config, 'ADDITIONAL_CSS_FILES', [])
     if additional_css_files:
         zconsole.info(f"Copying {len(additional_css_files)} additional CSS files...")
-        os.makedirs(styles_output_dir, exist_ok=True)
         for css_file in additional_css_files:
             additional_source = os.path.join(config.STYLES_DIR, css_file)
             additional_target = os.path.join(styles_output_dir, css_file)
             if os.path.isfile(additional_source):
                 try:
-                    shutil.copy2(additional_source, additional_target)
+                    copy_css(additional_source, additional_target)
                     zconsole.info("Copied additional CSS", css_file)
                 except OSError as e:
                     zconsole.error("Error copying additional CSS file", f"{css_file}: {e}")
@@ -94,12 +387,36 @@ def write_output_file(output_path, content):
     Returns:
         bool: True if successful, False otherwise
     """
+    with timed("write", output_path):
+        return _write_output_file(output_path, content)
+
+
+def _write_output_file(output_path, content):
+    """Implementation of write_output_file (see there for the arguments)."""
     try:
-        # Ensure the directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        data = encode_output(content)
+        try:
+            existing = os.lstat(output_path)
+        except FileNotFoundError:
+            existing = None
+            # Ensure the directory exists
+            ensure_output_dir(os.path.dirname(output_path))
+        
+        if existing is not None:
+            # Leave identical files alone: cheap size check first, then the bytes
+            if (_write_if_changed and stat.S_ISREG(existing.st_mode)
+                    and existing.st_size == len(data) and _same_file_content(output_path, data)):
+                write_stats.record(False)
+                return True
+            
+            # Never write through a linked asset (or a file hard-linked into a
+            # staged build) into the file it is linked to
+            if stat.S_ISLNK(existing.st_mode) or existing.st_nlink > 1:
+                os.remove(output_path)
         
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        with open(output_path, "wb") as f:
+            f.write(data)
+        write_stats.record(True)
         return True
     except OSError as e:
         zconsole.error(f"Error writing file {output_path}: {e}")
@@ -107,3 +424,115 @@ def write_output_file(output_path, content):
     except Exception as e:
         zconsole.error(f"Unexpected error writing file {output_path}: {e}")
         return False
+
+
+class OutputWriter:
+    """
+    Writes rendered pages on a pool of background threads.
+    
+    At most ``max_pending`` pages wait to be written at any time; queueing
+    another one blocks until a write finishes, which bounds the memory held
+    by rendered pages.
+    """
+    
+    def __init__(self, threads, max_pending=None):
+        self.pid = os.getpid()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="zerodown-writer")
+        self.slots = threading.BoundedSemaphore(max_pending or threads * 8)
+        self.pending = 0
+        self.idle = threading.Condition()
+    
+    def submit(self, output_path, content):
+        """
+        Queue a page to be written by write_output_file.
+        
+        Args:
+            output_path: Path where to write the content
+            content: String content to write
+        """
+        self.slots.acquire()
+        with self.idle:
+            self.pending += 1
+        try:
+            self.executor.submit(self._write, output_path, content)
+        except RuntimeError:
+            self._done()
+            raise
+    
+    def _write(self, output_path, content):
+        try:
+            write_output_file(output_path, content)
+        finally:
+            self._done()
+    
+    def _done(self):
+        self.slots.release()
+        with self.idle:
+            self.pending -= 1
+            if not self.pending:
+                self.idle.notify_all()
+    
+    def flush(self):
+        """Wait until every queued page has been written."""
+        with self.idle:
+            while self.pending:
+                self.idle.wait()
+    
+    def close(self):
+        """Write the queued pages and stop the threads."""
+        self.flush()
+        self.executor.shutdown()
+
+
+def set_output_writers(threads):
+    """
+    Sets the number of background threads writing rendered pages.
+    
+    Args:
+        threads: Number of writer threads (0 writes pages synchronously)
+    """
+    global _writer_threads
+    flush_output_files(close=True)
+    _writer_threads = max(0, int(threads or 0))
+
+
+def queue_output_file(output_path, content):
+    """
+    Writes a rendered page, in the background if writer threads are enabled.
+    
+    Call flush_output_files() before relying on the file being on disk.
+    
+    Args:
+        output_path: Path where to write the content
+        content: String content to write
+        
+    Returns:
+        bool: True if the page was written or queued, False if writing failed.
+            Errors of background writes are reported when they happen
+    """
+    global _writer
+    if not _writer_threads:
+        return write_output_file(output_path, content)
+    if _writer is None or _writer.pid != os.getpid():
+        # Worker processes start their own threads (threads are not inherited by fork)
+        _writer = OutputWriter(_writer_threads)
+    _writer.submit(output_path, content)
+    return True
+
+
+def flush_output_files(close=False):
+    """
+    Waits for queued page writes to finish.
+    
+    Args:
+        close: Also stop the writer threads, e.g. before forking worker
+            processes. They are restarted when the next page is queued
+    """
+    global _writer
+    if _writer is None or _writer.pid != os.getpid():
+        return
+    if close:
+        writer, _writer = _writer, None
+        writer.close()
+    else:
+        _writer.flush()
@@ -0,0 +1,294 @@
+"""
+File watching for the Zerodown development server.
+
+SiteWatcher reports changes to the content, template, style and static
+directories and to the configuration file. On Linux it uses inotify
+(through ctypes, no extra dependency); elsewhere, or when inotify is not
+available (e.g. some network and container file systems), it falls back
+to polling file modification times.
+
+Changes are debounced: an editor saving a file usually produces several
+events, and a checkout touches many files at once, but they are reported
+together as one batch.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from zerodown.console import zconsole
+
+# Quiet time after the last change before a batch is reported (seconds)
+WATCH_DEBOUNCE = 0.1
+
+# Interval between two scans of the polling watcher (seconds)
+WATCH_POLL_INTERVAL = 0.5
+
+# Names written by editors while saving, which never affect the site
+_TEMP_SUFFIXES = ('~', '.swp', '.swx', '.swpx', '.tmp', '.part')
+_TEMP_NAMES = ('4913',)  # Vim's write test file
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+def config_files(config_path):
+    """
+    List the files load_config may read for a configuration path.
+
+    Args:
+        config_path: Path to the configuration file
+
+    Returns:
+        list: Absolute paths of the YAML and Python variants
+    """
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    base_name = os.path.splitext(os.path.basename(config_path))[0]
+    return [os.path.join(base_dir, f"{base_name}{ext}") for ext in ('.yaml', '.yml', '.py')]
+
+
+def is_temp_file(path):
+    """Check whether a path is an editor's temporary file."""
+    name = os.path.basename(path)
+    return name in _TEMP_NAMES or name.endswith(_TEMP_SUFFIXES) or name.startswith('.#')
+
+
+class _InotifyBackend:
+    """Watches directory trees with Linux inotify."""
+
+    def __init__(self, roots, files, ignored):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ignored = ignored
+        self.watches = {}  # Watch descriptor -> directory
+        self.tree_dirs = set()  # Directories whose every entry is watched
+        # Single files are watched through their directory
+        self.files = set(files)
+        for root in roots:
+            self._watch_tree(root)
+        for directory in {os.path.dirname(path) for path in files} - self.tree_dirs:
+            self._watch_dir(directory)
+
+    def _watch_dir(self, directory):
+        """Add a watch for one directory."""
+        wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "inotify watch limit reached (fs.inotify.max_user_watches)")
+            return  # Removed in the meantime
+        self.watches[wd] = directory
+
+    def _watch_tree(self, root):
+        """Add watches for a directory and all its subdirectories."""
+        for directory, dirs, _ in os.walk(root):
+            dirs[:] = [name for name in dirs if not self.ignored(os.path.join(directory, name))]
+            self._watch_dir(directory)
+            self.tree_dirs.add(directory)
+
+    def read(self, timeout):
+        """
+        Wait for file system events.
+
+        Args:
+            timeout: Seconds to wait, or None to wait indefinitely
+
+        Returns:
+            set: Changed paths
+        """
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: report every watched directory
+                changed.update(self.watches.values())
+                continue
+            directory = self.watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                self.tree_dirs.discard(directory)
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+
+            if directory not in self.tree_dirs and path not in self.files:
+                continue  # Directory watched only for the configuration file
+            if self.ignored(path):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Watch new directories and report the files they already contain
+                self._watch_tree(path)
+                for subdir, _, filenames in os.walk(path):
+                    changed.update(os.path.join(subdir, filename) for filename in filenames)
+            changed.add(path)
+        return changed
+
+    def close(self):
+        """Release the inotify instance."""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _PollingBackend:
+    """Watches directory trees by comparing file modification times."""
+
+    def __init__(self, roots, files, ignored, interval=WATCH_POLL_INTERVAL):
+        self.roots = list(roots)
+        self.files = list(files)
+        self.ignored = ignored
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        """Record the size and modification time of every watched file."""
+        snapshot = {}
+        for path in self.files:
+            self._stat(path, snapshot)
+        for root in self.roots:
+            for directory, dirs, filenames in os.walk(root):
+                dirs[:] = [name for name in dirs if not self.ignored(os.path.join(directory, name))]
+                for filename in filenames:
+                    self._stat(os.path.join(directory, filename), snapshot)
+        return snapshot
+
+    @staticmethod
+    def _stat(path, snapshot):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        snapshot[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def read(self, timeout):
+        """
+        Wait for the next scan and report the files that changed.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait for one interval
+
+        Returns:
+            set: Changed paths
+        """
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        previous, self.snapshot = self.snapshot, self._scan()
+        changed = {path for path, state in self.snapshot.items() if previous.get(path) != state}
+        changed.update(path for path in previous if path not in self.snapshot)
+        return {path for path in changed if not self.ignored(path)}
+
+    def close(self):
+        pass
+
+
+class SiteWatcher:
+    """
+    Watches the source files of a site.
+
+    Args:
+        config: Configuration module
+        config_path: Path to the configuration file
+        poll: Always use the polling watcher
+    """
+
+    def __init__(self, config, config_path, poll=False):
+        self.config_files = config_files(config_path)
+        self.roots = []
+        for name in ('CONTENT_DIR', 'TEMPLATE_DIR', 'STYLES_DIR', 'STATIC_DIR'):
+            directory = getattr(config, name, None)
+            if directory and os.path.isdir(directory):
+                directory = os.path.abspath(directory)
+                if directory not in self.roots:
+                    self.roots.append(directory)
+
+        # Never react to the build's own output
+        output_dir = os.path.abspath(config.OUTPUT_DIR)
+        parent, name = os.path.split(output_dir)
+        self._ignored_dirs = (output_dir, os.path.abspath(getattr(config, 'CACHE_DIR', '.zerodown-cache')))
+        self._staging_prefix = os.path.join(parent, f".{name}")
+
+        self.backend = None
+        if not poll and sys.platform.startswith('linux'):
+            try:
+                self.backend = _InotifyBackend(self.roots, self.config_files, self.ignored)
+                self.mode = "inotify"
+            except (OSError, AttributeError) as e:
+                zconsole.warning("inotify not available, polling for changes", str(e))
+        if self.backend is None:
+            self.backend = _PollingBackend(self.roots, self.config_files, self.ignored)
+            self.mode = "polling"
+
+    def ignored(self, path):
+        """Check whether changes to a path are ignored."""
+        if is_temp_file(path) or path.startswith(self._staging_prefix):
+            return True
+        return any(path == directory or path.startswith(directory + os.sep)
+                   for directory in self._ignored_dirs)
+
+    def wait(self, debounce=WATCH_DEBOUNCE):
+        """
+        Wait until files change.
+
+        Args:
+            debounce: Quiet time in seconds after the last change before
+                the changes are reported
+
+        Returns:
+            list: Sorted changed paths
+        """
+        changed = set()
+        while not changed:
+            changed = self.backend.read(None)
+        while True:
+            more = self.backend.read(debounce)
+            if not more:
+                break
+            changed |= more
+        return sorted(changed)
+
+    def config_changed(self, changes):
+        """Check whether a batch of changes includes the configuration file."""
+        return any(path in self.config_files for path in changes)
+
+    def close(self):
+        """Stop watching."""
+        self.backend.close()